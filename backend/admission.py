@@ -0,0 +1,121 @@
+"""Admission control for expensive routes.
+
+An AdmissionController lets at most max_in_flight requests run a costly
+section (resume parsing) at once. Up to max_queue more wait in FIFO order
+for at most queue_timeout seconds. Beyond that, requests are turned away
+immediately: a full queue gets 429 and a wait that times out gets 503,
+both with a Retry-After estimated from recent run times. This keeps a
+spike of uploads from occupying every worker thread while cheap routes
+wait behind it.
+
+Counters are only touched from the event loop thread.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from tracing import span
+
+RESUME_PARSE_CONCURRENCY = int(os.environ.get('RESUME_PARSE_CONCURRENCY', min(2, os.cpu_count() or 1)))
+RESUME_PARSE_QUEUE_SIZE = int(os.environ.get('RESUME_PARSE_QUEUE_SIZE', '16'))
+RESUME_PARSE_QUEUE_TIMEOUT = float(os.environ.get('RESUME_PARSE_QUEUE_TIMEOUT', '10'))
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries the HTTP status and Retry-After"""
+
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Concurrency limit with a bounded, timed FIFO wait queue"""
+
+    def __init__(self, max_in_flight=RESUME_PARSE_CONCURRENCY, max_queue=RESUME_PARSE_QUEUE_SIZE,
+                 queue_timeout=RESUME_PARSE_QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.run_time_avg = 1.0  # seconds, exponentially weighted
+        self.queue_wait_max = 0.0
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters)
+
+    def retry_after(self):
+        """Whole seconds until the queue ahead has likely drained"""
+        backlog = (len(self._waiters) + 1) / max(1, self.max_in_flight)
+        return max(1, math.ceil(backlog * self.run_time_avg))
+
+    async def acquire(self):
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected("Server is busy, please try again later", 429, self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected_timeout += 1
+            raise AdmissionRejected("Timed out waiting for capacity, please try again later", 503, self.retry_after())
+
+        self.queue_wait_max = max(self.queue_wait_max, time.perf_counter() - started)
+        self.admitted += 1
+
+    def release(self):
+        # Hand the slot straight to the next live waiter so it can't be overtaken
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        with span("admission.wait", queue_depth=self.queue_depth):
+            await self.acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.run_time_avg = 0.8 * self.run_time_avg + 0.2 * (time.perf_counter() - started)
+            self.release()
+
+    def stats(self):
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "queue_wait_max_ms": round(self.queue_wait_max * 1000, 3),
+            "run_time_avg_ms": round(self.run_time_avg * 1000, 3),
+        }
+
+resume_parse_admission = AdmissionController()
@@ -5,23 +5,60 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_read_db
 from models import User
+from token_cache import token_cache, UserSnapshot
 import os
 
 SECRET_KEY = "your-secret-key-change-this-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor per environment; each extra round doubles the hashing time
+PASSWORD_HASH_PROFILES = {
+    "production": 12,
+    "development": 10,
+    "test": 4,
+}
+PASSWORD_HASH_PROFILE = os.environ.get('PASSWORD_HASH_PROFILE', 'production')
+
+def load_bcrypt_rounds(profile=PASSWORD_HASH_PROFILE, override=None):
+    """bcrypt rounds for a profile, optionally overridden (e.g. by BCRYPT_ROUNDS)"""
+    if profile not in PASSWORD_HASH_PROFILES:
+        raise ValueError(
+            f"Unknown PASSWORD_HASH_PROFILE '{profile}'. "
+            f"Available profiles: {', '.join(sorted(PASSWORD_HASH_PROFILES))}"
+        )
+    rounds = int(override) if override else PASSWORD_HASH_PROFILES[profile]
+    if not 4 <= rounds <= 31:
+        raise ValueError(f"bcrypt rounds must be between 4 and 31, got {rounds}")
+    return rounds
+
+BCRYPT_ROUNDS = load_bcrypt_rounds(override=os.environ.get('BCRYPT_ROUNDS'))
+
+# min_rounds makes needs_update() flag hashes weaker than the current cost,
+# while stronger hashes (e.g. from a production copy) are left alone
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+def load_password_backend():
+    """Load passlib's bcrypt backend now rather than on the first login"""
+    return pwd_context.handler().get_backend()
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def password_needs_rehash(hashed_password):
+    return pwd_context.needs_update(hashed_password)
+
 def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -32,7 +69,13 @@ def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)) -> UserSnapshot:
+    # Recently verified tokens skip the JWT check and the users lookup. Both paths return a
+    # detached UserSnapshot, so handlers never depend on whether the token was cached.
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached[1]
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -47,8 +90,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         raise credentials_exception
     
     user = db.query(User).filter(User.email == email).first()
-    if user is None:
+    # Deactivation invalidates cached tokens, so this check covers every later request
+    if user is None or user.is_active is False:
         raise credentials_exception
-    return user
+    snapshot = UserSnapshot.from_user(user)
+    token_cache.set(token, payload, snapshot)
+    return snapshot
 
 DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///./sql_app.db')
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""False-positive rate, memory and speed of a Bloom filter over user names.
+
+This was measured for answering /check-username and /check-email from
+memory. The app does not use it: each worker would hold its own filter,
+so a "not registered" answer still has to be confirmed against the
+database, and the unique-index lookup on the name is that confirmation.
+
+    python benchmarks/bloom_filter.py --users 1000000
+"""
+import argparse
+import hashlib
+import math
+import time
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def memory_bytes(self):
+        return len(self.bits)
+
+    def expected_false_positive_rate(self):
+        """Theoretical false-positive rate at the current fill"""
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--probes", type=int, default=1_000_000)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    bloom = BloomFilter(args.users, args.error_rate)
+
+    started = time.perf_counter()
+    for i in range(args.users):
+        bloom.add(f"user{i}@example.com")
+    build_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    false_positives = sum(f"someone{i}@example.org" in bloom for i in range(args.probes))
+    probe_s = time.perf_counter() - started
+
+    print(f"users               : {args.users:,}")
+    print(f"bits / hash funcs   : {bloom.size:,} / {bloom.hash_count}")
+    print(f"memory per filter   : {bloom.memory_bytes / 1024 / 1024:.2f} MiB")
+    print(f"target FP rate      : {args.error_rate:.4%}")
+    print(f"expected FP rate    : {bloom.expected_false_positive_rate():.4%}")
+    print(f"observed FP rate    : {false_positives / args.probes:.4%} ({false_positives:,} of {args.probes:,})")
+    print(f"build time          : {build_s:.2f} s ({build_s / args.users * 1e6:.2f} us/add)")
+    print(f"lookup time         : {probe_s / args.probes * 1e6:.2f} us/lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Cost of a full read versus a 304 Not Modified revalidation.
+
+Fills a temporary SQLite database with candidates and times /me and
+/candidates/search. Each endpoint is timed twice: without a validator,
+which gives a full 200, and with the ETag from the previous response,
+which gives a 304.
+
+    python benchmarks/conditional_get.py --candidates 10000 --limit 50
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def time_calls(call, samples):
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        response = call()
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations), response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="conditional-get-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'conditional.db')}"
+    os.environ["CREATE_SCHEMA"] = "1"
+    os.environ["RATE_LIMIT_SIGNUP_IP"] = os.environ["RATE_LIMIT_SIGNUP_ACCOUNT"] = "1000000/1"
+
+    from fastapi.testclient import TestClient
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    import main as app_module
+    from models import Candidate
+    from search import index_candidate
+
+    with TestClient(app_module.app) as client:
+        db = app_module.SessionLocal()
+        for i in range(args.candidates):
+            candidate = Candidate(name=f"Candidate {i}", email=f"candidate{i}@example.com",
+                                  resume_text=f"Python and SQL developer number {i}, built FastAPI services")
+            candidate.set_skills(["python", "sql", "fastapi"])
+            db.add(candidate)
+            db.flush()
+            index_candidate(db, candidate)
+        db.commit()
+        db.close()
+
+        client.post("/signup", json={
+            "full_name": "Bench User", "username": "benchuser",
+            "email": "bench@example.com", "confirm_email": "bench@example.com",
+            "dob": "2000-01-01", "password": "Password123", "confirm_password": "Password123",
+        })
+        token = client.post("/token", data={"username": "benchuser", "password": "Password123"}).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+        endpoints = {"/me": "/me", "/candidates/search": f"/candidates/search?q=python developer&limit={args.limit}"}
+        print(f"{args.candidates} candidates, search limit {args.limit}\n")
+        print(f"{'endpoint':<22}{'200 ms':>9}{'304 ms':>9}{'speedup':>9}{'200 bytes':>11}")
+        for name, url in endpoints.items():
+            full_ms, full = time_calls(lambda: client.get(url, headers=headers), args.samples)
+            revalidate = {**headers, "If-None-Match": full.headers["etag"]}
+            cached_ms, cached = time_calls(lambda: client.get(url, headers=revalidate), args.samples)
+            assert cached.status_code == 304
+            print(f"{name:<22}{full_ms:>9.2f}{cached_ms:>9.2f}{full_ms / cached_ms:>8.1f}x{len(full.content):>11,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Full crawls versus conditional, incremental crawls.
+
+A local stand-in board serves --pages pages with --listings listings
+each. Its ETags let unchanged pages answer 304. The board is crawled
+three times:
+
+  full       no crawl state: every page downloaded and parsed
+  repeat     same content, with the state from the first crawl
+  edited     --edit-ratio of the pages changed since the previous crawl
+
+    python benchmarks/incremental_crawl.py --pages 40 --listings 50
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapers.fetcher import Fetcher
+from scrapers.incremental import CrawlState
+from scrapers.jobs_scrapers import NUSSource, crawl
+
+LISTING = ('<div class="job-listing" data-id="{id}"><h3>{title}</h3><span class="company">Company {id}</span>'
+           '<span class="location">Singapore</span><p class="description">{description}</p>'
+           '<a href="/jobs/{id}">View</a></div>')
+
+
+def render(number, pages, listings, revision):
+    items = "".join(LISTING.format(id=f"{number}-{i}", title=f"Intern {number}-{i} rev {revision}",
+                                   description="Python, SQL and stakeholder management. " * 8)
+                    for i in range(listings))
+    next_link = f'<a rel="next" href="/board?page={number + 1}">Next</a>' if number < pages else ""
+    return f"<html><body>{items}{next_link}</body></html>".encode()
+
+
+def make_handler(board):
+    class Board(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        wbufsize = 1 << 16  # one write per response, so Nagle and delayed ACKs do not add 40 ms a page
+
+        def do_GET(self):
+            query = parse_qs(urlsplit(self.path).query)
+            body = board[int(query["page"][0]) if "page" in query else 1]
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Board
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--listings", type=int, default=50, help="listings per page")
+    parser.add_argument("--edit-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    board = {n: render(n, args.pages, args.listings, 0) for n in range(1, args.pages + 1)}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(board))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/board"
+    state = CrawlState(os.path.join(tempfile.mkdtemp(prefix="incremental-crawl-"), "state.json"))
+
+    print(f"{args.pages} pages x {args.listings} listings\n")
+    print(f"{'crawl':<8}{'seconds':>9}{'parsed':>8}{'304':>6}{'received':>12}{'saved':>12}"
+          f"{'cpu ms':>9}{'cpu saved':>11}{'listings out':>14}")
+    for name in ("full", "repeat", "edited"):
+        if name == "edited":
+            for n in range(1, args.pages + 1, max(1, round(1 / args.edit_ratio))):
+                board[n] = render(n, args.pages, args.listings, 1)
+        with Fetcher(rate=0) as fetcher:
+            started = time.perf_counter()
+            results, report = crawl(state, [NUSSource(url=url, max_pages=args.pages)], fetcher)
+            elapsed = time.perf_counter() - started
+        print(f"{name:<8}{elapsed:>9.2f}{report['pages_parsed']:>8}{report['pages_not_modified']:>6}"
+              f"{report['bytes_received']:>12,}{report['bytes_saved']:>12,}{report['parse_cpu_ms']:>9.0f}"
+              f"{report['parse_cpu_saved_ms']:>11.0f}{len(results['nus']['listings']):>14}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Bulk internship ingestion against a per-listing ORM loop.
+
+Generates --listings scraped listings across three sources. A share of
+them are duplicates, and the NUS ones have no external id. They are
+ingested into a fresh SQLite database three times: the initial load, an
+unchanged re-ingest, and a re-ingest with --edit-ratio of the listings
+changed. For comparison, the first --baseline listings are also loaded
+the straightforward way: normalise, look the key up through the ORM, and
+add or update one object at a time.
+
+    python benchmarks/ingest_internships.py --listings 100000 --chunk-size 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from internships import ingest_internships, normalise
+from models import Internship
+
+SOURCES = ("fastjobs", "indeed", "nus")
+TITLES = ("Software Engineering", "Data Analyst", "Marketing", "UX Design", "Finance", "Operations")
+
+
+def generate(count, duplicate_ratio, seed=7):
+    rng = random.Random(seed)
+    listings = []
+    for i in range(count):
+        if listings and rng.random() < duplicate_ratio:
+            listings.append(dict(rng.choice(listings)))
+            continue
+        source = SOURCES[i % 3]
+        listings.append({
+            "source": source,
+            "external_id": None if source == "nus" else f"{source}-{i}",
+            "title": f"{rng.choice(TITLES)} Intern {i}",
+            "company": f"Company {rng.randrange(2000)}",
+            "location": rng.choice(("Singapore", "Jurong East", "Tampines", "One-North")),
+            "url": f"https://example.com/{source}/{i}",
+            "description": "Work with the team on real projects using Python, SQL and Excel. " * 3,
+            "stipend": f"S${rng.randrange(8, 20) * 100}/month",
+            "skills": rng.sample(["Python", "SQL", "Excel", "React", "Figma", "Tableau", "Java"], 3),
+            "posted": f"{rng.randrange(1, 30)} days ago",
+            "deadline": f"{rng.randrange(1, 28):02d}/{rng.randrange(6, 13):02d}/2025",
+        })
+    return listings
+
+
+def orm_baseline(db, listings):
+    """One ORM lookup and add/update per listing, committed at the end"""
+    for listing in listings:
+        row = normalise(listing)
+        if row is None:
+            continue
+        existing = db.scalar(select(Internship).where(Internship.canonical_key == row["canonical_key"]))
+        if existing is None:
+            db.add(Internship(**row))
+            db.flush()
+        elif existing.record_hash != row["record_hash"]:
+            for name, value in row.items():
+                setattr(existing, name, value)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=100000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.05)
+    parser.add_argument("--edit-ratio", type=float, default=0.1)
+    parser.add_argument("--baseline", type=int, default=10000, help="listings for the per-listing ORM loop")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ingest-")
+    listings = generate(args.listings, args.duplicate_ratio)
+
+    def session(name):
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, name)}")
+        Base.metadata.create_all(engine)
+        return sessionmaker(bind=engine)()
+
+    print(f"{args.listings:,} listings, chunk size {args.chunk_size}\n")
+    print(f"{'run':<22}{'seconds':>9}{'listings/s':>12}{'inserted':>10}{'updated':>9}{'unchanged':>11}{'dupes':>7}")
+    db = session("bulk.db")
+    edited = [dict(listing) for listing in listings]
+    for listing in edited[::max(1, round(1 / args.edit_ratio))]:
+        listing["stipend"] = "S$2,500/month"
+    for name, batch in (("bulk, initial", listings), ("bulk, unchanged", listings), ("bulk, edited", edited)):
+        started = time.perf_counter()
+        report = ingest_internships(db, batch, chunk_size=args.chunk_size)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<22}{elapsed:>9.2f}{len(batch) / elapsed:>12,.0f}{report['inserted']:>10,}"
+              f"{report['updated']:>9,}{report['unchanged']:>11,}{report['duplicates']:>7,}")
+    rows = db.scalar(select(func.count()).select_from(Internship))
+
+    baseline = listings[:args.baseline]
+    started = time.perf_counter()
+    orm_baseline(session("orm.db"), baseline)
+    elapsed = time.perf_counter() - started
+    print(f"{'ORM loop, initial':<22}{elapsed:>9.2f}{len(baseline) / elapsed:>12,.0f}")
+    print(f"\n{rows:,} rows stored")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Keyset against OFFSET pagination of the internship list.
+
+Loads --listings internships into a fresh SQLite database, then pages
+through the list cards --limit at a time for each filter and sort. It
+times reaching pages 1, 10, 100 and so on, first with the cursor from
+list_internships() and then with the same query using LIMIT/OFFSET.
+Finally it prints SQLite's query plan for the common filter and sort
+pairs, to show which composite index each one uses.
+
+    python benchmarks/internship_pagination.py --listings 100000 --limit 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from internships import CARD_COLUMNS, SORTS, encode_cursor, ingest_internships, list_internships
+from models import Internship
+
+CATEGORIES = ("technology", "data", "design", "marketing", "finance", "business", "engineering")
+LOCATIONS = ("Singapore", "Jurong East", "Tampines", "One-North", "Raffles Place")
+CASES = [
+    ("posted", {}),
+    ("posted", {"category": "data"}),
+    ("deadline", {"category": "data"}),
+    ("stipend", {"category": "data"}),
+    ("posted", {"source": "indeed"}),
+    ("posted", {"location": "Tampines"}),
+    ("deadline", {"deadline_from": date(2025, 7, 1), "deadline_to": date(2025, 9, 30)}),
+]
+
+
+def generate(count, seed=7):
+    rng = random.Random(seed)
+    start = date(2025, 1, 1)
+    return [{
+        "source": rng.choice(("fastjobs", "indeed", "nus")),
+        "external_id": str(i),
+        "title": f"Intern {i}",
+        "company": f"Company {rng.randrange(2000)}",
+        "category": rng.choice(CATEGORIES),
+        "location": rng.choice(LOCATIONS),
+        "stipend": None if rng.random() < 0.1 else f"S${rng.randrange(8, 30) * 100}/month",
+        "skills": rng.sample(["Python", "SQL", "Excel", "React", "Figma", "Tableau", "Java"], 3),
+        "posted_date": start + timedelta(days=rng.randrange(180)),
+        "deadline": None if rng.random() < 0.05 else start + timedelta(days=rng.randrange(150, 330)),
+    } for i in range(count)]
+
+
+def offset_page(db, sort, filters, limit, offset):
+    """The same page by OFFSET, with NULL sort values last as in list_internships()"""
+    name, descending = SORTS[sort]
+    table = Internship.__table__
+    key = table.c[name]
+    conditions = [table.c[column] == value for column, value in filters.items() if not column.startswith("deadline_")]
+    if "deadline_from" in filters:
+        conditions += [table.c.deadline >= filters["deadline_from"], table.c.deadline <= filters["deadline_to"]]
+    order = (key.is_(None), key.desc(), table.c.id.desc()) if descending else (key.is_(None), key, table.c.id)
+    query = select(*[table.c[column] for column in CARD_COLUMNS]).where(*conditions).order_by(*order)
+    return db.execute(query.limit(limit).offset(offset)).mappings().all()
+
+
+def describe(filters):
+    return ", ".join(f"{name}={value}" for name, value in filters.items()) or "-"
+
+
+def keyset_walk(db, sort, filters, limit, pages):
+    """Seconds to fetch each of the given page numbers, following cursors from page 1"""
+    timings, cursor, number = {}, None, 0
+    while number < max(pages):
+        number += 1
+        page_started = time.perf_counter()
+        _, cursor = list_internships(db, sort=sort, limit=limit, cursor=cursor, **filters)
+        if number in pages:
+            timings[number] = time.perf_counter() - page_started
+        if cursor is None:
+            break
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='pagination-'), 'bench.db')}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    ingest_internships(db, generate(args.listings))
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+    pages = [1, 10, 100, 1000]
+    print(f"{args.listings:,} internships, {args.limit} per page; ms to fetch page N\n")
+    print(f"{'sort':<10}{'filter':<52}" + "".join(f"{'keyset ' + str(n):>13}{'offset ' + str(n):>13}" for n in pages))
+    for sort, filters in CASES:
+        timings = keyset_walk(db, sort, filters, args.limit, pages)
+        row = f"{sort:<10}{describe(filters):<52}"
+        for number in pages:
+            if number not in timings:
+                row += f"{'-':>13}{'-':>13}"
+                continue
+            started = time.perf_counter()
+            offset_page(db, sort, filters, args.limit, (number - 1) * args.limit)
+            row += f"{timings[number] * 1000:>13.2f}{(time.perf_counter() - started) * 1000:>13.2f}"
+        print(row)
+
+    print("\nQuery plans for a page after a cursor:")
+    for sort, filters in CASES:
+        name, _ = SORTS[sort]
+        value = date(2025, 8, 1) if name != "stipend_monthly" else 1500
+        cursor = encode_cursor(sort, value, args.listings // 2)
+        statements = []
+
+        def capture(conn, cursor_, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+        event.listen(engine, "before_cursor_execute", capture)
+        list_internships(db, sort=sort, limit=args.limit, cursor=cursor, **filters)
+        event.remove(engine, "before_cursor_execute", capture)
+        statement, parameters = statements[0]
+        plan = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        print(f"  {sort:<10}{describe(filters):<52}" + "; ".join(step[-1] for step in plan))
+
+
+if __name__ == "__main__":
+    main()
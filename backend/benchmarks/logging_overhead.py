@@ -0,0 +1,77 @@
+"""Latency added to the caller by logging when the log disk is slow.
+
+Logs records from coroutines on the event loop, the way the request
+handlers do. It compares a file handler called in place with the same
+handler behind configure_logging()'s queue. Each write is made to sleep
+--disk-ms to stand in for a slow or contended disk.
+
+    python benchmarks/logging_overhead.py --records 500 --disk-ms 2
+"""
+import argparse
+import asyncio
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_setup import JSONFormatter, configure_logging, stop_logging
+
+
+class SlowStream(io.StringIO):
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def flush(self):
+        time.sleep(self.delay)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def log_from_loop(logger, records):
+    latencies = []
+    for i in range(records):
+        started = time.perf_counter()
+        logger.info("Created new candidate: %s", f"candidate{i}@example.com", extra={"candidate_id": i})
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0)
+    return latencies
+
+
+def report(name, latencies):
+    ms = [value * 1000 for value in latencies]
+    print(f"{name:<18}{sum(ms):>11.1f}{percentile(ms, 50):>9.3f}{percentile(ms, 99):>9.3f}{max(ms):>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=500)
+    parser.add_argument("--disk-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    logger = logging.getLogger("api")
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+
+    print(f"{'handler':<18}{'total ms':>11}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+
+    direct = logging.StreamHandler(SlowStream(args.disk_ms / 1000))
+    direct.setFormatter(JSONFormatter())
+    root.addHandler(direct)
+    report("direct", asyncio.run(log_from_loop(logger, args.records)))
+    root.removeHandler(direct)
+
+    configure_logging(stream=SlowStream(args.disk_ms / 1000), sample_rates="", force=True)
+    report("queued", asyncio.run(log_from_loop(logger, args.records)))
+    started = time.perf_counter()
+    stop_logging()
+    print(f"\nlistener drained the queue {(time.perf_counter() - started) * 1000:.0f} ms after the last call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Measure /health latency while a storm of logins hits /token.
+
+Starts the app with uvicorn on a temporary SQLite database, creates one
+user, then fires concurrent logins while probing /health. Run it once with
+the pooled hasher and once with bcrypt called inline on the event loop:
+
+    python benchmarks/login_storm.py --mode pool
+    python benchmarks/login_storm.py --mode inline
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class InlineHasher:
+    """Stand-in for PasswordHasher that runs bcrypt directly on the event loop"""
+
+    def __init__(self, hash_func, verify_func):
+        self.hash_func = hash_func
+        self.verify_func = verify_func
+
+    async def hash(self, password):
+        return self.hash_func(password)
+
+    async def verify(self, plain_password, hashed_password):
+        return self.verify_func(plain_password, hashed_password)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def start_server(port):
+    import uvicorn
+    import main
+
+    config = uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def storm(base_url, logins, concurrency, probe_interval):
+    import httpx
+    import logging
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        await client.post("/signup", json={
+            "full_name": "Storm User", "username": "stormuser",
+            "email": "storm@example.com", "confirm_email": "storm@example.com",
+            "dob": "2000-01-01", "password": "Password123", "confirm_password": "Password123",
+        })
+
+        health_latencies = []
+        done = asyncio.Event()
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/health")
+                health_latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(probe_interval)
+
+        semaphore = asyncio.Semaphore(concurrency)
+        statuses = {}
+
+        async def login():
+            async with semaphore:
+                response = await client.post("/token", data={"username": "stormuser", "password": "Password123"})
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        prober = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+
+    return {
+        "logins": logins,
+        "elapsed_s": round(elapsed, 2),
+        "logins_per_s": round(logins / elapsed, 1),
+        "statuses": statuses,
+        "health_samples": len(health_latencies),
+        "health_p50_ms": round(statistics.median(health_latencies), 2),
+        "health_p99_ms": round(percentile(health_latencies, 99), 2),
+        "health_max_ms": round(max(health_latencies), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["pool", "inline"], default="pool")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="login-storm-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'storm.db')}"
+    os.environ["CREATE_SCHEMA"] = "1"
+    # The storm is one client logging into one account; keep the rate limiter out of the way
+    os.environ["RATE_LIMIT_TOKEN_IP"] = os.environ["RATE_LIMIT_TOKEN_ACCOUNT"] = "1000000/1"
+
+    import main as app_module
+    from auth import get_password_hash, verify_password
+
+    if args.mode == "inline":
+        app_module.password_hasher = InlineHasher(get_password_hash, verify_password)
+
+    server, thread = start_server(args.port)
+    try:
+        report = asyncio.run(storm(f"http://127.0.0.1:{args.port}", args.logins, args.concurrency, args.probe_interval))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    report["mode"] = args.mode
+    for key, value in report.items():
+        print(f"{key:>16}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Total memory of the prefork launcher with and without preloading.
+
+Starts prefork.py with N workers in each mode, waits until the app answers
+and memory stops growing, then sums RSS and PSS (proportional set size,
+which splits shared copy-on-write pages between the processes sharing
+them) over the master and its workers. Linux only: reads /proc.
+
+    python benchmarks/prefork_rss.py --workers 8
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def memory_kb(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key] = int(rest.split()[0])
+    return values
+
+
+def process_tree(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [pid] + [int(child) for child in f.read().split()]
+
+
+def wait_until_ready(port, proc, workers, timeout=300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("launcher exited early")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            if len(process_tree(proc.pid)) == workers + 1:
+                break
+        except OSError:
+            pass
+        time.sleep(0.25)
+
+    # Workers finish starting at different times; wait for the total to settle
+    previous = None
+    while time.monotonic() < deadline:
+        total = sum(memory_kb(pid)["Rss"] for pid in process_tree(proc.pid))
+        if previous is not None and abs(total - previous) < 1024:
+            return
+        previous = total
+        time.sleep(1)
+
+
+def measure(workers, preload, port):
+    workdir = tempfile.mkdtemp(prefix="prefork-rss-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'rss.db')}", CREATE_SCHEMA="1")
+    command = [sys.executable, os.path.join(BACKEND, "prefork.py"), "--workers", str(workers),
+               "--port", str(port), "--log-level", "warning", "--preload" if preload else "--no-preload"]
+    proc = subprocess.Popen(command, env=env, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        started = time.perf_counter()
+        wait_until_ready(port, proc, workers)
+        ready_s = time.perf_counter() - started
+        pids = process_tree(proc.pid)
+        usage = [memory_kb(pid) for pid in pids]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=60)
+    return {
+        "processes": len(pids),
+        "rss_mib": sum(u["Rss"] for u in usage) / 1024,
+        "pss_mib": sum(u["Pss"] for u in usage) / 1024,
+        "worker_rss_mib": usage[-1]["Rss"] / 1024,
+        "ready_s": ready_s,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8790)
+    args = parser.parse_args()
+
+    print(f"{'mode':<12}{'procs':>6}{'total RSS MiB':>15}{'total PSS MiB':>15}{'RSS/worker':>12}{'ready s':>9}")
+    for offset, preload in enumerate((False, True)):
+        result = measure(args.workers, preload, args.port + offset)
+        print(f"{'preload' if preload else 'no-preload':<12}{result['processes']:>6}{result['rss_mib']:>15.1f}"
+              f"{result['pss_mib']:>15.1f}{result['worker_rss_mib']:>12.1f}{result['ready_s']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
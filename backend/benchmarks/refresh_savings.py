@@ -0,0 +1,88 @@
+"""Estimate the bcrypt verifies saved by refresh tokens.
+
+Times password logins against refresh-token exchanges on a temporary
+SQLite database, then works out the daily cost per active user. Before
+refresh tokens, clients logged in again with a password every time the
+15-minute access token expired. Now they refresh every
+ACCESS_TOKEN_EXPIRE_MINUTES and only log in with a password once per
+refresh token lifetime.
+
+    python benchmarks/refresh_savings.py --active-hours 8
+"""
+import argparse
+import logging
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LEGACY_ACCESS_TOKEN_MINUTES = 15
+
+
+def time_calls(call, samples):
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        call()
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--active-hours", type=float, default=8.0, help="hours per day a user keeps the app open")
+    parser.add_argument("--samples", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="refresh-savings-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'refresh.db')}"
+    os.environ["CREATE_SCHEMA"] = "1"
+    os.environ["RATE_LIMIT_TOKEN_IP"] = os.environ["RATE_LIMIT_TOKEN_ACCOUNT"] = "1000000/1"
+
+    from fastapi.testclient import TestClient
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    import main as app_module
+    from auth import ACCESS_TOKEN_EXPIRE_MINUTES, BCRYPT_ROUNDS
+    from refresh_tokens import REFRESH_TOKEN_EXPIRE_DAYS
+
+    with TestClient(app_module.app) as client:
+        client.post("/signup", json={
+            "full_name": "Refresh User", "username": "refreshuser",
+            "email": "refresh@example.com", "confirm_email": "refresh@example.com",
+            "dob": "2000-01-01", "password": "Password123", "confirm_password": "Password123",
+        })
+        credentials = {"username": "refreshuser", "password": "Password123"}
+        state = {"refresh_token": client.post("/token", data=credentials).json()["refresh_token"]}
+
+        def refresh():
+            response = client.post("/token/refresh", json={"refresh_token": state["refresh_token"]})
+            state["refresh_token"] = response.json()["refresh_token"]
+
+        login_ms = time_calls(lambda: client.post("/token", data=credentials), args.samples)
+        refresh_ms = time_calls(refresh, args.samples)
+
+    active_minutes = args.active_hours * 60
+    legacy_logins = math.ceil(active_minutes / LEGACY_ACCESS_TOKEN_MINUTES)
+    logins = 1 / REFRESH_TOKEN_EXPIRE_DAYS
+    refreshes = math.ceil(active_minutes / ACCESS_TOKEN_EXPIRE_MINUTES)
+
+    report = {
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+        "login_p50_ms": round(login_ms, 2),
+        "refresh_p50_ms": round(refresh_ms, 2),
+        "legacy_logins_per_user_day": legacy_logins,
+        "logins_per_user_day": round(logins, 3),
+        "refreshes_per_user_day": refreshes,
+        "bcrypt_saved_per_user_day": round(legacy_logins - logins, 3),
+        "server_ms_saved_per_user_day": round(legacy_logins * login_ms - logins * login_ms - refreshes * refresh_ms, 1),
+    }
+    for key, value in report.items():
+        print(f"{key:>30}: {value}")
+
+
+if __name__ == "__main__":
+    main()
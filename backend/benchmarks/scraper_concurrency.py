@@ -0,0 +1,108 @@
+"""Old one-after-another scraping versus the pooled, concurrent engine.
+
+Starts a local stand-in server that plays three job boards on separate
+hosts (127.0.0.1, localhost and 127.0.0.2). Each page answers after
+--latency ms to mimic a remote site. Then the same pages are scraped two
+ways:
+
+  sequential  requests.get per page, no shared session, one source after
+              another (how jobs_scrapers.py used to work)
+  engine      run_sources() with one Fetcher: keep-alive pooling, sources
+              in parallel, per-host limits
+
+    python benchmarks/scraper_concurrency.py --pages 5 --latency 80
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from bs4 import BeautifulSoup
+
+from scrapers.fetcher import Fetcher
+from scrapers.jobs_scrapers import NUSSource, run_sources
+
+LISTING = '<div class="job-listing" data-id="{i}"><h3>Intern {i}</h3><span class="company">Co {i}</span></div>'
+
+
+def make_handler(pages, latency, connections):
+    class Board(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            connections.append(self.client_address)
+
+        def do_GET(self):
+            time.sleep(latency)
+            number = int(self.path.rsplit("page=", 1)[1]) if "page=" in self.path else 1
+            body = "".join(LISTING.format(i=number * 100 + i) for i in range(20))
+            if number < pages:
+                body += f'<a rel="next" href="/board?page={number + 1}">Next</a>'
+            data = f"<html><body>{body}</body></html>".encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Board
+
+
+def sequential(urls):
+    """The old approach: a fresh connection per page, one source at a time"""
+    listings = 0
+    for url in urls:
+        source = NUSSource(url=url)
+        while url:
+            response = requests.get(url, timeout=10)
+            soup = BeautifulSoup(response.text, "html.parser")
+            listings += len(source.parse(soup, url))
+            next_link = soup.select_one('a[rel~="next"][href]')
+            url = requests.compat.urljoin(url, next_link["href"]) if next_link else None
+    return listings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=5, help="pages per source")
+    parser.add_argument("--latency", type=float, default=80, help="server delay per page in ms")
+    args = parser.parse_args()
+
+    connections = []
+    server = ThreadingHTTPServer(("0.0.0.0", 0), make_handler(args.pages, args.latency / 1000, connections))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    urls = [f"http://{host}:{port}/board" for host in ("127.0.0.1", "localhost", "127.0.0.2")]
+
+    print(f"3 sources x {args.pages} pages, {args.latency:.0f} ms per page\n")
+    print(f"{'mode':<12}{'seconds':>9}{'listings':>10}{'connections':>13}")
+
+    started = time.perf_counter()
+    count = sequential(urls)
+    print(f"{'sequential':<12}{time.perf_counter() - started:>9.2f}{count:>10}{len(connections):>13}")
+
+    connections.clear()
+    sources = [NUSSource(url=url, max_pages=args.pages) for url in urls]
+    for number, source in enumerate(sources):
+        source.name = f"board-{number}"
+    with Fetcher(rate=0) as fetcher:
+        started = time.perf_counter()
+        results = run_sources(sources, fetcher)
+        elapsed = time.perf_counter() - started
+    count = sum(len(result["listings"]) for result in results.values())
+    print(f"{'engine':<12}{elapsed:>9.2f}{count:>10}{len(connections):>13}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Cost of serializing large candidate lists to JSON.
+
+Compares FastAPI's default path (jsonable_encoder then stdlib json) with
+model_dump() rendered by FastJSONResponse, with and without orjson.
+
+    python benchmarks/serialization.py --candidates 1000 10000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+import responses
+from responses import FastJSONResponse
+
+
+class CandidateResult(BaseModel):
+    id: int
+    name: str
+    email: str
+    phone: str
+    designation: str
+    skills: List[str]
+    degree: List[str]
+    experience: List[str]
+    updated: date
+    score: float
+    snippet: str
+
+
+class CandidateList(BaseModel):
+    query: str
+    count: int
+    results: List[CandidateResult]
+
+
+def build_payload(count):
+    return CandidateList(query="python", count=count, results=[
+        CandidateResult(
+            id=i,
+            name=f"Candidate {i}",
+            email=f"candidate{i}@example.com",
+            phone="+65 9123 4567",
+            designation="Software Engineer Intern",
+            skills=["python", "sql", "fastapi", "react", "docker", "aws"],
+            degree=["Bachelor of Computing in Computer Science"],
+            experience=["Backend intern at Example Pte Ltd", "Teaching assistant, CS1010"],
+            updated=date(2025, 1, 1),
+            score=12.345678,
+            snippet="... built <mark>python</mark> services and data pipelines ...",
+        )
+        for i in range(count)
+    ])
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    orjson = responses.orjson
+
+    def stdlib_fast_response(payload):
+        responses.orjson = None
+        try:
+            return FastJSONResponse(payload.model_dump()).body
+        finally:
+            responses.orjson = orjson
+
+    strategies = {
+        "jsonable_encoder + json": lambda payload: JSONResponse(jsonable_encoder(payload)).body,
+        "model_dump + json": stdlib_fast_response,
+    }
+    if orjson is not None:
+        strategies["model_dump + orjson"] = lambda payload: FastJSONResponse(payload.model_dump()).body
+    else:
+        print("orjson is not installed; skipping the orjson path\n")
+
+    print(f"{'candidates':>10}  {'strategy':<26}{'ms':>10}{'speedup':>9}{'bytes':>12}")
+    for count in args.candidates:
+        payload = build_payload(count)
+        baseline = None
+        for name, strategy in strategies.items():
+            ms, size = best_of(lambda: strategy(payload), args.repeat)
+            baseline = baseline or ms
+            print(f"{count:>10}  {name:<26}{ms:>10.2f}{baseline / ms:>8.1f}x{size:>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Measure /health latency while a storm of resume uploads hits /upload-resume.
+
+Starts the app with uvicorn on a temporary SQLite database and replaces
+parse_resume with a synthetic parser that burns CPU while holding the GIL
+(as spaCy and pdfplumber largely do). Compare the admission controller
+with unbounded parsing:
+
+    python benchmarks/upload_storm.py --mode admission
+    python benchmarks/upload_storm.py --mode unbounded
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from login_storm import percentile, start_server
+
+
+def synthetic_parser(parse_ms):
+    def parse_resume(filepath):
+        deadline = time.thread_time() + parse_ms / 1000
+        total = 0
+        while time.thread_time() < deadline:
+            total += sum(i * i for i in range(200))
+        name = os.path.basename(filepath).split("_", 1)[1].rsplit(".", 1)[0]
+        return {"name": name, "email": f"{name}@example.com", "phone": None, "designation": None,
+                "skills": ["python"], "degree": [], "experience": [], "text": "python"}
+    return parse_resume
+
+
+async def storm(base_url, uploads, concurrency, probe_interval):
+    import httpx
+    import logging
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        health_latencies = []
+        done = asyncio.Event()
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/health")
+                health_latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(probe_interval)
+
+        semaphore = asyncio.Semaphore(concurrency)
+        statuses = {}
+
+        async def upload(i):
+            async with semaphore:
+                files = {"resume": (f"candidate{i}.txt", b"resume text", "text/plain")}
+                response = await client.post("/upload-resume", files=files)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        prober = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(upload(i) for i in range(uploads)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+
+    return {
+        "uploads": uploads,
+        "elapsed_s": round(elapsed, 2),
+        "statuses": statuses,
+        "health_samples": len(health_latencies),
+        "health_p50_ms": round(statistics.median(health_latencies), 2),
+        "health_p99_ms": round(percentile(health_latencies, 99), 2),
+        "health_max_ms": round(max(health_latencies), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["admission", "unbounded"], default="admission")
+    parser.add_argument("--uploads", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--parse-ms", type=float, default=150)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="upload-storm-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'storm.db')}"
+    os.environ["CREATE_SCHEMA"] = "1"
+    os.chdir(workdir)
+
+    import main as app_module
+    from admission import AdmissionController
+
+    app_module.parse_resume = synthetic_parser(args.parse_ms)
+    if args.mode == "unbounded":
+        app_module.resume_parse_admission = AdmissionController(max_in_flight=10 ** 6, max_queue=0)
+
+    server, thread = start_server(args.port)
+    try:
+        report = asyncio.run(storm(f"http://127.0.0.1:{args.port}", args.uploads, args.concurrency, args.probe_interval))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    report["mode"] = args.mode
+    report["admission"] = app_module.resume_parse_admission.stats()
+    for key, value in report.items():
+        print(f"{key:>16}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Conditional GET: ETags, If-None-Match and per-route Cache-Control.
+
+A read endpoint hands conditional_response() an ETag built from cheap
+version data and a function that renders the full response. The version
+data is a row's updated_at, or a count and max(updated_at) for a listing.
+When the request's If-None-Match matches, the endpoint answers 304 and
+render is never called, so the full query and serialisation are skipped.
+Without version data, the ETag is a hash of the rendered body. That still
+saves the transfer, though not the work.
+
+Cache-Control comes from CACHE_CONTROL, keyed by route template. The
+CACHE_CONTROL environment variable overrides or adds entries, e.g.
+"/candidates/search=private, max-age=30;/me=private, no-cache".
+"""
+import hashlib
+import os
+
+from fastapi import Response
+
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+def parse_cache_control(spec):
+    """Parse "route=directives;route=directives" into a dict"""
+    rules = {}
+    for item in spec.split(";"):
+        route, _, value = item.partition("=")
+        if route.strip() and value.strip():
+            rules[route.strip()] = value.strip()
+    return rules
+
+# Per-user data may only be cached privately; no-cache makes clients revalidate with the ETag.
+# Internship listings are public and change at most once per crawl, so shared caches may hold them briefly.
+CACHE_CONTROL = {
+    "/me": "private, no-cache",
+    "/candidates/search": "private, no-cache",
+    "/internships": "public, max-age=60",
+    "/internships/{internship_id}": "public, max-age=60",
+    **parse_cache_control(os.environ.get('CACHE_CONTROL', '')),
+}
+
+def make_etag(*parts):
+    """Strong ETag from version components such as ids and timestamps"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+def body_etag(body):
+    """Strong ETag from a rendered response body"""
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match comparison, which is weak: W/"x" matches "x" """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == bare for candidate in if_none_match.split(","))
+
+def cache_headers(route, etag):
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL.get(route, DEFAULT_CACHE_CONTROL)}
+
+def conditional_response(request, render, etag=None):
+    """304 if the client's copy is current, otherwise render(), with ETag and Cache-Control set"""
+    route = getattr(request.scope.get("route"), "path", request.url.path)
+    if_none_match = request.headers.get("if-none-match")
+    if etag is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=cache_headers(route, etag))
+
+    response = render()
+    if etag is None:
+        etag = body_etag(response.body)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=cache_headers(route, etag))
+    response.headers.update(cache_headers(route, etag))
+    return response
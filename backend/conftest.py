@@ -0,0 +1,4 @@
+import os
+
+# Hash passwords at the cheapest bcrypt cost while testing
+os.environ.setdefault("PASSWORD_HASH_PROFILE", "test")
@@ -1,7 +1,15 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from fastapi import Request
+from jose import JWTError, jwt
+from collections import OrderedDict
+import hashlib
+import itertools
 import os
+import threading
+import time
 
 Base = declarative_base()
 
@@ -11,20 +19,364 @@ DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///./app.db')
 if DATABASE_URL.startswith('postgres://'):
     DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
 
+# Optional comma-separated read replicas, e.g. for GET endpoints
+DATABASE_REPLICA_URLS = [
+    url.strip().replace('postgres://', 'postgresql://', 1)
+    for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',')
+    if url.strip()
+]
+REPLICA_HEALTH_INTERVAL = float(os.environ.get('DB_REPLICA_HEALTH_INTERVAL', '5'))
+READ_YOUR_WRITES_SECONDS = float(os.environ.get('DB_READ_YOUR_WRITES_SECONDS', '5'))
+
+# Named performance profiles, selected with DB_PROFILE.
+# "sqlite" holds the PRAGMAs applied to every new SQLite connection,
+# "postgres" holds the connection pool settings passed to create_engine.
+PERFORMANCE_PROFILES = {
+    "default": {
+        "sqlite": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,          # ms to wait on a locked database
+            "cache_size": -16000,          # negative = KiB, i.e. 16 MB
+            "mmap_size": 128 * 1024 * 1024,
+        },
+        "postgres": {
+            "pool_size": 5,
+            "max_overflow": 10,
+            "pool_pre_ping": True,
+            "pool_recycle": 1800,
+            "pool_timeout": 30,
+        },
+    },
+    "high-concurrency": {
+        "sqlite": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 15000,
+            "cache_size": -64000,
+            "mmap_size": 512 * 1024 * 1024,
+        },
+        "postgres": {
+            "pool_size": 20,
+            "max_overflow": 30,
+            "pool_pre_ping": True,
+            "pool_recycle": 900,
+            "pool_timeout": 10,
+        },
+    },
+    "low-memory": {
+        "sqlite": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,
+            "cache_size": -2000,
+            "mmap_size": 0,
+        },
+        "postgres": {
+            "pool_size": 2,
+            "max_overflow": 3,
+            "pool_pre_ping": True,
+            "pool_recycle": 1800,
+            "pool_timeout": 30,
+        },
+    },
+    # Driver defaults: rollback journal on SQLite, pool of 5 + 10 on Postgres
+    "legacy": {
+        "sqlite": {},
+        "postgres": {},
+    },
+}
+
+SQLITE_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+SQLITE_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+# Environment overrides for the Postgres pool, applied on top of the profile
+POSTGRES_POOL_ENV = {
+    "pool_size": ("DB_POOL_SIZE", int),
+    "max_overflow": ("DB_MAX_OVERFLOW", int),
+    "pool_pre_ping": ("DB_POOL_PRE_PING", lambda v: v.strip().lower() in ("1", "true", "yes", "on")),
+    "pool_recycle": ("DB_POOL_RECYCLE", int),
+    "pool_timeout": ("DB_POOL_TIMEOUT", int),
+}
+
+def load_profile(name=None, environ=None):
+    """Return the named profile with environment overrides applied"""
+    environ = os.environ if environ is None else environ
+    name = name or environ.get('DB_PROFILE', 'default')
+    if name not in PERFORMANCE_PROFILES:
+        raise ValueError(
+            f"Unknown DB_PROFILE '{name}'. Available profiles: {', '.join(sorted(PERFORMANCE_PROFILES))}"
+        )
+
+    profile = {
+        "name": name,
+        "sqlite": dict(PERFORMANCE_PROFILES[name]["sqlite"]),
+        "postgres": dict(PERFORMANCE_PROFILES[name]["postgres"]),
+    }
+    for key, (env_name, convert) in POSTGRES_POOL_ENV.items():
+        if environ.get(env_name):
+            try:
+                profile["postgres"][key] = convert(environ[env_name])
+            except ValueError:
+                raise ValueError(f"{env_name} must be an integer, got '{environ[env_name]}'")
+    return profile
+
+def validate_profile(profile):
+    """Raise ValueError if a profile has settings the database would reject"""
+    errors = []
+    sqlite = profile["sqlite"]
+    postgres = profile["postgres"]
+
+    if "journal_mode" in sqlite and sqlite["journal_mode"].upper() not in SQLITE_JOURNAL_MODES:
+        errors.append(f"journal_mode must be one of {sorted(SQLITE_JOURNAL_MODES)}")
+    if "synchronous" in sqlite and sqlite["synchronous"].upper() not in SQLITE_SYNCHRONOUS_MODES:
+        errors.append(f"synchronous must be one of {sorted(SQLITE_SYNCHRONOUS_MODES)}")
+    for key in ("busy_timeout", "mmap_size"):
+        if key in sqlite and (not isinstance(sqlite[key], int) or sqlite[key] < 0):
+            errors.append(f"{key} must be a non-negative integer")
+    if "cache_size" in sqlite and not isinstance(sqlite["cache_size"], int):
+        errors.append("cache_size must be an integer")
+
+    if "pool_size" in postgres and postgres["pool_size"] < 1:
+        errors.append("pool_size must be at least 1")
+    for key in ("max_overflow", "pool_timeout"):
+        if key in postgres and postgres[key] < 0:
+            errors.append(f"{key} must be non-negative")
+    if "pool_recycle" in postgres and postgres["pool_recycle"] < -1:
+        errors.append("pool_recycle must be -1 (disabled) or a number of seconds")
+
+    if errors:
+        raise ValueError(f"Invalid database profile '{profile['name']}': " + "; ".join(errors))
+
+def _sqlite_pragma_hook(pragmas):
+    """Build a connect listener that applies PRAGMAs to each new SQLite connection"""
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for key, value in pragmas.items():
+                cursor.execute(f"PRAGMA {key}={value}")
+        finally:
+            cursor.close()
+    return set_pragmas
+
+def build_engine(url, profile=None):
+    """Create an engine for url tuned according to a performance profile"""
+    profile = profile or load_profile()
+    validate_profile(profile)
+
+    if url.startswith('sqlite'):
+        new_engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False}
+        )
+        if profile["sqlite"]:
+            event.listen(new_engine, "connect", _sqlite_pragma_hook(profile["sqlite"]))
+    else:
+        new_engine = create_engine(url, **profile["postgres"])
+    return new_engine
+
 # Create engine with appropriate settings
-if DATABASE_URL.startswith('sqlite'):
-    engine = create_engine(
-        DATABASE_URL, 
-        connect_args={"check_same_thread": False}  
-    )
-else:
-    engine = create_engine(DATABASE_URL)
+DB_PROFILE = load_profile()
+engine = build_engine(DATABASE_URL, DB_PROFILE)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def get_db():
+def add_missing_columns(bind, metadata=Base.metadata):
+    """Add nullable columns that exist in the models but not yet in the database.
+
+    create_all only creates missing tables, so this keeps existing databases
+    usable when a model gains a new optional column.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+
+def add_missing_indexes(bind, metadata=Base.metadata):
+    """Create indexes declared on the models but missing from existing tables"""
+    existing_tables = set(inspect(bind).get_table_names())
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+class SchemaMismatch(RuntimeError):
+    """Raised at startup when the database lacks tables or columns the models use"""
+
+def missing_schema(bind, metadata=Base.metadata):
+    """Tables and table.columns declared on the models but absent from the database"""
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            missing.append(table.name)
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing += [f"{table.name}.{column.name}" for column in table.columns if column.name not in existing]
+    return missing
+
+class ReplicaRouter:
+    """Send reads to healthy replicas in round-robin, falling back to the primary.
+
+    Clients that wrote recently are pinned to the primary for a short
+    window so they always read their own writes despite replication lag.
+    """
+
+    def __init__(self, primary, replicas=(), health_interval=REPLICA_HEALTH_INTERVAL,
+                 read_your_writes=READ_YOUR_WRITES_SECONDS, max_tracked_clients=10000,
+                 clock=time.monotonic):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.health_interval = health_interval
+        self.read_your_writes = read_your_writes
+        self.max_tracked_clients = max_tracked_clients
+        self.clock = clock
+        self._sessions = {
+            e: sessionmaker(autocommit=False, autoflush=False, bind=e)
+            for e in [primary] + self.replicas
+        }
+        self._turn = itertools.count()
+        self._health = {}  # engine -> (healthy, checked_at)
+        self._recent_writes = OrderedDict()  # client key -> pinned until
+        self._lock = threading.Lock()
+
+    def mark_write(self, keys):
+        """Pin the given client keys to the primary for the read-your-writes window"""
+        until = self.clock() + self.read_your_writes
+        with self._lock:
+            for key in keys:
+                self._recent_writes[key] = until
+                self._recent_writes.move_to_end(key)
+            while len(self._recent_writes) > self.max_tracked_clients:
+                self._recent_writes.popitem(last=False)
+
+    def recently_wrote(self, keys):
+        now = self.clock()
+        with self._lock:
+            # Entries are kept in expiry order, so expired ones sit at the front
+            while self._recent_writes:
+                key, until = next(iter(self._recent_writes.items()))
+                if until > now:
+                    break
+                self._recent_writes.popitem(last=False)
+            return any(key in self._recent_writes for key in keys)
+
+    def is_healthy(self, replica):
+        """Check a replica with SELECT 1, caching the result for health_interval seconds"""
+        now = self.clock()
+        healthy, checked_at = self._health.get(replica, (True, None))
+        if checked_at is not None and now - checked_at < self.health_interval:
+            return healthy
+        try:
+            with replica.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            healthy = True
+        except Exception:
+            healthy = False
+        self._health[replica] = (healthy, now)
+        return healthy
+
+    def mark_unhealthy(self, replica):
+        """Skip a replica until its next health check, health_interval seconds from now"""
+        if replica is not self.primary:
+            self._health[replica] = (False, self.clock())
+
+    def read_engine(self, keys=()):
+        """Pick the engine a read-only request should use"""
+        if not self.replicas or (keys and self.recently_wrote(keys)):
+            return self.primary
+        start = next(self._turn)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if self.is_healthy(replica):
+                return replica
+        return self.primary
+
+    def read_session(self, keys=()):
+        """Session on the engine read_engine() picks, connected up front.
+
+        A replica that fails to connect despite a cached healthy result is
+        marked down, and the request reads from the primary instead.
+        """
+        replica = self.read_engine(keys)
+        session = self._sessions[replica]()
+        if replica is self.primary:
+            return session
+        try:
+            session.connection()
+        except OperationalError:
+            session.close()
+            self.mark_unhealthy(replica)
+            return self._sessions[self.primary]()
+        return session
+
+read_router = ReplicaRouter(engine, [build_engine(url, DB_PROFILE) for url in DATABASE_REPLICA_URLS])
+
+def dispose_after_fork():
+    """Forget pooled connections inherited from the parent without closing its sockets"""
+    for e in [engine] + read_router.replicas:
+        e.dispose(close=False)
+
+# Forked workers (see prefork.py) must open their own connections
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=dispose_after_fork)
+
+def subject_key(subject):
+    """Pinning key for a user, as named by the "sub" claim of their access tokens"""
+    return "sub:" + hashlib.sha256(subject.encode()).hexdigest()
+
+def client_keys(request):
+    """Keys identifying the client behind a request for read-your-writes pinning"""
+    authorization = request.headers.get("authorization")
+    if authorization:
+        # Routing only, so the claims are read without verifying the signature; get_current_user still does
+        scheme, _, token = authorization.partition(" ")
+        try:
+            subject = jwt.get_unverified_claims(token).get("sub") if scheme.lower() == "bearer" else None
+        except JWTError:
+            subject = None
+        if isinstance(subject, str):
+            return [subject_key(subject)]
+        # The token alone: pinning the address too would send everyone behind the same NAT or proxy to the primary
+        return ["auth:" + hashlib.sha256(authorization.encode()).hexdigest()]
+    return [f"ip:{request.client.host}"] if request.client else []
+
+def pin_subject(subject):
+    """Pin a user to the primary, e.g. on issuing a token after an anonymous signup or login"""
+    read_router.mark_write([subject_key(subject)])
+
+@event.listens_for(SessionLocal, "after_flush")
+def _remember_write(session, flush_context):
+    session.info["wrote"] = True
+
+def get_db(request: Request = None):
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        if request is not None and db.info.get("wrote"):
+            read_router.mark_write(client_keys(request))
+        db.close()
+
+def get_read_db(request: Request = None):
+    """Session for read-only endpoints, served by a replica when one is configured"""
+    db = read_router.read_session(client_keys(request) if request is not None else ())
+    try:
+        yield db
+    except OperationalError:
+        # The replica went away mid-request; later requests skip it until its health check passes
+        read_router.mark_unhealthy(db.get_bind())
+        raise
+    finally:
+        db.close()
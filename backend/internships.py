@@ -0,0 +1,341 @@
+"""Storing scraped internships.
+
+ingest_internships() takes listings as the scrapers return them. The
+frontend's camelCase field names are accepted too. Each listing is
+normalised to Internship columns: whitespace collapsed, lengths capped,
+skills deduplicated, dates parsed, and the stipend read into a monthly
+amount. Listings are deduplicated on a canonical key: a hash of the
+source and external id, or of the source, title and company when the
+board gives no id.
+
+Rows are written in chunks of INGEST_CHUNK_SIZE. Each chunk first looks
+up the stored record hashes for its keys, so unchanged listings are
+skipped without a write. The rest go in one multi-row
+INSERT ... ON CONFLICT (canonical_key) DO UPDATE. That conflict clause
+also settles a race with a concurrent ingest of the same listing.
+
+list_internships() serves the listing pages with keyset pagination. The
+cursor carries the last row's (sort value, id), and the next page starts
+strictly after it. That walks a (filter, sort value, id) index however deep
+the client pages, where an OFFSET would read and discard every earlier row.
+Only the columns a list card shows are selected; get_internship() returns
+the full record.
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import Internship, JSONContains
+
+INGEST_CHUNK_SIZE = int(os.environ.get('INGEST_CHUNK_SIZE', '500'))
+
+# Frontend (internshipData.js) and scraper field names mapped to column names
+FIELD_ALIASES = {
+    "postedDate": "posted_date",
+    "posted": "posted_date",
+    "applicationCount": "application_count",
+    "companySize": "company_size",
+    "externalId": "external_id",
+}
+
+STRING_COLUMNS = {
+    column.name: column.type.length
+    for column in Internship.__table__.columns
+    if getattr(column.type, "length", None) and column.name not in ("canonical_key", "record_hash")
+}
+LIST_COLUMNS = ("skills", "requirements", "benefits")
+TEXT_COLUMNS = ("description",)
+
+# Used only when a listing has no category; within a text, the first category with a match wins
+CATEGORY_KEYWORDS = [
+    ("data", ("data", "analytics", "machine learning", " ai ")),
+    ("design", ("design", " ux", " ui ", "graphic")),
+    ("marketing", ("marketing", "social media", "content", "brand")),
+    ("finance", ("finance", "accounting", "audit", "investment", "banking")),
+    ("engineering", ("mechanical", "electrical", "civil", "chemical", "aerospace", "manufacturing")),
+    ("technology", ("software", "developer", "engineer", " it ", "cyber", "devops", "web")),
+    ("business", ("business", "operations", "sales", " hr ", "human resource", "consult")),
+]
+
+# Rough conversions to a monthly stipend
+STIPEND_PERIODS = [("hour", 160), ("day", 20), ("week", 4), ("year", 1 / 12), ("annum", 1 / 12)]
+
+AMOUNT = re.compile(r"\d[\d,]*(?:\.\d+)?")
+ISO_DATE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+DMY_DATE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})$")
+RELATIVE_DATE = re.compile(r"(\d+)\+?\s*(day|week|month)s?\s+ago")
+
+def _clean(value):
+    if value is None:
+        return None
+    return " ".join((value if isinstance(value, str) else str(value)).split()) or None
+
+def _fold(value):
+    return (_clean(value) or "").casefold()
+
+def canonical_key(source, external_id=None, title=None, company=None):
+    """Dedupe key: source plus external id, falling back to title and company"""
+    if external_id:
+        identity = f"{_fold(source)}\x1fid\x1f{_clean(external_id)}"
+    else:
+        identity = f"{_fold(source)}\x1ftc\x1f{_fold(title)}\x1f{_fold(company)}"
+    return hashlib.blake2b(identity.encode(), digest_size=16).hexdigest()
+
+def parse_date(value, today=None):
+    """date from a date, ISO or DD/MM/YYYY text, or "3 days ago"; None if unreadable"""
+    if value is None or isinstance(value, date):
+        return value.date() if isinstance(value, datetime) else value
+    text = _fold(value)
+    if not text:
+        return None
+    # Regexes first: strptime is slow, and slower still when it fails
+    match = ISO_DATE.match(text) or DMY_DATE.match(text)
+    if match:
+        first, second, third = map(int, match.groups())
+        try:
+            return date(first, second, third) if match.re is ISO_DATE else date(third, second, first)
+        except ValueError:
+            return None
+    today = today or date.today()
+    if text in ("today", "just posted", "new"):
+        return today
+    if text == "yesterday":
+        return today - timedelta(days=1)
+    match = RELATIVE_DATE.search(text)
+    if match:
+        count, unit = int(match.group(1)), match.group(2)
+        return today - timedelta(days=count * {"day": 1, "week": 7, "month": 30}[unit])
+    for fmt in ("%d %b %Y", "%d %B %Y"):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    return None
+
+def monthly_stipend(stipend):
+    """Monthly amount from stipend text like "S$1,200/month" or "$10 per hour"; None if absent"""
+    if stipend is None:
+        return None
+    if isinstance(stipend, (int, float)):
+        return int(stipend)
+    match = AMOUNT.search(stipend)
+    if not match:
+        return None
+    amount = float(match.group().replace(",", ""))
+    text = stipend.lower()
+    for period, factor in STIPEND_PERIODS:
+        if period in text:
+            amount *= factor
+            break
+    return round(amount)
+
+def infer_category(title, description=None):
+    """Category guessed from keywords in the title, then the start of the description"""
+    for text in (f" {_fold(title)} ", f" {_fold(description[:200] if description else None)} "):
+        for category, keywords in CATEGORY_KEYWORDS:
+            if any(keyword in text for keyword in keywords):
+                return category
+    return None
+
+def _string_list(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    seen, items = set(), []
+    for item in value:
+        item = _clean(item)
+        if item and item.casefold() not in seen:
+            seen.add(item.casefold())
+            items.append(item)
+    return items
+
+def _count(value):
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def normalise(listing, today=None):
+    """Internship column values for one listing, or None if it lacks a title, company or source"""
+    raw = {FIELD_ALIASES.get(key, key): value for key, value in listing.items()}
+    row = dict.fromkeys(STRING_COLUMNS)
+    for name in raw.keys() & STRING_COLUMNS.keys():
+        value = _clean(raw[name])
+        row[name] = value[:STRING_COLUMNS[name]] if value else None
+    for name in TEXT_COLUMNS:
+        row[name] = _clean(raw.get(name))
+    for name in LIST_COLUMNS:
+        row[name] = _string_list(raw.get(name))
+    if not (row["title"] and row["company"] and row["source"]):
+        return None
+
+    row["source"] = row["source"].lower()
+    row["category"] = (row["category"] or infer_category(row["title"], row["description"]) or "")[:32] or None
+    row["stipend_monthly"] = monthly_stipend(raw.get("stipend_monthly", raw.get("stipend")))
+    row["deadline"] = parse_date(raw.get("deadline"), today)
+    row["posted_date"] = parse_date(raw.get("posted_date"), today)
+    row["application_count"] = _count(raw.get("application_count"))
+
+    row["canonical_key"] = canonical_key(row["source"], row["external_id"], row["title"], row["company"])
+    # Keys are always added in the same order, so the repr of the values is a stable, cheap fingerprint
+    row["record_hash"] = hashlib.blake2b(repr(tuple(row.values())).encode(), digest_size=16).hexdigest()
+    return row
+
+def _insert(dialect_name):
+    if dialect_name == "postgresql":
+        return postgresql.insert
+    if dialect_name == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Bulk ingestion needs INSERT ... ON CONFLICT, which {dialect_name} lacks")
+
+# Columns overwritten when a listing changes; created_at keeps the first sighting
+UPDATED_COLUMNS = [column.name for column in Internship.__table__.columns
+                   if column.name not in ("id", "canonical_key", "created_at")]
+
+def ingest_internships(db, listings, chunk_size=INGEST_CHUNK_SIZE, today=None):
+    """Normalise, dedupe and upsert listings; commits and returns counts of what happened"""
+    report = {"received": 0, "invalid": 0, "duplicates": 0, "inserted": 0, "updated": 0, "unchanged": 0}
+    today = today or date.today()
+    rows = {}
+    for listing in listings:
+        report["received"] += 1
+        row = normalise(listing, today)
+        if row is None:
+            report["invalid"] += 1
+            continue
+        if row["canonical_key"] in rows:
+            report["duplicates"] += 1
+        rows[row["canonical_key"]] = row  # the last sighting in a batch wins
+
+    table = Internship.__table__
+    statement = _insert(db.get_bind().dialect.name)(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.canonical_key],
+        set_={name: statement.excluded[name] for name in UPDATED_COLUMNS},
+        where=table.c.record_hash != statement.excluded.record_hash,
+    ).returning(table.c.id)
+    pending = list(rows.values())
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        stored = dict(db.execute(
+            select(table.c.canonical_key, table.c.record_hash)
+            .where(table.c.canonical_key.in_([row["canonical_key"] for row in chunk]))
+        ).all())
+        now = datetime.utcnow()
+        changed = []
+        for row in chunk:
+            previous = stored.get(row["canonical_key"])
+            if previous == row["record_hash"]:
+                report["unchanged"] += 1
+                continue
+            report["updated" if previous else "inserted"] += 1
+            changed.append({**row, "created_at": now, "updated_at": now})
+        if changed:
+            # RETURNING makes SQLAlchemy batch the rows into multi-row VALUES on SQLite as well as Postgres
+            db.execute(statement, changed).all()
+    db.commit()
+    return report
+
+# Sort name -> (column, descending). id breaks ties, so every row has a unique position.
+SORTS = {
+    "posted": ("posted_date", True),
+    "deadline": ("deadline", False),
+    "stipend": ("stipend_monthly", True),
+}
+CARD_COLUMNS = ("id", "title", "company", "location", "stipend", "stipend_monthly", "duration", "category", "logo",
+                "deadline", "posted_date", "skills", "source")
+DETAIL_COLUMNS = tuple(column.name for column in Internship.__table__.columns
+                       if column.name not in ("canonical_key", "record_hash"))
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that is malformed or belongs to a different sort"""
+
+def encode_cursor(sort, value, internship_id):
+    """Opaque cursor for the position after a row"""
+    if isinstance(value, date):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, internship_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor, sort):
+    """(sort value, id) from a cursor made by encode_cursor for the same sort"""
+    try:
+        cursor_sort, value, internship_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if cursor_sort != sort or not isinstance(internship_id, int):
+            raise ValueError(sort)
+        if value is not None and SORTS[sort][0] in ("posted_date", "deadline"):
+            value = date.fromisoformat(value)
+        elif value is not None and not isinstance(value, int):
+            raise ValueError(value)
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Invalid cursor")
+    return value, internship_id
+
+def list_internships(db, category=None, location=None, skills=(), source=None, deadline_from=None,
+                     deadline_to=None, sort="posted", limit=20, cursor=None):
+    """One page of list cards; returns (cards, cursor for the next page or None)"""
+    name, descending = SORTS[sort]
+    table = Internship.__table__
+    key, row_id = table.c[name], table.c.id
+    filters = []
+    if category:
+        filters.append(table.c.category == category)
+    if location:
+        filters.append(table.c.location == location)
+    if source:
+        filters.append(table.c.source == source.lower())
+    if skills:
+        filters.append(JSONContains(table.c.skills, skills))
+    if deadline_from:
+        filters.append(table.c.deadline >= deadline_from)
+    if deadline_to:
+        filters.append(table.c.deadline <= deadline_to)
+    after = decode_cursor(cursor, sort) if cursor else None
+    query = select(*[table.c[column] for column in CARD_COLUMNS]).where(*filters)
+
+    # Rows with a sort value come first, then rows without one. Each part is its own
+    # query in plain index order; NULLS LAST would sort instead, as SQLite indexes NULLs first.
+    rows = []
+    if after is None or after[0] is not None:
+        keyset = [key.is_not(None)]
+        if after is not None:
+            position = tuple_(key, row_id)
+            keyset.append(position < tuple_(*after) if descending else position > tuple_(*after))
+        order = (key.desc(), row_id.desc()) if descending else (key, row_id)
+        rows = db.execute(query.where(*keyset).order_by(*order).limit(limit + 1)).mappings().all()
+    if len(rows) <= limit and not (name == "deadline" and (deadline_from or deadline_to)):
+        keyset = [key.is_(None)]
+        if after is not None and after[0] is None:
+            keyset.append(row_id < after[1] if descending else row_id > after[1])
+        order = row_id.desc() if descending else row_id
+        rows += db.execute(query.where(*keyset).order_by(order).limit(limit + 1 - len(rows))).mappings().all()
+
+    cards = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = cards[-1]
+        next_cursor = encode_cursor(sort, last[name], last["id"])
+    return cards, next_cursor
+
+def get_internship(db, internship_id):
+    """Full record for the detail view, or None"""
+    table = Internship.__table__
+    row = db.execute(
+        select(*[table.c[column] for column in DETAIL_COLUMNS]).where(table.c.id == internship_id)
+    ).mappings().first()
+    return dict(row) if row else None
+
+def internship_updated_at(db, internship_id):
+    """updated_at of one internship, or None if it does not exist"""
+    return db.scalar(select(Internship.updated_at).where(Internship.id == internship_id))
+
+def internships_version(db):
+    """(row count, latest updated_at) of the internships table; changes whenever any listing page could"""
+    return tuple(db.execute(select(func.count(Internship.id), func.max(Internship.updated_at))).one())
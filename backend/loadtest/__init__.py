@@ -0,0 +1,15 @@
+"""Asyncio load generator for the API.
+
+    python -m loadtest signup-storm --requests 500 --concurrency 50 --out signup.json
+    python -m loadtest login-me --duration 30 --users 50 --login-ratio 0.1
+    python -m loadtest uploads --corpus ./resumes --requests 200
+
+By default a fresh copy of the app is started on a temporary SQLite
+database (see loadtest.server); pass --url to target a running instance.
+Each run prints and optionally saves a JSON report with throughput,
+status counts and p50/p90/p99/max latency per endpoint.
+"""
+from loadtest.harness import Recorder, run_scenario
+from loadtest.scenarios import SCENARIOS
+
+__all__ = ["Recorder", "run_scenario", "SCENARIOS"]
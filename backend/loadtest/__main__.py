@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+from loadtest.harness import run_scenario
+from loadtest.scenarios import SCENARIOS, LoginAndMe, Uploads
+from loadtest.server import LocalApp
+
+def build_scenario(args):
+    if args.scenario == LoginAndMe.name:
+        return LoginAndMe(users=args.users, login_ratio=args.login_ratio, seed=args.seed)
+    if args.scenario == Uploads.name:
+        return Uploads(corpus=args.corpus)
+    return SCENARIOS[args.scenario]()
+
+def print_summary(report):
+    print(f"{report['scenario']}: {report['total']['requests']} requests in {report['duration_s']:.1f}s "
+          f"at concurrency {report['concurrency']}", file=sys.stderr)
+    print(f"{'endpoint':<24}{'req/s':>9}{'errors':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}", file=sys.stderr)
+    for name, summary in list(report["endpoints"].items()) + [("total", report["total"])]:
+        latency = summary["latency_ms"]
+        print(f"{name:<24}{summary['throughput_rps']:>9}{summary['errors']:>8}"
+              + "".join(f"{latency[key]:>9}" for key in ("p50", "p90", "p99", "max")), file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description="Load test the API")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--url", help="target a running app instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="workers for the locally started app")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="leave the app's rate limits in place")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, help="number of iterations to run")
+    parser.add_argument("--duration", type=float, help="seconds to run for")
+    parser.add_argument("--users", type=int, default=20, help="accounts used by login-me")
+    parser.add_argument("--login-ratio", type=float, default=0.1, help="share of login-me iterations that log in")
+    parser.add_argument("--corpus", help="directory of resumes for uploads (default: generated PDFs)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    if args.requests is None and args.duration is None:
+        args.requests = 1000
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    scenario = build_scenario(args)
+
+    def run(url):
+        return asyncio.run(run_scenario(scenario, url, args.concurrency, args.requests, args.duration))
+
+    if args.url:
+        report = run(args.url)
+    else:
+        with LocalApp(workers=args.workers, keep_rate_limits=args.keep_rate_limits) as app:
+            report = run(app.url)
+            report["app"] = {"workers": args.workers, "rate_limits": args.keep_rate_limits}
+
+    print_summary(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
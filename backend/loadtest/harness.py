@@ -0,0 +1,123 @@
+"""Request timing, latency reports and the virtual-user loop."""
+import asyncio
+import itertools
+import math
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+class Recorder:
+    """Latencies and status codes per endpoint name"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, name, status, seconds):
+        self.latencies[name].append(seconds * 1000)
+        self.statuses[name][str(status)] += 1
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def _summary(self, latencies, statuses, elapsed):
+        errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+        return {
+            "requests": len(latencies),
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+            "errors": errors,
+            "statuses": dict(sorted(statuses.items())),
+            "latency_ms": {
+                "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+                "p50": _round(percentile(latencies, 50)),
+                "p90": _round(percentile(latencies, 90)),
+                "p99": _round(percentile(latencies, 99)),
+                "max": _round(max(latencies, default=None)),
+            },
+        }
+
+    def report(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        endpoints = {
+            name: self._summary(self.latencies[name], self.statuses[name], elapsed)
+            for name in sorted(self.latencies)
+        }
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        all_statuses = sum(self.statuses.values(), Counter())
+        return {
+            "duration_s": round(elapsed, 3),
+            "total": self._summary(all_latencies, all_statuses, elapsed),
+            "endpoints": endpoints,
+        }
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+class TimedClient:
+    """httpx.AsyncClient wrapper that records every request under an endpoint name"""
+
+    def __init__(self, client, recorder):
+        self.client = client
+        self.recorder = recorder
+
+    async def request(self, name, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception as e:
+            self.recorder.record(name, type(e).__name__, time.perf_counter() - started)
+            return None
+        self.recorder.record(name, response.status_code, time.perf_counter() - started)
+        return response
+
+async def run_scenario(scenario, base_url, concurrency=32, requests=None, duration=None, transport=None,
+                       timeout=60.0):
+    """Run scenario.setup() once, then scenario.iteration() from `concurrency` virtual users.
+
+    Stops after `requests` iterations or `duration` seconds, whichever is set
+    (both may be). Returns the JSON-ready report.
+    """
+    import httpx
+
+    if requests is None and duration is None:
+        raise ValueError("Pass requests, duration or both")
+
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, transport=transport) as client:
+        # Setup traffic (creating accounts, logging in) is not part of the measurement
+        await scenario.setup(TimedClient(client, Recorder()))
+
+        recorder = Recorder()
+        timed = TimedClient(client, recorder)
+        counter = iter(range(requests)) if requests is not None else itertools.count()
+        deadline = time.perf_counter() + duration if duration is not None else None
+
+        async def virtual_user():
+            for index in counter:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                await scenario.iteration(timed, index)
+
+        await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+        recorder.stop()
+
+    report = recorder.report()
+    return {
+        "scenario": scenario.name,
+        "started_at": started_at,
+        "base_url": base_url,
+        "concurrency": concurrency,
+        "iterations": requests,
+        "duration_limit_s": duration,
+        "options": scenario.options(),
+        **report,
+    }
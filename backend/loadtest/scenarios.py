@@ -0,0 +1,148 @@
+"""Traffic scenarios: signup storm, mixed login and /me, resume uploads.
+
+A scenario has a name, an async setup(client) run once before timing
+starts, and an async iteration(client, index) run repeatedly by the
+virtual users. Requests go through TimedClient.request(name, ...), and
+name is the endpoint label used in the report.
+"""
+import os
+import random
+import uuid
+
+PASSWORD = "Password123"
+
+def signup_payload(username):
+    return {
+        "full_name": f"Load {username}",
+        "username": username,
+        "email": f"{username}@example.com",
+        "confirm_email": f"{username}@example.com",
+        "dob": "2000-01-01",
+        "password": PASSWORD,
+        "confirm_password": PASSWORD,
+    }
+
+class Scenario:
+    name = None
+
+    def __init__(self):
+        # Unique per run so repeated runs against one database don't collide
+        self.run_id = uuid.uuid4().hex[:8]
+
+    async def setup(self, client):
+        pass
+
+    async def iteration(self, client, index):
+        raise NotImplementedError
+
+    def options(self):
+        return {}
+
+class SignupStorm(Scenario):
+    """Every iteration registers a new account"""
+    name = "signup-storm"
+
+    async def iteration(self, client, index):
+        await client.request("POST /signup", "POST", "/signup", json=signup_payload(f"ls{self.run_id}{index}"))
+
+class LoginAndMe(Scenario):
+    """Signed-up users mostly call /me, logging in again for a fraction of iterations"""
+    name = "login-me"
+
+    def __init__(self, users=20, login_ratio=0.1, seed=None):
+        super().__init__()
+        self.users = users
+        self.login_ratio = login_ratio
+        self.random = random.Random(seed)
+        self.tokens = {}
+
+    def username(self, user):
+        return f"lm{self.run_id}{user}"
+
+    async def setup(self, client):
+        for user in range(self.users):
+            await client.request("setup", "POST", "/signup", json=signup_payload(self.username(user)))
+            await self.login(client, user, "setup")
+
+    async def login(self, client, user, name="POST /token"):
+        response = await client.request(name, "POST", "/token",
+                                        data={"username": self.username(user), "password": PASSWORD})
+        if response is not None and response.status_code == 200:
+            self.tokens[user] = response.json()["access_token"]
+
+    async def iteration(self, client, index):
+        user = index % self.users
+        if user not in self.tokens or self.random.random() < self.login_ratio:
+            await self.login(client, user)
+        if user in self.tokens:
+            await client.request("GET /me", "GET", "/me", headers={"Authorization": f"Bearer {self.tokens[user]}"})
+
+    def options(self):
+        return {"users": self.users, "login_ratio": self.login_ratio}
+
+class Uploads(Scenario):
+    """Concurrent resume uploads, cycling through a corpus directory or generated PDFs"""
+    name = "uploads"
+
+    def __init__(self, corpus=None, generated=20):
+        super().__init__()
+        self.corpus = corpus
+        self.generated = generated
+        self.files = []
+
+    async def setup(self, client):
+        if self.corpus:
+            for entry in sorted(os.listdir(self.corpus)):
+                path = os.path.join(self.corpus, entry)
+                if os.path.isfile(path):
+                    with open(path, "rb") as f:
+                        self.files.append((entry, f.read()))
+            if not self.files:
+                raise ValueError(f"No files in corpus directory {self.corpus}")
+        else:
+            self.files = [(f"resume{i}.pdf", sample_resume_pdf(i, self.run_id)) for i in range(self.generated)]
+
+    async def iteration(self, client, index):
+        filename, content = self.files[index % len(self.files)]
+        content_type = "application/pdf" if filename.lower().endswith(".pdf") else "application/octet-stream"
+        await client.request("POST /upload-resume", "POST", "/upload-resume",
+                             files={"resume": (filename, content, content_type)})
+
+    def options(self):
+        return {"corpus": self.corpus, "files": len(self.files)}
+
+SCENARIOS = {scenario.name: scenario for scenario in (SignupStorm, LoginAndMe, Uploads)}
+
+def sample_resume_pdf(index, run_id=""):
+    """A one-page text PDF resume, small enough to build without a PDF library"""
+    lines = [
+        f"Candidate {index}",
+        f"candidate{index}.{run_id}@example.com",
+        "+65 9123 4567",
+        "Software Engineer Intern",
+        "Education: Bachelor of Computing, National University of Singapore",
+        "Skills: Python, SQL, React, Docker, AWS, machine learning",
+        "Experience: Backend intern at Example Pte Ltd, Jan 2024 - Jun 2024",
+        "Built data pipelines and REST APIs with FastAPI and PostgreSQL.",
+    ]
+    text = "BT /F1 11 Tf 50 780 Td 14 TL " + " ".join(
+        "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") Tj T*" for line in lines
+    ) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents 4 0 R "
+        "/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(text)} >>\nstream\n{text}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return pdf
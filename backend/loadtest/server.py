@@ -0,0 +1,89 @@
+"""Start a throwaway copy of the app for a load test run.
+
+The app runs in a subprocess (uvicorn, or prefork.py for several workers)
+so the load generator never competes with it for the GIL. It gets a
+temporary working directory and a fresh SQLite database, created with
+CREATE_SCHEMA=1. The rate limits are lifted unless asked otherwise, since
+every virtual user shares one IP. The run starts once /health reports
+"healthy", that is after the parser model has loaded.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+UNLIMITED = "1000000000/1"
+RATE_LIMIT_ENV = ("RATE_LIMIT_TOKEN_IP", "RATE_LIMIT_TOKEN_ACCOUNT", "RATE_LIMIT_SIGNUP_IP", "RATE_LIMIT_SIGNUP_ACCOUNT")
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class LocalApp:
+    """Context manager running the app on 127.0.0.1 until exit"""
+
+    def __init__(self, workers=1, port=None, keep_rate_limits=False, env=None, startup_timeout=120):
+        self.workers = workers
+        self.port = port or free_port()
+        self.keep_rate_limits = keep_rate_limits
+        self.extra_env = env or {}
+        self.startup_timeout = startup_timeout
+        self.workdir = None
+        self.process = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.workdir = tempfile.mkdtemp(prefix="loadtest-")
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(self.workdir, 'loadtest.db')}",
+                   CREATE_SCHEMA="1")
+        if not self.keep_rate_limits:
+            env.update({name: UNLIMITED for name in RATE_LIMIT_ENV})
+        env.update(self.extra_env)
+
+        if self.workers > 1:
+            command = [sys.executable, os.path.join(BACKEND_DIR, "prefork.py"),
+                       "--workers", str(self.workers), "--host", "127.0.0.1", "--port", str(self.port),
+                       "--log-level", "warning"]
+        else:
+            command = [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+                       "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"]
+        self.log = open(os.path.join(self.workdir, "server.log"), "wb")
+        self.process = subprocess.Popen(command, cwd=self.workdir, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+        self._wait_until_healthy()
+        return self
+
+    def _wait_until_healthy(self):
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"App exited during startup; see {self.log.name}")
+            try:
+                with urllib.request.urlopen(self.url + "/health", timeout=1) as response:
+                    # Keep waiting while the parser model is still loading
+                    if json.load(response).get("status") == "healthy":
+                        return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"App did not become healthy within {self.startup_timeout}s")
+
+    def __exit__(self, *exc_info):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.log.close()
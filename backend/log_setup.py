@@ -0,0 +1,201 @@
+"""Logging that keeps handler I/O off the request path.
+
+configure_logging() puts a single QueueHandler on the root logger. Any
+thread that logs, including the event loop, only appends the record to an
+in-memory queue. A QueueListener thread takes records off the queue and
+writes them to stderr and, if LOG_FILE is set, to that file. A slow disk
+then delays the listener, not the requests.
+
+Records are JSON objects, one per line, unless LOG_FORMAT=text is set.
+Fields passed with extra={...} are kept as top-level keys.
+
+LOG_SAMPLE_RATES thins out noisy loggers, for example
+"parser=0.1,uvicorn.access=0.25". A rate applies to the logger and its
+children. Only records below WARNING are sampled, and records that are
+kept carry a sample_rate field.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+LOG_FILE = os.environ.get('LOG_FILE')
+LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', '')
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has, plus uvicorn's ANSI-coloured duplicate of the message;
+# anything else came in through extra={...}
+RESERVED_ATTRS = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName", "color_message"}
+
+def parse_sample_rates(spec):
+    """Parse "name=rate,name=rate" into a dict of logger name to rate"""
+    rates = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, rate = item.partition("=")
+        rate = float(rate)
+        if not 0 <= rate <= 1:
+            raise ValueError(f"Sample rate for {name.strip()} must be between 0 and 1, got {rate}")
+        rates[name.strip()] = rate
+    return rates
+
+class JSONFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fixed share of each sampled logger's records below WARNING"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._resolved = {}
+        self._counts = {}
+
+    def rate_for(self, name):
+        rate = self._resolved.get(name)
+        if rate is None:
+            # The most specific configured ancestor wins
+            rate, candidate = 1.0, name
+            while candidate:
+                if candidate in self.rates:
+                    rate = self.rates[candidate]
+                    break
+                candidate = candidate.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1:
+            return True
+        # Counting instead of drawing random numbers keeps exactly rate of the records;
+        # concurrent threads may race on the count, which only shifts which ones are kept
+        seen = self._counts.get(record.name, 0) + 1
+        self._counts[record.name] = seen
+        if int(seen * rate) == int((seen - 1) * rate):
+            return False
+        record.sample_rate = rate
+        return True
+
+class LogQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener's handlers"""
+
+    def prepare(self, record):
+        # Render the message and traceback now, since args may change after the call returns,
+        # but keep them apart so the JSON formatter can put the traceback in its own field
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+_handler = None
+_listener = None
+_lock = threading.Lock()
+
+def build_formatter(fmt):
+    if fmt == "json":
+        return JSONFormatter()
+    if fmt == "text":
+        return logging.Formatter(TEXT_FORMAT)
+    raise ValueError(f"Unknown LOG_FORMAT {fmt!r}, expected 'json' or 'text'")
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, log_file=LOG_FILE, sample_rates=LOG_SAMPLE_RATES,
+                      stream=None, force=False):
+    """Route all logging through a queue; a repeat call is a no-op unless force is set"""
+    global _handler, _listener
+    if _listener is not None and not force:
+        return _listener
+    formatter = build_formatter(fmt)
+    handlers = [logging.StreamHandler(stream or sys.stderr)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    with _lock:
+        _stop()
+        _handler = LogQueueHandler(queue.SimpleQueue())
+        if isinstance(sample_rates, str):
+            sample_rates = parse_sample_rates(sample_rates)
+        if sample_rates:
+            _handler.addFilter(SamplingFilter(sample_rates))
+        _listener = QueueListener(_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
+        root = logging.getLogger()
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+        for existing in root.handlers[:]:
+            if isinstance(existing, LogQueueHandler):
+                root.removeHandler(existing)
+        root.addHandler(_handler)
+
+        # uvicorn's default config gives its loggers their own stderr handlers; send them through the queue too
+        for name in ("uvicorn", "uvicorn.access"):
+            logger = logging.getLogger(name)
+            for existing in logger.handlers[:]:
+                logger.removeHandler(existing)
+            logger.propagate = True
+    return _listener
+
+def _stop():
+    global _handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+    _handler = _listener = None
+
+def stop_logging():
+    """Flush queued records and detach the queue handler"""
+    with _lock:
+        _stop()
+
+def _restart_listener_in_child():
+    # A forked child has the queue but not the listener thread; give it fresh ones
+    global _listener, _lock
+    _lock = threading.Lock()
+    if _listener is None:
+        return
+    _handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
+atexit.register(stop_logging)
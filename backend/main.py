@@ -1,26 +1,96 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File 
+# Imported first so the startup report's clock covers the rest of the import
+from startup import startup_report, BackgroundLoad, FirstResponseMiddleware, CREATE_SCHEMA
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Query, BackgroundTasks, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr, validator
-from datetime import date
+from datetime import date, timedelta
 from typing import Optional, List, Dict, Any
+import logging
 import os
+import time
 import uuid
 
-from database import engine, get_db, SessionLocal, Base
+from log_setup import configure_logging
+from database import engine, get_db, get_read_db, pin_subject, SessionLocal, Base, add_missing_columns, add_missing_indexes, missing_schema, SchemaMismatch
 from models import User, Candidate
-from auth import get_password_hash, create_access_token, verify_password, get_current_user
-from parser import parse_resume, logging
+from auth import load_password_backend, create_access_token, get_current_user, password_needs_rehash, ACCESS_TOKEN_EXPIRE_MINUTES
+from password_service import password_hasher, PasswordServiceBusy
+from admission import resume_parse_admission, AdmissionRejected
+from refresh_tokens import issue_refresh_token, rotate_refresh_token, revoke_refresh_token, InvalidRefreshToken
+from parser import parse_resume, load_model as load_parser_model
+from search import ensure_search_index, missing_search_index, index_candidate, search_candidates, candidates_version
+from internships import SORTS, InvalidCursor, list_internships, get_internship, internship_updated_at, internships_version
+from query_stats import QueryStatsMiddleware
+from rate_limit import RateLimitMiddleware, rate_limiter
+from profiling import ProfilingMiddleware
+from tracing import TracingMiddleware, span, exporter as span_exporter
+from metrics import metrics, MetricsMiddleware, resume_parse_duration, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from token_cache import token_cache, UserSnapshot
+from responses import FastJSONResponse, model_response
+from conditional import conditional_response, make_etag
 
-app = FastAPI(title="User Authentication API", version="1.0.0")
-logger = logging.getLogger("uvicorn.error")
+configure_logging()
+logger = logging.getLogger("api")
 
-#Creating database tables
-Base.metadata.create_all(bind=engine)
+def create_schema():
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    add_missing_indexes(engine)
+    ensure_search_index(engine)
 
-#CORS setup for frontend
+def check_schema():
+    """Refuse to start against a database older than the models, rather than fail every request"""
+    missing = missing_schema(engine) + missing_search_index(engine)
+    if missing:
+        raise SchemaMismatch(
+            f"Database schema is out of date, missing: {', '.join(missing)}. "
+            "Start once with CREATE_SCHEMA=1 to create them."
+        )
+
+parser_warmup = BackgroundLoad("parser", load_parser_model, startup_report)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if CREATE_SCHEMA:
+        with startup_report.phase("schema"):
+            await run_in_threadpool(create_schema)
+    else:
+        with startup_report.phase("schema_check"):
+            await run_in_threadpool(check_schema)
+    with startup_report.phase("password_backend"):
+        await run_in_threadpool(load_password_backend)
+    parser_warmup.start()
+    startup_report.log("Serving requests, parser loading in the background")
+    yield
+
+app = FastAPI(title="User Authentication API", version="1.0.0", lifespan=lifespan,
+              default_response_class=FastJSONResponse)
+
+#Import-to-first-response time for the startup report
+app.add_middleware(FirstResponseMiddleware, report=startup_report)
+
+#Per-request SQL statement counts in Server-Timing headers
+app.add_middleware(QueryStatsMiddleware)
+
+#Request counts, latency histograms and in-flight gauges for /metrics
+app.add_middleware(MetricsMiddleware)
+
+#Token-bucket limits on /token and /signup, checked before any bcrypt work
+app.add_middleware(RateLimitMiddleware)
+
+#Per-request profiling, enabled by PROFILE_TOKEN or PROFILE_SAMPLE_RATE
+app.add_middleware(ProfilingMiddleware)
+
+#Request spans exported to TRACE_FILE, enabled by TRACE_SAMPLE_RATE
+app.add_middleware(TracingMiddleware)
+
+#CORS setup for frontend (added last so it wraps every other middleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -35,6 +105,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def app_metrics():
+    """Scrape-time values kept by the hashing pool, caches and rate limiter"""
+    hasher = password_hasher.stats()
+    cache = token_cache.stats()
+    values = [
+        ("password_hash_pending", "gauge", "bcrypt calls running or queued", hasher["pending"]),
+        ("password_hash_rejected_total", "counter", "bcrypt calls rejected because the queue was full", hasher["rejected"]),
+        ("token_cache_hits_total", "counter", "Authenticated requests served from the token cache", cache["hits"]),
+        ("token_cache_misses_total", "counter", "Authenticated requests that verified the token", cache["misses"]),
+        ("rate_limit_rejected_total", "counter", "Requests rejected by the rate limiter", rate_limiter.rejected),
+    ]
+    admission = resume_parse_admission.stats()
+    values += [
+        ("resume_parse_in_flight", "gauge", "Resume parses running", admission["in_flight"]),
+        ("resume_parse_queue_depth", "gauge", "Resume uploads waiting for a parse slot", admission["queue_depth"]),
+        ("resume_parse_rejected_queue_full_total", "counter", "Uploads rejected with 429 because the queue was full", admission["rejected_queue_full"]),
+        ("resume_parse_rejected_timeout_total", "counter", "Uploads rejected with 503 after waiting too long", admission["rejected_timeout"]),
+    ]
+    values += [
+        ("trace_spans_exported_total", "counter", "Spans written to the trace file", span_exporter.exported),
+        ("trace_spans_dropped_total", "counter", "Spans dropped because the export queue was full or the write failed", span_exporter.dropped),
+    ]
+    checkedout = getattr(engine.pool, "checkedout", None)
+    if checkedout is not None:
+        values.append(("db_pool_checked_out", "gauge", "Database connections currently checked out", checkedout()))
+    return values
+
+metrics.add_collector(app_metrics)
+
+def password_service_busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
 class UserCreate(BaseModel):
     full_name: str
     username: str
@@ -103,6 +209,11 @@ class CandidateResponse(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 @app.get("/")
 async def root():
@@ -110,13 +221,17 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "warming" if parser_warmup.loading else "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
 
 @app.get("/check-username")
-async def check_username(username: str, db: Session = Depends(get_db)):
+async def check_username(username: str, db: Session = Depends(get_read_db)):
     if len(username) < 3:
         return {"available": False, "message": "Username too short"}
-    
+
     user = db.query(User).filter(User.username == username.lower()).first()
     return {
         "available": user is None,
@@ -124,40 +239,45 @@ async def check_username(username: str, db: Session = Depends(get_db)):
     }
 
 @app.get("/check-email")
-async def check_email(email: str, db: Session = Depends(get_db)):
+async def check_email(email: str, db: Session = Depends(get_read_db)):
     user = db.query(User).filter(User.email == email.lower()).first()
     return {
         "available": user is None,
         "message": "Email available" if user is None else "Email already registered"
     }
 
-@app.post("/signup")
-async def signup(user: UserCreate, db: Session = Depends(get_db)):
-    # Check if username or email exists
+def duplicate_user_error(db: Session, username: str, email: str):
+    """400 naming the registered username or email, or None if neither is taken"""
     existing_user = db.query(User).filter(
-        (User.username == user.username.lower()) | 
-        (User.email == user.email.lower())
+        (User.username == username) | 
+        (User.email == email)
     ).first()
-    
-    if existing_user:
-        if existing_user.username == user.username.lower():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already exists"
-            )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
+    if existing_user is None:
+        return None
+    if existing_user.username == username:
+        return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists")
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+
+@app.post("/signup")
+async def signup(user: UserCreate, db: Session = Depends(get_db)):
+    username, email = user.username.lower(), user.email.lower()
+    error = duplicate_user_error(db, username, email)
+    if error is not None:
+        raise error
+
+    # Hand the connection back to the pool while bcrypt runs
+    db.close()
+
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordServiceBusy:
+        raise password_service_busy()
 
     try:
-        hashed_password = get_password_hash(user.password)
-        
         new_user = User(
             full_name=user.full_name,
-            username=user.username.lower(),
-            email=user.email.lower(),
+            username=username,
+            email=email,
             dob=user.dob,
             hashed_password=hashed_password
         )
@@ -168,6 +288,13 @@ async def signup(user: UserCreate, db: Session = Depends(get_db)):
         
         return {"message": "User created successfully", "user_id": new_user.id}
     
+    except IntegrityError:
+        # Registered since the check, or missed by the filter
+        db.rollback()
+        raise duplicate_user_error(db, username, email) or HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error creating user"
+        )
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -175,26 +302,95 @@ async def signup(user: UserCreate, db: Session = Depends(get_db)):
             detail="Error creating user"
         )
 
+async def upgrade_password_hash(user_id: int, old_hash: str, password: str):
+    """Re-hash a password at the current bcrypt cost after a successful login"""
+    try:
+        new_hash = await password_hasher.hash(password)
+    except PasswordServiceBusy:
+        return  # try again on a later login
+
+    db = SessionLocal()
+    try:
+        # Only replace the hash we verified, in case the password changed meanwhile
+        db.query(User).filter(
+            User.id == user_id, User.hashed_password == old_hash
+        ).update({User.hashed_password: new_hash}, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to upgrade password hash for user {user_id}: {str(e)}")
+    finally:
+        db.close()
+
 @app.post("/token", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(
+    background_tasks: BackgroundTasks,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db)
+):
     user = db.query(User).filter(
         (User.email == form_data.username.lower()) | 
         (User.username == form_data.username.lower())
     ).first()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # Hand the connection back to the pool while bcrypt runs
+    db.close()
+
+    try:
+        password_ok = user is not None and await password_hasher.verify(form_data.password, user.hashed_password)
+    except PasswordServiceBusy:
+        raise password_service_busy()
+
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username/email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    if password_needs_rehash(user.hashed_password):
+        background_tasks.add_task(upgrade_password_hash, user.id, user.hashed_password, form_data.password)
     
-    access_token = create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
+    refresh_token = issue_refresh_token(db, user.id)
+    db.commit()
+    return model_response(issue_tokens(user, refresh_token))
+
+def issue_tokens(user: User, refresh_token: str):
+    # The request carried no token, so its writes pinned only the address; pin the user the new token names
+    pin_subject(user.email)
+    expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    return Token(
+        access_token=create_access_token(data={"sub": user.email}, expires_delta=expires),
+        token_type="bearer",
+        refresh_token=refresh_token,
+        expires_in=int(expires.total_seconds()),
+    )
+
+@app.post("/token/refresh", response_model=Token)
+async def refresh_access_token(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Exchange a refresh token for a new access token and a rotated refresh token (no password check)"""
+    try:
+        user, refresh_token = rotate_refresh_token(db, request.refresh_token)
+    except InvalidRefreshToken as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return model_response(issue_tokens(user, refresh_token))
+
+@app.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_token(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Revoke a refresh token, e.g. on logout; unknown tokens are ignored"""
+    revoke_refresh_token(db, request.refresh_token)
 
 @app.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
-    return UserResponse.from_orm(current_user)
+async def get_current_user_info(request: Request, current_user: UserSnapshot = Depends(get_current_user)):
+    # The version comes with the cached user snapshot, so a 304 needs no query at all
+    etag = make_etag("user", current_user.id, current_user.updated_at) if current_user.updated_at else None
+    return conditional_response(
+        request, lambda: model_response(UserResponse.model_validate(current_user)), etag=etag,
+    )
 
 @app.post("/upload-resume", response_model=Dict[str, Any])  # More specific type hint
 async def upload_resume(
@@ -213,61 +409,84 @@ async def upload_resume(
                 detail=f"Invalid file type '{file_extension}'. Allowed types: PDF, DOC, DOCX, TXT"
             )
         
-        content = await resume.read()
+        with span("upload.read") as read_span:
+            content = await resume.read()
+            read_span.set("upload.bytes", len(content))
         if len(content) > 10 * 1024 * 1024:  # 10MB
             raise HTTPException(status_code=400, detail="File too large. Maximum size allowed: 10MB")
 
-        os.makedirs("uploads", exist_ok=True)
-        unique_filename = f"{uuid.uuid4()}_{resume.filename}"
-        filepath = os.path.join("uploads", unique_filename)
+        # Bounded parsing concurrency keeps an upload spike from starving cheap routes
+        try:
+            async with resume_parse_admission.slot():
+                os.makedirs("uploads", exist_ok=True)
+                unique_filename = f"{uuid.uuid4()}_{resume.filename}"
+                filepath = os.path.join("uploads", unique_filename)
 
-        with open(filepath, "wb") as f:
-            f.write(content)
+                with span("upload.write_temp"), open(filepath, "wb") as f:
+                    f.write(content)
+
+                parse_started = time.perf_counter()
+                with span("upload.parse"):
+                    parsed = await run_in_threadpool(parse_resume, filepath)
+                resume_parse_duration.labels("ok" if parsed and parsed.get('email') else "failed").observe(
+                    time.perf_counter() - parse_started
+                )
+        except AdmissionRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
-        parsed = parse_resume(filepath)
         if not parsed or not parsed.get('email'):
             raise HTTPException(status_code=400, detail="Failed to parse resume - no valid email found")
 
-        existing_candidate = db.query(Candidate).filter(
-            Candidate.email == parsed.get('email').lower()
-        ).first()
+        with span("upload.db_upsert") as upsert_span:
+            existing_candidate = db.query(Candidate).filter(
+                Candidate.email == parsed.get('email').lower()
+            ).first()
+            upsert_span.set("candidate.existing", existing_candidate is not None)
 
-        if existing_candidate:
-            existing_candidate.name = parsed.get('name') or existing_candidate.name
-            existing_candidate.phone = parsed.get('phone') or existing_candidate.phone
-            existing_candidate.designation = parsed.get('designation') or existing_candidate.designation
+            if existing_candidate:
+                existing_candidate.name = parsed.get('name') or existing_candidate.name
+                existing_candidate.phone = parsed.get('phone') or existing_candidate.phone
+                existing_candidate.designation = parsed.get('designation') or existing_candidate.designation
             
-            if parsed.get('skills'):
-                existing_candidate.set_skills(parsed.get('skills'))
-            if parsed.get('degree'):
-                existing_candidate.set_degree(parsed.get('degree'))
-            if parsed.get("experience"):
-                existing_candidate.set_experience(parsed.get("experience"))
+                if parsed.get('skills'):
+                    existing_candidate.set_skills(parsed.get('skills'))
+                if parsed.get('degree'):
+                    existing_candidate.set_degree(parsed.get('degree'))
+                if parsed.get("experience"):
+                    existing_candidate.set_experience(parsed.get("experience"))
+                if parsed.get("text"):
+                    existing_candidate.resume_text = parsed.get("text")
             
-            db.commit()
-            db.refresh(existing_candidate)
-            candidate_id = existing_candidate.id
-            logger.info(f"Updated existing candidate: {existing_candidate.email}")
-        else:
-            cand = Candidate(
-                name=parsed.get('name'),
-                email=parsed.get('email').lower(),
-                phone=parsed.get('phone'),
-                designation=parsed.get('designation')
-            )
-            cand.set_skills(parsed.get('skills', []))
-            cand.set_degree(parsed.get('degree', []))
-            cand.set_experience(parsed.get("experience", []))
+                db.flush()
+                index_candidate(db, existing_candidate)
+                db.commit()
+                db.refresh(existing_candidate)
+                candidate_id = existing_candidate.id
+                logger.info(f"Updated existing candidate: {existing_candidate.email}")
+            else:
+                cand = Candidate(
+                    name=parsed.get('name'),
+                    email=parsed.get('email').lower(),
+                    phone=parsed.get('phone'),
+                    designation=parsed.get('designation'),
+                    resume_text=parsed.get('text')
+                )
+                cand.set_skills(parsed.get('skills', []))
+                cand.set_degree(parsed.get('degree', []))
+                cand.set_experience(parsed.get("experience", []))
             
-            db.add(cand)
-            db.commit()
-            db.refresh(cand)
-            candidate_id = cand.id
-            logger.info(f"Created new candidate: {cand.email}")
+                db.add(cand)
+                db.flush()
+                index_candidate(db, cand)
+                db.commit()
+                db.refresh(cand)
+                candidate_id = cand.id
+                logger.info(f"Created new candidate: {cand.email}")
 
-        final_candidate = db.query(Candidate).filter(Candidate.id == candidate_id).first()
+        with span("upload.requery"):
+            final_candidate = db.query(Candidate).filter(Candidate.id == candidate_id).first()
 
-        return {
+        return FastJSONResponse({
             'status': 'success',
             'message': 'Resume processed successfully',
             'candidate_id': candidate_id,
@@ -280,7 +499,7 @@ async def upload_resume(
                 'experience': final_candidate.get_experience(),
                 'designation': final_candidate.designation
             }
-        }
+        })
 
     except HTTPException:
         raise
@@ -291,13 +510,79 @@ async def upload_resume(
     finally:
         if filepath and os.path.exists(filepath):
             try:
-                os.remove(filepath)
+                with span("upload.cleanup"):
+                    os.remove(filepath)
             except Exception as e:
                 logger.warning(f"Failed to clean up file {filepath}: {str(e)}")
         db.close()
 
+@app.get("/candidates/search")
+async def search_candidate_resumes(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0),
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Ranked full-text search over parsed resumes"""
+    # Any change to the candidates bumps this counter, so one primary-key lookup
+    # decides a 304 before the ranked search runs
+    version = candidates_version(db)
+    etag = make_etag("candidates/search", q, limit, offset, version) if version is not None else None
+
+    def render():
+        results = search_candidates(db, q, limit=limit, offset=offset)
+        return FastJSONResponse({"query": q, "count": len(results), "results": results})
+
+    return conditional_response(request, render, etag=etag)
+
+@app.get("/internships")
+async def list_internship_cards(
+    request: Request,
+    category: Optional[str] = Query(None, max_length=32),
+    location: Optional[str] = Query(None, max_length=255),
+    skills: List[str] = Query([]),
+    source: Optional[str] = Query(None, max_length=32),
+    deadline_from: Optional[date] = None,
+    deadline_to: Optional[date] = None,
+    sort: str = Query("posted", pattern=f"^({'|'.join(SORTS)})$"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, max_length=200),
+    db: Session = Depends(get_read_db)
+):
+    """Internship list cards, filtered and sorted, a keyset-paginated page at a time"""
+    # ?skills=Python&skills=SQL and ?skills=Python,SQL both work
+    skills = [skill.strip() for value in skills for skill in value.split(",") if skill.strip()]
+    count, latest = internships_version(db)
+    etag = make_etag(
+        "internships", category, location, skills, source, deadline_from, deadline_to, sort, limit, cursor,
+        count, latest,
+    ) if latest or not count else None
+
+    def render():
+        try:
+            items, next_cursor = list_internships(
+                db, category=category, location=location, skills=skills, source=source,
+                deadline_from=deadline_from, deadline_to=deadline_to, sort=sort, limit=limit, cursor=cursor,
+            )
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse({"items": items, "next_cursor": next_cursor})
+
+    return conditional_response(request, render, etag=etag)
+
+@app.get("/internships/{internship_id}")
+async def get_internship_detail(request: Request, internship_id: int, db: Session = Depends(get_read_db)):
+    """Full internship record for the detail view"""
+    updated_at = internship_updated_at(db, internship_id)
+    if updated_at is None:
+        raise HTTPException(status_code=404, detail="Internship not found")
+    etag = make_etag("internship", internship_id, updated_at)
+    return conditional_response(request, lambda: FastJSONResponse(get_internship(db, internship_id)), etag=etag)
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
     logger.info("Starting FastAPI application...")
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=False, log_level="info")
+    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=False, log_level="info", log_config=None)
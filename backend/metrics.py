@@ -0,0 +1,216 @@
+"""In-process metrics rendered in the Prometheus text format.
+
+Counters, gauges and histograms are grouped into labelled families. Each
+labelled child has its own uncontended lock, so recording never takes a
+registry-wide lock: an observation costs a bisect, a lock round-trip and
+two additions. Collectors registered with add_collector() report values
+that other modules already keep (queue depths, cache hit counts) at
+scrape time.
+
+MetricsMiddleware records request counts by status class, latency
+histograms per route template and the number of requests in flight.
+Requests that match no route share the "unmatched" label so stray paths
+cannot blow up the label set.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+# Seconds; wide enough to cover a SQL statement and a bcrypt round
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+class Gauge(Counter):
+    __slots__ = ()
+
+    def dec(self, amount=1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            yield f"{name}_bucket", labels + (("le", _format_value(bound)),), cumulative
+        yield f"{name}_sum", labels, total
+        yield f"{name}_count", labels, count
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+class Family:
+    """A named metric with one child per combination of label values"""
+
+    def __init__(self, name, kind, help, labelnames=(), factory=None):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.factory = factory
+        self._children = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            # setdefault keeps the first child if two threads race here
+            child = self._children.setdefault(values, self.factory())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            labels = tuple(zip(self.labelnames, values))
+            for sample_name, sample_labels, value in child.samples(self.name, labels):
+                lines.append(f"{sample_name}{_format_labels(sample_labels)} {_format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._families = {}
+        self._collectors = []
+
+    def _family(self, name, kind, help, labelnames, factory):
+        family = self._families.get(name)
+        if family is None:
+            family = self._families.setdefault(name, Family(name, kind, help, labelnames, factory))
+        return family
+
+    def counter(self, name, help, labelnames=()):
+        return self._family(name, "counter", help, labelnames, Counter)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._family(name, "gauge", help, labelnames, Gauge)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._family(name, "histogram", help, labelnames, lambda: Histogram(buckets))
+
+    def add_collector(self, collector):
+        """Register a callable returning (name, kind, help, value) tuples at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for family in list(self._families.values()):
+            lines.extend(family.render())
+        for collector in self._collectors:
+            for name, kind, help, value in collector():
+                lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {_format_value(value)}"])
+        return "\n".join(lines) + "\n"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter(
+    "http_requests_total", "HTTP requests by route template and status class", ("method", "route", "status"))
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+http_requests_in_flight = metrics.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled", ("method",))
+db_query_duration = metrics.histogram(
+    "db_query_duration_seconds", "SQL statement execution time")
+password_hash_duration = metrics.histogram(
+    "password_hash_duration_seconds", "bcrypt hash and verify time in the worker pool", ("operation",))
+password_hash_queue_wait = metrics.histogram(
+    "password_hash_queue_wait_seconds", "Time bcrypt calls waited for a pool worker")
+resume_parse_duration = metrics.histogram(
+    "resume_parse_duration_seconds", "Time spent in parse_resume", ("outcome",))
+startup_phase_duration = metrics.gauge(
+    "startup_phase_duration_seconds", "Time each startup phase took", ("phase",))
+startup_first_response = metrics.gauge(
+    "startup_first_response_seconds", "Time from starting to import main to the first response")
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope.get("method", "")
+        in_flight = http_requests_in_flight.labels(method)
+        in_flight.inc()
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_request_duration.labels(method, route).observe(elapsed)
+            http_requests.labels(method, route, f"{status_code // 100}xx").inc()
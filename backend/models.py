@@ -1,7 +1,39 @@
-from sqlalchemy import Boolean, Column, Integer, String, Date, Text
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Boolean, Column, Integer, String, Date, DateTime, Text, JSON, Index, ForeignKey
+from sqlalchemy import and_, exists, func, literal, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+from datetime import datetime
 from database import Base
-import json
+
+# JSONB on Postgres (indexable, decoded by the driver), JSON everywhere else
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
+class JSONContains(ColumnElement):
+    """Containment test `column @> values` that also compiles on SQLite"""
+    type = Boolean()
+    inherit_cache = False
+
+    def __init__(self, column, values):
+        self.column = column
+        self.values = list(values)
+
+@compiles(JSONContains, "postgresql")
+def _compile_json_contains_postgresql(element, compiler, **kw):
+    expr = element.column.op("@>", return_type=Boolean())(literal(element.values, JSONB()))
+    return compiler.process(expr, **kw)
+
+@compiles(JSONContains)
+def _compile_json_contains_default(element, compiler, **kw):
+    # SQLite has no containment operator, so check each value with json_each
+    if not element.values:
+        return compiler.process(literal(True), **kw)
+    each = func.json_each(element.column).table_valued("value")
+    expr = and_(*[
+        exists(select(literal(1)).select_from(each).where(each.c.value == value))
+        for value in element.values
+    ])
+    return compiler.process(expr, **kw)
 
 class User(Base):
     __tablename__ = "users"
@@ -12,6 +44,18 @@ class User(Base):
     dob = Column(Date)
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
+    # Bumped on every ORM update; ETags for /me are derived from it
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Only the SHA-256 of the token is stored; the token itself goes to the client
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime)
 
 class Candidate(Base):
     __tablename__ = "candidates"
@@ -21,29 +65,112 @@ class Candidate(Base):
     email = Column(String(255), unique=True, index=True, nullable=False)
     phone = Column(String(50))
     designation = Column(String(255))
-    _experience = Column("experience", Text)
 
-    _skills = Column("skills", Text)  # store as JSON string
-    _degree = Column("degree", Text)  # store as JSON string
+    # Lists of strings, stored natively as JSON / JSONB
+    _experience = Column("experience", JSONDocument)
+    _skills = Column("skills", JSONDocument)
+    _degree = Column("degree", JSONDocument)
 
-    _skills = Column("skills", Text)  
-    _degree = Column("degree", Text)  
+    # Plain text extracted from the resume, indexed for full-text search (see search.py)
+    resume_text = Column(Text)
 
+    # Bumped on every ORM update; search.py versions the table with a counter in table_versions
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # GIN indexes only exist on Postgres; jsonb_path_ops is smaller and covers @>
+    __table_args__ = (
+        Index(
+            "ix_candidates_skills_gin", "skills",
+            postgresql_using="gin", postgresql_ops={"skills": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_candidates_degree_gin", "degree",
+            postgresql_using="gin", postgresql_ops={"degree": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     def get_skills(self):
-        return json.loads(self._skills) if self._skills else []
+        return self._skills or []
 
     def set_skills(self, skills):
-        self._skills = json.dumps(skills)
+        self._skills = list(skills)
 
     def get_degree(self):
-        return json.loads(self._degree) if self._degree else []
+        return self._degree or []
 
     def set_degree(self, degree):
-        self._degree = json.dumps(degree)
+        self._degree = list(degree)
 
     def get_experience(self):
-        return json.loads(self._experience) if self._experience else []
+        return self._experience or []
 
     def set_experience(self, experience):
-        self._experience = json.dumps(experience)
\ No newline at end of file
+        self._experience = list(experience)
+
+    @classmethod
+    def has_skills(cls, skills):
+        """Filter for candidates listing every skill given, i.e. skills @> [...]"""
+        return JSONContains(cls._skills, skills)
+
+    @classmethod
+    def has_degree(cls, degree):
+        """Filter for candidates listing every degree given, i.e. degree @> [...]"""
+        return JSONContains(cls._degree, degree)
+
+class Internship(Base):
+    __tablename__ = "internships"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Canonical hash of source and external id, or title and company; the dedupe key for ingestion
+    canonical_key = Column(String(32), unique=True, nullable=False)
+    # Hash of the normalised record, so re-ingesting an unchanged listing writes nothing
+    record_hash = Column(String(32), nullable=False)
+
+    source = Column(String(32), nullable=False)
+    external_id = Column(String(255))
+    url = Column(String(1024))
+    title = Column(String(255), nullable=False)
+    company = Column(String(255), nullable=False)
+    location = Column(String(255))
+    category = Column(String(32))
+    # Display text as scraped ("S$1,200/month") and the monthly amount parsed from it
+    stipend = Column(String(64))
+    stipend_monthly = Column(Integer)
+    duration = Column(String(64))
+    description = Column(Text)
+    logo = Column(String(16))
+    skills = Column(JSONDocument)
+    requirements = Column(JSONDocument)
+    benefits = Column(JSONDocument)
+    deadline = Column(Date)
+    posted_date = Column(Date)
+    application_count = Column(Integer)
+    company_size = Column(String(64))
+    industry = Column(String(128))
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Keyset pagination walks these in (sort value, id) order, after an equality filter where one is given.
+    # Skills use a GIN index on Postgres, like the candidates' lists.
+    __table_args__ = (
+        Index("ix_internships_posted", "posted_date", "id"),
+        Index("ix_internships_deadline", "deadline", "id"),
+        Index("ix_internships_stipend", "stipend_monthly", "id"),
+        Index("ix_internships_category_posted", "category", "posted_date", "id"),
+        Index("ix_internships_category_deadline", "category", "deadline", "id"),
+        Index("ix_internships_category_stipend", "category", "stipend_monthly", "id"),
+        Index("ix_internships_source_posted", "source", "posted_date", "id"),
+        Index("ix_internships_location_posted", "location", "posted_date", "id"),
+        Index(
+            "ix_internships_skills_gin", "skills",
+            postgresql_using="gin", postgresql_ops={"skills": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+class TableVersion(Base):
+    """Change counter for a table, bumped in the same transaction as each ORM write to it"""
+    __tablename__ = "table_versions"
+
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
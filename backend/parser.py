@@ -1,20 +1,36 @@
 import pdfplumber
-import spacy
 import re
 import logging
-import dateparser
+import threading
 from datetime import datetime
 
-# Load spaCy NLP model
-try:
-    nlp = spacy.load("en_core_web_sm")
-    print("SpaCy model loaded successfully")
-except OSError:
-    print("Please install spaCy English model: python -m spacy download en_core_web_sm")
-    nlp = None
+from tracing import span
 
-# Set up logging - make sure this is available for import
-logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("parser")
+
+# spaCy and dateparser take most of a second to import, and the model longer to load,
+# so load_model() brings them in on first use or from a startup warm-up thread
+nlp = None
+dateparser = None
+_model_attempted = False
+_load_lock = threading.Lock()
+
+def load_model():
+    """Import dateparser and load the spaCy model once; callers block while another thread loads"""
+    global nlp, dateparser, _model_attempted
+    with _load_lock:
+        if dateparser is None:
+            import dateparser as dateparser_module
+            dateparser = dateparser_module
+        if not _model_attempted:
+            _model_attempted = True
+            import spacy
+            try:
+                nlp = spacy.load("en_core_web_sm")
+                logger.info("SpaCy model loaded successfully")
+            except OSError:
+                logger.warning("Please install spaCy English model: python -m spacy download en_core_web_sm")
+    return nlp
 
 # Skills database
 SKILLS_DB = [
@@ -50,12 +66,12 @@ def extract_text_from_pdf(file_path):
         
         full_text = "\n".join(text_content)
         if not full_text.strip():
-            logging.warning("No text extracted from PDF")
+            logger.warning("No text extracted from PDF")
             return ""
         
         return full_text
     except Exception as e:
-        logging.error(f"Failed to extract PDF text: {e}")
+        logger.error(f"Failed to extract PDF text: {e}")
         return ""
 
 def extract_name_email_phone(text):
@@ -94,7 +110,7 @@ def extract_name_email_phone(text):
             if person_entities:
                 name = person_entities[0].strip()
         except Exception as e:
-            logging.warning(f"spaCy name extraction failed: {e}")
+            logger.warning(f"spaCy name extraction failed: {e}")
     
     # Fallback name extraction
     if not name:
@@ -167,6 +183,8 @@ def extract_experience(text):
 def calculate_experience_years(experience_entries):
     """Calculate total years of experience"""
     total_months = 0
+    if dateparser is None:
+        load_model()
     
     for entry in experience_entries:
         # Find date ranges in the entry
@@ -188,7 +206,7 @@ def calculate_experience_years(experience_entries):
                     months_diff = (end_date.year - start_date.year) * 12 + (end_date.month - start_date.month)
                     total_months += max(0, months_diff)
             except Exception as e:
-                logging.warning(f"Failed to parse dates {start_str} - {end_str}: {e}")
+                logger.warning(f"Failed to parse dates {start_str} - {end_str}: {e}")
                 continue
 
     return round(total_months / 12, 1) if total_months > 0 else 0.0
@@ -204,11 +222,17 @@ def parse_resume(file_path):
         dict: Parsed resume data
     """
     try:
+        # No-op once loaded; waits if the startup warm-up is still loading the model
+        with span("parser.load_model"):
+            load_model()
+
         # Extract text from PDF
-        text = extract_text_from_pdf(file_path)
+        with span("parser.extract_text") as text_span:
+            text = extract_text_from_pdf(file_path)
+            text_span.set("parser.text_chars", len(text or ""))
         
         if not text or len(text.strip()) < 50:
-            logging.warning(f"Insufficient text extracted from {file_path}")
+            logger.warning(f"Insufficient text extracted from {file_path}")
             return {
                 "name": "",
                 "email": "",
@@ -216,15 +240,21 @@ def parse_resume(file_path):
                 "skills": [],
                 "degree": [],
                 "experience": [],
-                "total_experience_years": 0.0
+                "total_experience_years": 0.0,
+                "text": ""
             }
 
         # Extract information
-        name, email, phone = extract_name_email_phone(text)
-        skills = extract_skills(text)
-        degrees = extract_degrees(text)
-        experience = extract_experience(text)
-        total_exp_years = calculate_experience_years(experience)
+        with span("parser.extract_contact"):
+            name, email, phone = extract_name_email_phone(text)
+        with span("parser.extract_skills"):
+            skills = extract_skills(text)
+        with span("parser.extract_degrees"):
+            degrees = extract_degrees(text)
+        with span("parser.extract_experience"):
+            experience = extract_experience(text)
+        with span("parser.experience_years"):
+            total_exp_years = calculate_experience_years(experience)
 
         result = {
             "name": name,
@@ -233,14 +263,15 @@ def parse_resume(file_path):
             "skills": skills,
             "degree": degrees,
             "experience": experience,
-            "total_experience_years": total_exp_years
+            "total_experience_years": total_exp_years,
+            "text": text
         }
         
-        logging.info(f"Successfully parsed resume: {name or 'Unknown'}")
+        logger.info("Successfully parsed resume: %s", name or 'Unknown')
         return result
         
     except Exception as e:
-        logging.error(f"Error parsing resume {file_path}: {e}")
+        logger.error(f"Error parsing resume {file_path}: {e}")
         return {
             "name": "",
             "email": "",
@@ -248,7 +279,8 @@ def parse_resume(file_path):
             "skills": [],
             "degree": [],
             "experience": [],
-            "total_experience_years": 0.0
+            "total_experience_years": 0.0,
+            "text": ""
         }
 
 # Test function
@@ -268,7 +300,7 @@ def test_parser():
         print(f"Test error: {e}")
         return None
 
-__all__ = ['parse_resume', 'logging']
+__all__ = ['parse_resume']
 
 if __name__ == "__main__":
     test_parser()
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""Password hashing and verification off the event loop.
+
+bcrypt is deliberately slow, and calling it inside an async handler stalls
+every other request on the worker. bcrypt releases the GIL, so a small
+dedicated thread pool can hash in parallel while the event loop keeps
+serving. Admission is bounded: once max_pending operations are running or
+queued, new ones fail fast with PasswordServiceBusy, which the API turns
+into a 503.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from auth import get_password_hash, verify_password
+from metrics import password_hash_duration, password_hash_queue_wait
+from tracing import span
+
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', '64'))
+
+class PasswordServiceBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+class PasswordHasher:
+    """Bounded thread pool for bcrypt hash and verify calls"""
+
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING,
+                 hash_func=get_password_hash, verify_func=verify_password):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.hash_func = hash_func
+        self.verify_func = verify_func
+        self._executor = None
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.hash_time_total = 0.0
+        self.hash_time_max = 0.0
+
+    @property
+    def pending(self):
+        return self._pending
+
+    async def hash(self, password):
+        return await self._run("hash", self.hash_func, password)
+
+    async def verify(self, plain_password, hashed_password):
+        return await self._run("verify", self.verify_func, plain_password, hashed_password)
+
+    async def _run(self, operation, func, *args):
+        # Only touched from the event loop thread, so a plain counter is enough
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordServiceBusy("Password hashing queue is full")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+
+        self._pending += 1
+        submitted = time.perf_counter()
+
+        def timed_call():
+            started = time.perf_counter()
+            result = func(*args)
+            return result, started - submitted, time.perf_counter() - started
+
+        try:
+            with span(f"bcrypt.{operation}") as bcrypt_span:
+                loop = asyncio.get_running_loop()
+                result, queue_wait, hash_time = await loop.run_in_executor(self._executor, timed_call)
+                bcrypt_span.set("bcrypt.queue_wait_ms", round(queue_wait * 1000, 3))
+        finally:
+            self._pending -= 1
+
+        self.completed += 1
+        self.queue_wait_total += queue_wait
+        self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+        self.hash_time_total += hash_time
+        self.hash_time_max = max(self.hash_time_max, hash_time)
+        password_hash_queue_wait.labels().observe(queue_wait)
+        password_hash_duration.labels(operation).observe(hash_time)
+        return result
+
+    def stats(self):
+        """Counters and timings in milliseconds"""
+        completed = self.completed or 1
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_wait_avg_ms": round(self.queue_wait_total / completed * 1000, 3),
+            "queue_wait_max_ms": round(self.queue_wait_max * 1000, 3),
+            "hash_time_avg_ms": round(self.hash_time_total / completed * 1000, 3),
+            "hash_time_max_ms": round(self.hash_time_max * 1000, 3),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+password_hasher = PasswordHasher()
+
+def calibrate_rounds(target_ms, min_rounds=4, max_rounds=16, samples=3):
+    """Highest bcrypt cost whose median hash time on this machine stays within target_ms.
+
+    Returns (rounds, timings) where timings maps each measured cost to milliseconds.
+    """
+    timings = {}
+    best = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        durations = []
+        for _ in range(samples):
+            started = time.perf_counter()
+            context.hash("calibration-Password123")
+            durations.append((time.perf_counter() - started) * 1000)
+        timings[rounds] = statistics.median(durations)
+        if timings[rounds] > target_ms:
+            break
+        best = rounds
+    return best, timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Password hashing utilities")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    calibrate = subcommands.add_parser("calibrate", help="pick the bcrypt cost for a target hash time")
+    calibrate.add_argument("--target-ms", type=float, default=250.0)
+    calibrate.add_argument("--max-rounds", type=int, default=16)
+    args = parser.parse_args()
+
+    rounds, timings = calibrate_rounds(args.target_ms, max_rounds=args.max_rounds)
+    for cost, ms in timings.items():
+        print(f"rounds={cost:<3} {ms:8.1f} ms")
+    print(f"\nBCRYPT_ROUNDS={rounds}  (target {args.target_ms:.0f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Prefork launcher: load the app once, then fork uvicorn workers sharing one socket.
+
+    python prefork.py --workers 8 --port 8000
+
+With preloading (the default) the master imports main, and with it the
+parser and its spaCy model, before forking. gc.freeze() then moves every
+loaded object out of the collector's reach so collections in the workers
+do not write to (and so copy) those pages. Workers share them
+copy-on-write instead of each loading its own copy. Pass --no-preload to
+have every worker import the app itself.
+
+Signals handled by the master:
+    SIGTERM, SIGINT  stop workers gracefully, then exit
+    SIGHUP           rolling restart, one worker at a time; a preloaded
+                     master restarts workers from the code it already
+                     loaded, so restart the master to deploy new code
+Workers that exit unexpectedly are replaced.
+
+With CREATE_SCHEMA=1 the schema is built once, before any worker is
+forked, and the workers skip that phase; concurrent create_all calls
+would otherwise race and fail with "table already exists". Without it
+the master checks the schema instead, so an out-of-date database stops
+startup rather than every worker failing and being replaced.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from log_setup import configure_logging, stop_logging
+from startup import CREATE_SCHEMA
+
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+GRACEFUL_TIMEOUT = float(os.environ.get('GRACEFUL_TIMEOUT', '30'))
+
+logger = logging.getLogger("prefork")
+
+def bind_socket(host, port, backlog=2048):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def preload_app(create_schema=False):
+    """Import the app and load the parser model in the master, then freeze the GC"""
+    import main
+    from parser import load_model
+    if create_schema:
+        main.create_schema()
+    else:
+        main.check_schema()
+    main.CREATE_SCHEMA = False  # done here if at all; workers must not repeat it
+    load_model()
+    gc.collect()
+    gc.freeze()
+    return main.app
+
+def prepare_schema_in_child(create_schema):
+    """Build or check the schema in a short-lived child, leaving the master free of the app's imports"""
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            import main
+            if create_schema:
+                main.create_schema()
+            else:
+                main.check_schema()
+        except BaseException:
+            logger.exception("Schema creation failed" if create_schema else "Schema check failed")
+            code = 1
+        finally:
+            stop_logging()
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise SystemExit("Schema not ready; not starting workers")
+
+class Arbiter:
+    """Forks and supervises uvicorn workers serving one shared socket"""
+
+    def __init__(self, sock, app, workers=WEB_CONCURRENCY, graceful_timeout=GRACEFUL_TIMEOUT, log_level="info"):
+        self.sock = sock
+        self.app = app  # an app object when preloaded, otherwise an import string
+        self.num_workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.log_level = log_level
+        self.workers = {}  # pid -> started at
+        self.running = True
+        self._signals = []
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return pid
+
+        code = 0
+        try:
+            self._run_worker()
+        except BaseException:
+            logger.exception("Worker %s crashed", os.getpid())
+            code = 1
+        finally:
+            stop_logging()
+            os._exit(code)
+
+    def _run_worker(self):
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, signal.SIG_DFL)
+        import uvicorn
+
+        config = uvicorn.Config(
+            self.app, lifespan="on", log_level=self.log_level, log_config=None,
+            timeout_graceful_shutdown=self.graceful_timeout,
+        )
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def run(self):
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, lambda signum, frame: self._signals.append(signum))
+        logger.info("Master %s starting %s workers", os.getpid(), self.num_workers)
+
+        while self.running:
+            self.reap()
+            while self._signals:
+                self.handle_signal(self._signals.pop(0))
+            if self.running:
+                self.manage_workers()
+                time.sleep(0.2)
+        self.stop()
+
+    def handle_signal(self, signum):
+        if signum == signal.SIGHUP:
+            logger.info("Rolling restart of %s workers", len(self.workers))
+            self.reload()
+        else:
+            self.running = False
+
+    def manage_workers(self):
+        while len(self.workers) < self.num_workers:
+            self.spawn()
+
+    def reap(self):
+        """Collect exited workers; they are replaced by the next manage_workers()"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            if started is not None and self.running:
+                logger.warning("Worker %s exited with status %s", pid, os.waitstatus_to_exitcode(status))
+                if time.monotonic() - started < 1:
+                    time.sleep(1)  # don't spin if workers crash on startup
+
+    def reload(self):
+        """Start a replacement for each worker before stopping it, so capacity never drops"""
+        for pid in list(self.workers):
+            self.spawn()
+            self.stop_worker(pid)
+
+    def stop_worker(self, pid):
+        self._kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while time.monotonic() < deadline:
+            try:
+                if os.waitpid(pid, os.WNOHANG)[0]:
+                    break
+            except ChildProcessError:
+                break
+            time.sleep(0.05)
+        else:
+            self._kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.workers.pop(pid, None)
+
+    def stop(self):
+        """Ask every worker to finish in-flight requests, killing stragglers after the timeout"""
+        for pid in list(self.workers):
+            self._kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for pid in list(self.workers):
+            self._kill(pid, signal.SIGKILL)
+            self.workers.pop(pid, None)
+        self.reap()
+
+    @staticmethod
+    def _kill(pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the API with preforked uvicorn workers")
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--preload", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    configure_logging(level=args.log_level)
+    sock = bind_socket(args.host, args.port)
+    create_schema = CREATE_SCHEMA
+    # Workers that import the app themselves read the environment, so they skip the schema phase too
+    os.environ["CREATE_SCHEMA"] = ""
+    if args.preload:
+        app = preload_app(create_schema)
+    else:
+        prepare_schema_in_child(create_schema)
+        app = "main:app"
+    Arbiter(sock, app, args.workers, args.graceful_timeout, args.log_level).run()
+
+if __name__ == "__main__":
+    main()
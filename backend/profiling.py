@@ -0,0 +1,198 @@
+"""On-demand profiling of individual requests.
+
+A request is profiled when it carries an X-Profile-Token header equal to
+PROFILE_TOKEN, or when it is picked at random with probability
+PROFILE_SAMPLE_RATE. With neither configured the middleware passes every
+request straight through.
+
+While a profiled request runs, a background thread samples the stacks of
+every busy thread every PROFILE_INTERVAL_MS. Sampling all threads catches
+work handed to threads, such as resume parsing and bcrypt. Each stack is
+prefixed with its thread name, and concurrent requests show up too.
+tracemalloc records the allocations made meanwhile. Results are written
+under PROFILE_DIR:
+
+    <id>.collapsed   collapsed stacks, for flamegraph.pl or speedscope
+    <id>.alloc.txt   peak traced memory and the top allocation sites
+
+The response carries X-Profile-Id. One request is profiled at a time;
+others arriving meanwhile run unprofiled.
+"""
+import asyncio
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+PROFILE_TRACEMALLOC_FRAMES = int(os.environ.get('PROFILE_TRACEMALLOC_FRAMES', '10'))
+
+logger = logging.getLogger(__name__)
+
+# (module file, function) pairs where a thread is just waiting for work
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+class SamplingProfiler:
+    """Counts collapsed stacks of busy threads, sampled from a background thread"""
+
+    def __init__(self, interval=PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own or _is_idle(frame):
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def _is_idle(frame):
+    # Waiting threads sit in a wait call, sometimes under a C call such as a lock acquire
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+class RequestProfile:
+    """Stack samples plus tracemalloc statistics for one request"""
+
+    def __init__(self, interval=PROFILE_INTERVAL_MS / 1000, frames=PROFILE_TRACEMALLOC_FRAMES):
+        self.id = uuid.uuid4().hex[:12]
+        self.profiler = SamplingProfiler(interval)
+        self.frames = frames
+        self.started_tracing = False
+        self.snapshot = None
+        self.peak = 0
+        self.elapsed = 0.0
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.started_tracing = True
+        tracemalloc.reset_peak()
+        self._started = time.perf_counter()
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+        self.elapsed = time.perf_counter() - self._started
+        self.peak = tracemalloc.get_traced_memory()[1]
+        self.snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        if self.started_tracing:
+            tracemalloc.stop()
+
+    def allocation_report(self, label, top=25):
+        lines = [
+            f"request: {label}",
+            f"elapsed: {self.elapsed * 1000:.1f} ms, stack samples: {self.profiler.samples}",
+            f"peak traced memory: {self.peak / 1024:.1f} KiB",
+            "",
+            f"top {top} allocation sites still held at the end of the request:",
+        ]
+        for stat in self.snapshot.statistics("lineno")[:top]:
+            lines.append(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {stat.traceback[0]}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory, label):
+        """Write the .collapsed and .alloc.txt files; returns their paths"""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{_slug(label)}-{self.id}")
+        with open(base + ".collapsed", "w") as f:
+            f.write(self.profiler.collapsed())
+        with open(base + ".alloc.txt", "w") as f:
+            f.write(self.allocation_report(label))
+        return base + ".collapsed", base + ".alloc.txt"
+
+def _slug(label):
+    return re.sub(r"[^A-Za-z0-9]+", "-", label).strip("-")[:60] or "request"
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles requests selected by token header or sample rate"""
+
+    def __init__(self, app, token=PROFILE_TOKEN, sample_rate=PROFILE_SAMPLE_RATE, directory=PROFILE_DIR,
+                 interval_ms=PROFILE_INTERVAL_MS):
+        self.app = app
+        self.token = token.encode() if token else None
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.interval = interval_ms / 1000
+        self.enabled = bool(self.token or self.sample_rate > 0)
+        self.active = False  # only touched on the event loop thread
+
+    def should_profile(self, scope):
+        if self.token is not None:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-profile-token":
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or self.active or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self.active = True
+        profile = RequestProfile(self.interval)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.stop()
+            self.active = False
+            route = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+            label = f"{scope.get('method', '')} {route}"
+            try:
+                paths = await asyncio.to_thread(profile.write, self.directory, label)
+                logger.info("Profiled %s in %.1f ms: %s", label, profile.elapsed * 1000, paths[0])
+            except OSError as e:
+                logger.warning(f"Failed to write profile for {label}: {str(e)}")
@@ -0,0 +1,108 @@
+"""Per-request SQL statement counting and timing.
+
+Engine-wide SQLAlchemy hooks time every statement and attribute it to the
+request that issued it through a contextvar. QueryStatsMiddleware reports
+the totals in a Server-Timing header, and statements slower than
+SLOW_QUERY_MS are logged with their parameters and route.
+"""
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from metrics import db_query_duration
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+
+slow_query_logger = logging.getLogger("sql.slow")
+
+class QueryStats:
+    """Statement count and timings for one request"""
+    __slots__ = ("scope", "count", "total_ms", "slowest_ms", "slowest_statement")
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_statement = None
+
+    @property
+    def route(self):
+        """Route template once routing has happened, otherwise the raw path"""
+        if not self.scope:
+            return None
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path")
+
+    def record(self, statement, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+
+    def server_timing(self):
+        """Value for the Server-Timing response header"""
+        return (
+            f'db;dur={self.total_ms:.2f};desc="{self.count} queries", '
+            f'db-slowest;dur={self.slowest_ms:.2f}'
+        )
+
+_current_stats = ContextVar("query_stats", default=None)
+
+def current_stats():
+    """QueryStats of the request being handled, or None outside a request"""
+    return _current_stats.get()
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+    db_query_duration.labels().observe(elapsed_ms / 1000)
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+    if elapsed_ms >= SLOW_QUERY_MS:
+        slow_query_logger.warning(
+            "Slow query (%.1f ms) on %s: %s; parameters=%r",
+            elapsed_ms, stats.route if stats else None, statement, parameters,
+        )
+
+@event.listens_for(Engine, "handle_error")
+def _discard_timer(context):
+    started = context.connection.info.get("query_started") if context.connection else None
+    if started:
+        started.pop()
+
+class QueryStatsMiddleware:
+    """ASGI middleware that collects QueryStats per request and adds Server-Timing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope)
+        token = _current_stats.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
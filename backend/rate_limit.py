@@ -0,0 +1,215 @@
+"""In-process token-bucket rate limiting for expensive routes.
+
+Each limited route has a per-IP bucket and, when the request names an
+account (the login username or the signup username), a per-account
+bucket. Buckets are checked in the middleware, before the handler runs,
+so a rejected login costs a dictionary lookup instead of a bcrypt round.
+Routes with "charge_account_on" spend an account token up front, like
+any other, and get it back when the response status is not one of those,
+e.g. a failed login's 401. Concurrent requests therefore cannot all slip
+past the check before the first one is charged.
+
+Limits are "capacity/seconds" strings: a burst of `capacity` requests,
+refilled at capacity/seconds tokens per second. Buckets live in an LRU
+store capped at RATE_LIMIT_MAX_BUCKETS entries.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+RATE_LIMIT_MAX_BUCKETS = int(os.environ.get('RATE_LIMIT_MAX_BUCKETS', '100000'))
+
+def parse_limit(value):
+    """Parse "capacity/seconds" into (capacity, tokens per second)"""
+    try:
+        capacity, seconds = value.split("/")
+        capacity, seconds = float(capacity), float(seconds)
+    except ValueError:
+        raise ValueError(f"Rate limit must look like 'capacity/seconds', got '{value}'")
+    if capacity < 1 or seconds <= 0:
+        raise ValueError(f"Rate limit needs capacity >= 1 and seconds > 0, got '{value}'")
+    return capacity, capacity / seconds
+
+# Per-route limits; override with e.g. RATE_LIMIT_TOKEN_IP=30/60
+RATE_LIMITS = {
+    ("POST", "/token"): {
+        "ip": parse_limit(os.environ.get('RATE_LIMIT_TOKEN_IP', '20/60')),
+        # Only failed logins count, so signing in never locks anyone out. The trade-off: anyone who
+        # knows a username can still block that account's logins with 5 wrong passwords, until a token
+        # refills a minute later. A larger capacity weakens that lockout but allows more guesses.
+        "account": parse_limit(os.environ.get('RATE_LIMIT_TOKEN_ACCOUNT', '5/300')),
+        "charge_account_on": {401},
+    },
+    ("POST", "/signup"): {
+        "ip": parse_limit(os.environ.get('RATE_LIMIT_SIGNUP_IP', '5/300')),
+        "account": parse_limit(os.environ.get('RATE_LIMIT_SIGNUP_ACCOUNT', '3/600')),
+    },
+}
+
+MAX_INSPECTED_BODY = 64 * 1024
+
+class BucketStore:
+    """LRU-bounded token buckets; each bucket is [tokens, last_refill]"""
+
+    def __init__(self, max_buckets=RATE_LIMIT_MAX_BUCKETS, clock=time.monotonic):
+        self.max_buckets = max_buckets
+        self.clock = clock
+        self.rejected = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill_rate):
+        """Spend one token; returns 0 if allowed, otherwise seconds until one is available"""
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [capacity, now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            self.rejected += 1
+            return (1 - bucket[0]) / refill_rate
+
+    def refund(self, key, capacity):
+        """Give back a token spent by take(), e.g. for a request that turned out not to count"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(capacity, bucket[0] + 1)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self.rejected = 0
+
+    def __len__(self):
+        return len(self._buckets)
+
+rate_limiter = BucketStore()
+
+def _account_from_body(body, content_type):
+    """Lowercased username (or email) named by a login or signup body"""
+    try:
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            values = parse_qs(body.decode())
+            account = (values.get("username") or [""])[0]
+        elif content_type.startswith("application/json"):
+            data = json.loads(body)
+            if not isinstance(data, dict):
+                return None
+            account = data.get("username") or data.get("email") or ""
+        else:
+            return None
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(account, str):
+        return None
+    return account.strip().lower() or None
+
+class RateLimitMiddleware:
+    """ASGI middleware applying RATE_LIMITS before the route handler runs"""
+
+    def __init__(self, app, limits=None, store=None):
+        self.app = app
+        self.limits = RATE_LIMITS if limits is None else limits
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        limits = self.limits.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if not limits:
+            await self.app(scope, receive, send)
+            return
+
+        store = self.store if self.store is not None else rate_limiter
+        route = scope["path"]
+        client_ip = scope["client"][0] if scope.get("client") else "unknown"
+
+        if "ip" in limits:
+            retry_after = store.take(("ip", route, client_ip), *limits["ip"])
+            if retry_after:
+                await self._reject(send, retry_after)
+                return
+
+        if "account" in limits:
+            body, receive = await self._buffer_body(receive)
+            headers = dict(scope.get("headers", []))
+            content_type = headers.get(b"content-type", b"").decode("latin-1").lower()
+            account = _account_from_body(body, content_type) if body is not None else None
+            if account:
+                key = ("account", route, account)
+                retry_after = store.take(key, *limits["account"])
+                if retry_after:
+                    await self._reject(send, retry_after)
+                    return
+                charge_on = limits.get("charge_account_on")
+                if charge_on is not None:
+                    await self._refund_unless(scope, receive, send, charge_on, store, key, limits["account"][0])
+                    return
+
+        await self.app(scope, receive, send)
+
+    async def _refund_unless(self, scope, receive, send, statuses, store, key, capacity):
+        """Run the app, refunding the account token unless the response status is in statuses"""
+        status = None
+
+        async def watching_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, watching_send)
+        finally:
+            if status not in statuses:
+                store.refund(key, capacity)
+
+    async def _buffer_body(self, receive):
+        """Read the request body and return it with a receive() that replays it"""
+        messages = []
+        size = 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            size += len(message.get("body", b""))
+            if not message.get("more_body") or size > MAX_INSPECTED_BODY:
+                break
+
+        body = None
+        if size <= MAX_INSPECTED_BODY and messages[-1]["type"] == "http.request" and not messages[-1].get("more_body"):
+            body = b"".join(m.get("body", b"") for m in messages)
+
+        async def replay():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        return body, replay
+
+    async def _reject(self, send, retry_after):
+        payload = json.dumps({"detail": "Too many requests, please try again later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(payload)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": payload})
@@ -0,0 +1,129 @@
+"""Long-lived refresh tokens that mint new access tokens without a password.
+
+A refresh token is an opaque random string; only its SHA-256 is stored,
+in the indexed refresh_tokens.token_hash column. Each use rotates it: the
+presented token is revoked and a new one is issued. Presenting a token
+that was already rotated or revoked is treated as theft, so every live
+refresh token of that user is revoked.
+
+Issuing a token prunes the user's old rows. Expired rows are deleted, since
+an expired token is rejected either way. Revoked rows are what reuse
+detection needs, so the newest REFRESH_TOKEN_KEEP_REVOKED of them are kept.
+A replay of an older one is still rejected, just without revoking the
+rest. Each user's rows are therefore bounded by their live sessions plus
+that many.
+"""
+import hashlib
+import os
+import secrets
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from models import RefreshToken, User
+
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.environ.get('REFRESH_TOKEN_EXPIRE_DAYS', '30'))
+REFRESH_TOKEN_KEEP_REVOKED = int(os.environ.get('REFRESH_TOKEN_KEEP_REVOKED', '20'))
+
+class InvalidRefreshToken(Exception):
+    """Raised for unknown, expired, revoked or reused refresh tokens"""
+
+class RefreshStats:
+    """Counters for the refresh flow; every refresh is a password login (and bcrypt verify) avoided"""
+
+    def __init__(self):
+        self.issued = 0
+        self.refreshed = 0
+        self.rejected = 0
+        self.reuse_detected = 0
+
+    def reset(self):
+        self.__init__()
+
+    def stats(self):
+        return {
+            "issued": self.issued,
+            "refreshed": self.refreshed,
+            "bcrypt_verifies_saved": self.refreshed,
+            "rejected": self.rejected,
+            "reuse_detected": self.reuse_detected,
+        }
+
+refresh_stats = RefreshStats()
+
+def hash_refresh_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def prune_refresh_tokens(db, user_id, now=None, keep_revoked=REFRESH_TOKEN_KEEP_REVOKED):
+    """Delete the user's expired rows and all but the newest keep_revoked revoked ones; the caller commits"""
+    now = now or datetime.utcnow()
+    kept = db.query(RefreshToken.id).filter(
+        RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_not(None), RefreshToken.expires_at > now
+    ).order_by(RefreshToken.revoked_at.desc(), RefreshToken.id.desc()).limit(keep_revoked)
+    return db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id,
+        or_(
+            RefreshToken.expires_at <= now,
+            RefreshToken.revoked_at.is_not(None) & RefreshToken.id.not_in(kept.scalar_subquery()),
+        ),
+    ).delete(synchronize_session=False)
+
+def issue_refresh_token(db, user_id, now=None):
+    """Add a new refresh token for the user to the session and return it; the caller commits"""
+    now = now or datetime.utcnow()
+    prune_refresh_tokens(db, user_id, now)
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        token_hash=hash_refresh_token(token),
+        user_id=user_id,
+        expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    refresh_stats.issued += 1
+    return token
+
+def rotate_refresh_token(db, token, now=None):
+    """Revoke a valid refresh token and issue its replacement.
+
+    Returns (user, new_token) after committing, or raises InvalidRefreshToken.
+    """
+    now = now or datetime.utcnow()
+    record = db.query(RefreshToken).filter(RefreshToken.token_hash == hash_refresh_token(token)).first()
+    if record is None or record.expires_at <= now:
+        refresh_stats.rejected += 1
+        raise InvalidRefreshToken("Refresh token is invalid or expired")
+
+    if record.revoked_at is not None:
+        revoke_user_refresh_tokens(db, record.user_id, now)
+        refresh_stats.rejected += 1
+        refresh_stats.reuse_detected += 1
+        raise InvalidRefreshToken("Refresh token has already been used")
+
+    # Conditional update so two concurrent refreshes cannot both rotate the same token
+    rotated = db.query(RefreshToken).filter(
+        RefreshToken.id == record.id, RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: now}, synchronize_session=False)
+    user = db.query(User).filter(User.id == record.user_id).first()
+    if not rotated or user is None or user.is_active is False:
+        db.rollback()
+        refresh_stats.rejected += 1
+        raise InvalidRefreshToken("Refresh token is invalid or expired")
+
+    new_token = issue_refresh_token(db, user.id, now)
+    db.commit()
+    refresh_stats.refreshed += 1
+    return user, new_token
+
+def revoke_refresh_token(db, token, now=None):
+    """Revoke one refresh token; returns False if it was unknown or already revoked"""
+    revoked = db.query(RefreshToken).filter(
+        RefreshToken.token_hash == hash_refresh_token(token), RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: now or datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return bool(revoked)
+
+def revoke_user_refresh_tokens(db, user_id, now=None):
+    """Revoke every live refresh token of a user and commit"""
+    db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: now or datetime.utcnow()}, synchronize_session=False)
+    db.commit()
@@ -0,0 +1,33 @@
+"""JSON responses rendered with orjson when it is installed.
+
+FastJSONResponse is the app's default response class. Handlers that
+already hold a Pydantic model (or a large dict) return model_response() /
+FastJSONResponse directly, which skips FastAPI's response validation and
+jsonable_encoder pass: the model is dumped once and encoded once.
+
+Without orjson the stdlib encoder is used, with the same handling of
+dates and other non-JSON types.
+"""
+import json
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_jsonable_python
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson, falling back to the stdlib json module"""
+
+    def render(self, content):
+        if orjson is not None:
+            return orjson.dumps(content, default=to_jsonable_python, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            content, default=to_jsonable_python, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+        ).encode("utf-8")
+
+def model_response(model, status_code=200, headers=None):
+    """Serialize a Pydantic model straight from model_dump()"""
+    return FastJSONResponse(model.model_dump(), status_code=status_code, headers=headers)
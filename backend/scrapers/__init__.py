@@ -0,0 +1,19 @@
+"""Internship scrapers sharing one pooled, rate-limited HTTP client.
+
+    python -m scrapers                     # every source, concurrently
+    python -m scrapers nus fastjobs --out listings.json
+    python -m scrapers --full              # ignore the saved crawl state
+    python -m scrapers --store             # save new and changed listings (see internships.py)
+
+scrapers.fetcher holds the Fetcher: keep-alive pooling, per-host
+concurrency and rate limits, timeouts and jittered retries.
+scrapers.jobs_scrapers holds the Source classes, run_sources() and the
+incremental crawl(). scrapers.incremental holds the CrawlState that makes
+requests conditional and reports what each cycle saved.
+"""
+from scrapers.fetcher import Fetcher, FetchError
+from scrapers.incremental import CrawlState
+from scrapers.jobs_scrapers import FastJobsSource, IndeedSource, NUSSource, Source, crawl, run_sources
+
+__all__ = ["Fetcher", "FetchError", "CrawlState", "Source", "NUSSource", "IndeedSource", "FastJobsSource",
+           "run_sources", "crawl"]
@@ -0,0 +1,68 @@
+import argparse
+import json
+import logging
+import sys
+
+from scrapers.fetcher import Fetcher
+from scrapers.incremental import SCRAPER_STATE_FILE, CrawlState
+from scrapers.jobs_scrapers import crawl, default_sources, run_sources
+
+def store_listings(listings):
+    """Save listings to DATABASE_URL through the bulk ingestion pipeline"""
+    from database import SessionLocal, engine
+    from internships import ingest_internships
+    from models import Internship
+
+    Internship.__table__.create(engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        report = ingest_internships(db, listings)
+    finally:
+        db.close()
+    print(f"stored: {report['inserted']} inserted, {report['updated']} updated, {report['unchanged']} unchanged, "
+          f"{report['duplicates']} duplicates, {report['invalid']} invalid", file=sys.stderr)
+
+def main(argv=None):
+    sources = {source.name: source for source in default_sources()}
+    parser = argparse.ArgumentParser(prog="python -m scrapers", description="Scrape internship listings")
+    parser.add_argument("sources", nargs="*", choices=sorted(sources), help="sources to run (default: all)")
+    parser.add_argument("--state", default=SCRAPER_STATE_FILE, help="crawl state file for conditional requests")
+    parser.add_argument("--full", action="store_true", help="fetch and parse everything, ignoring the state")
+    parser.add_argument("--store", action="store_true", help="save new and changed listings to the database")
+    parser.add_argument("--out", help="write the listings as JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    selected = [sources[name] for name in args.sources or sorted(sources)]
+    with Fetcher() as fetcher:
+        store = store_listings if args.store else None
+        if args.full:
+            results, report = run_sources(selected, fetcher), None
+            if store is not None:
+                store([listing for result in results.values() for listing in result["listings"]])
+        else:
+            results, report = crawl(CrawlState(args.state), selected, fetcher, store=store)
+        stats = fetcher.stats()
+
+    for name, result in results.items():
+        outcome = result["error"] or f"{len(result['listings'])} listings"
+        print(f"{name:<10}{result['seconds']:>8.2f}s  {outcome}", file=sys.stderr)
+    print(f"{stats['requests']} requests over {stats['connections_opened']} connections, "
+          f"{stats['retries']} retries, {stats['bytes_received']:,} bytes", file=sys.stderr)
+    if report is not None:
+        print(f"pages: {report['pages_parsed']} parsed, {report['pages_not_modified']} not modified, "
+              f"{report['pages_unchanged']} unchanged; saved {report['bytes_saved']:,} bytes and "
+              f"{report['parse_cpu_saved_ms']:.1f} ms of parsing", file=sys.stderr)
+        print(f"listings: {report['listings_new']} new, {report['listings_changed']} changed, "
+              f"{report['listings_unchanged']} unchanged", file=sys.stderr)
+
+    listings = [listing for result in results.values() for listing in result["listings"]]
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(listings, f, indent=2)
+    else:
+        json.dump(listings, sys.stdout, indent=2)
+    return 0 if all(result["error"] is None for result in results.values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""Shared HTTP client for the scrapers.
+
+One Fetcher wraps one requests.Session, so every source reuses the same
+pool of keep-alive connections instead of opening a new TCP and TLS
+connection per page. Requests to one host are capped at a number in
+flight and spaced at a minimum interval, whichever source they come from.
+Hosts are matched by host:port.
+
+Every request has a (connect, read) timeout. Connection errors, timeouts,
+429 and 5xx responses are retried with full-jitter exponential backoff,
+and a Retry-After header is honoured when it asks for a longer wait.
+Other 4xx responses fail at once with FetchError.
+
+Per-host limits default to SCRAPER_HOST_CONCURRENCY requests in flight
+and SCRAPER_HOST_RATE requests per second. SCRAPER_HOST_LIMITS overrides
+single hosts, e.g. "serpapi.com=4/5;www.fastjobs.sg=1/0.5".
+"""
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scrapers.incremental import Page, page_key
+
+SCRAPER_CONNECT_TIMEOUT = float(os.environ.get('SCRAPER_CONNECT_TIMEOUT', '5'))
+SCRAPER_READ_TIMEOUT = float(os.environ.get('SCRAPER_READ_TIMEOUT', '20'))
+SCRAPER_RETRIES = int(os.environ.get('SCRAPER_RETRIES', '3'))
+SCRAPER_BACKOFF_BASE = float(os.environ.get('SCRAPER_BACKOFF_BASE', '0.5'))
+SCRAPER_BACKOFF_MAX = float(os.environ.get('SCRAPER_BACKOFF_MAX', '30'))
+SCRAPER_HOST_CONCURRENCY = int(os.environ.get('SCRAPER_HOST_CONCURRENCY', '2'))
+SCRAPER_HOST_RATE = float(os.environ.get('SCRAPER_HOST_RATE', '2'))
+SCRAPER_POOL_HOSTS = int(os.environ.get('SCRAPER_POOL_HOSTS', '10'))
+SCRAPER_USER_AGENT = os.environ.get('SCRAPER_USER_AGENT', 'Mozilla/5.0 (compatible; InternUShip/1.0)')
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+logger = logging.getLogger(__name__)
+
+def parse_host_limits(spec):
+    """Parse "host=concurrency/rate;..." into {host: (concurrency, rate)}"""
+    limits = {}
+    for item in spec.split(";"):
+        host, _, value = item.partition("=")
+        if not host.strip() or not value.strip():
+            continue
+        try:
+            concurrency, rate = value.split("/")
+            limits[host.strip()] = (int(concurrency), float(rate))
+        except ValueError:
+            raise ValueError(f"Host limit must look like 'host=concurrency/rate', got '{item.strip()}'")
+    return limits
+
+SCRAPER_HOST_LIMITS = parse_host_limits(os.environ.get('SCRAPER_HOST_LIMITS', ''))
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - (now or datetime.now(timezone.utc))).total_seconds())
+
+def backoff_delay(attempt, base=SCRAPER_BACKOFF_BASE, cap=SCRAPER_BACKOFF_MAX, retry_after=None):
+    """Full-jitter backoff before retry number attempt + 1, at least Retry-After when given"""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+class FetchError(Exception):
+    """Raised when a URL could not be fetched; status is None for network errors"""
+
+    def __init__(self, message, url, status=None):
+        super().__init__(message)
+        self.url = url
+        self.status = status
+
+class HostLimiter:
+    """Caps requests in flight to one host and spaces their starts by 1/rate seconds"""
+
+    def __init__(self, concurrency, rate, clock=time.monotonic):
+        self.slots = threading.BoundedSemaphore(max(1, concurrency))
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.clock = clock
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Claim the next start time; returns how long to wait for it"""
+        with self._lock:
+            now = self.clock()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+            return start - now
+
+class Fetcher:
+    """Pooled, rate-limited GETs with timeouts and retries, safe to share between threads"""
+
+    def __init__(self, concurrency=SCRAPER_HOST_CONCURRENCY, rate=SCRAPER_HOST_RATE, host_limits=None,
+                 timeout=(SCRAPER_CONNECT_TIMEOUT, SCRAPER_READ_TIMEOUT), retries=SCRAPER_RETRIES,
+                 backoff_base=SCRAPER_BACKOFF_BASE, backoff_max=SCRAPER_BACKOFF_MAX,
+                 pool_hosts=SCRAPER_POOL_HOSTS, user_agent=SCRAPER_USER_AGENT, sleep=time.sleep, state=None):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.host_limits = {**SCRAPER_HOST_LIMITS, **(host_limits or {})}
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sleep = sleep
+        self.state = state
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.bytes_received = 0
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+        # Retries are ours; the pool holds enough keep-alive connections for every slot of a host
+        largest = max([concurrency] + [limit[0] for limit in self.host_limits.values()])
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=largest, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = user_agent
+
+    def limiter(self, host):
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                concurrency, rate = self.host_limits.get(host, (self.concurrency, self.rate))
+                limiter = self._limiters[host] = HostLimiter(concurrency, rate)
+            return limiter
+
+    def get(self, url, params=None, headers=None):
+        """GET url, retrying transient failures; returns the response or raises FetchError"""
+        limiter = self.limiter(urlsplit(url).netloc)
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            with limiter.slots:
+                wait = limiter.reserve()
+                if wait > 0:
+                    self.sleep(wait)
+                try:
+                    response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = FetchError(f"GET {url} failed: {type(e).__name__}: {e}", url)
+                else:
+                    self._count(received=len(response.content))
+                    if response.status_code < 400:
+                        return response
+                    error = FetchError(f"GET {url} returned {response.status_code}", url, response.status_code)
+                    if response.status_code not in RETRY_STATUSES:
+                        self._count(failed=True)
+                        raise error
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if attempt == self.retries:
+                self._count(failed=True)
+                raise error
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_max, retry_after)
+            logger.info(f"Retrying {url} in {delay:.2f}s: {error}")
+            self._count(retried=True)
+            self.sleep(delay)
+
+    def page(self, url, params=None, fingerprint=None):
+        """GET a page, conditionally when a crawl state is attached; see scrapers.incremental"""
+        key = page_key(url, params)
+        record, headers = self.state.validators(key) if self.state is not None else (None, None)
+        page = Page(self.state, key, self.get(url, params=params, headers=headers), record, fingerprint)
+        if self.state is not None:
+            self.state.observe(page)
+        return page
+
+    def _count(self, received=None, retried=False, failed=False):
+        with self._lock:
+            if received is not None:
+                self.requests += 1
+                self.bytes_received += received
+            self.retried += retried
+            self.failures += failed
+
+    def connections_opened(self):
+        """TCP connections opened so far; lower than requests when keep-alive is reused"""
+        opened = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            opened += sum(pools[key].num_connections for key in pools.keys())
+        return opened
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retried,
+            "failures": self.failures,
+            "bytes_received": self.bytes_received,
+            "connections_opened": self.connections_opened(),
+        }
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
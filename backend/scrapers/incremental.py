@@ -0,0 +1,224 @@
+"""Conditional, incremental crawling.
+
+A CrawlState remembers what the previous crawl saw:
+
+  per page     the ETag and Last-Modified validators, a hash of the body,
+               its size, the CPU time parsing it took, and what the
+               source needs to carry on past it without parsing it again
+               (its listing count and next-page link)
+  per listing  a hash of the normalised listing
+
+With a state attached, Fetcher.page() sends If-None-Match and
+If-Modified-Since. A 304 means the page is unchanged and nothing is
+downloaded. A 200 whose body hashes the same as last time is also
+unchanged, which covers servers that send no validators. Sources skip
+parsing unchanged pages. After the crawl, changed_listings() drops every
+listing whose hash is unchanged, so only new or changed listings reach
+storage.
+
+Validators are stored only once a page has been parsed successfully. A
+failed parse is therefore retried in full on the next crawl. Each cycle's
+stats report the pages skipped, the bytes not downloaded and the parse
+CPU time not spent. The CPU figure uses the time each skipped page took
+to parse when it was last parsed.
+
+The state is a JSON file written atomically at the end of each cycle.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import requests
+
+SCRAPER_STATE_FILE = os.environ.get('SCRAPER_STATE_FILE', 'scraper_state.json')
+
+# Query parameters left out of page keys so credentials never reach the state file
+SECRET_PARAMS = frozenset({"api_key", "key", "token"})
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def page_key(url, params=None):
+    """Full URL of a request, without secret query parameters"""
+    params = {name: value for name, value in (params or {}).items() if name not in SECRET_PARAMS}
+    return requests.Request("GET", url, params=params).prepare().url
+
+def listing_key(listing):
+    """Stable identity of a listing within its source"""
+    identity = listing.get("external_id") or listing.get("url") or f"{listing.get('title')}|{listing.get('company')}"
+    return f"{listing['source']}:{identity}"
+
+def listing_hash(listing):
+    return content_hash(json.dumps(listing, sort_keys=True, default=str).encode())
+
+class Page:
+    """A fetched page; changed is False when the previous crawl already parsed the same content"""
+
+    def __init__(self, state, key, response, record, fingerprint=None):
+        self.state = state
+        self.key = key
+        self.url = response.url
+        self.status = response.status_code
+        self.response = response
+        self.record = record
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        if self.status == 304 and record is not None:
+            self.hash, self.not_modified = record["hash"], True
+        else:
+            body = fingerprint(response) if fingerprint else response.content
+            self.hash, self.not_modified = content_hash(body), False
+        self.changed = record is None or (not self.not_modified and record["hash"] != self.hash)
+        # Carried over from the last parse; parsing() replaces them
+        self.count = record.get("count") if record else None
+        self.next = record.get("next") if record else None
+
+    @property
+    def text(self):
+        return self.response.text
+
+    @contextmanager
+    def parsing(self):
+        """Wrap the parse of a changed page: times it and, if it succeeds, stores the page's validators"""
+        started = time.thread_time()
+        yield self
+        if self.state is not None:
+            self.state.record_page(self, (time.thread_time() - started) * 1000)
+
+class CrawlState:
+    """Page validators and listing hashes carried between crawls"""
+
+    def __init__(self, path=SCRAPER_STATE_FILE):
+        self.path = path
+        self.pages = {}
+        self.listings = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = self._empty_stats()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            self.pages = saved.get("pages", {})
+            self.listings = saved.get("listings", {})
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            "pages_fetched": 0,
+            "pages_not_modified": 0,
+            "pages_unchanged": 0,
+            "pages_parsed": 0,
+            "bytes_received": 0,
+            "bytes_saved": 0,
+            "parse_cpu_ms": 0.0,
+            "parse_cpu_saved_ms": 0.0,
+            "listings_new": 0,
+            "listings_changed": 0,
+            "listings_unchanged": 0,
+        }
+
+    def begin_cycle(self):
+        with self._lock:
+            self.stats = self._empty_stats()
+
+    def validators(self, key):
+        """The previous record for a page and the conditional headers it allows"""
+        with self._lock:
+            record = self.pages.get(key)
+        headers = {}
+        if record:
+            if record.get("etag"):
+                headers["If-None-Match"] = record["etag"]
+            if record.get("last_modified"):
+                headers["If-Modified-Since"] = record["last_modified"]
+        return record, headers
+
+    def observe(self, page):
+        """Count a fetched page; unchanged pages count what skipping them saved"""
+        with self._lock:
+            self.stats["pages_fetched"] += 1
+            self.stats["bytes_received"] += len(page.response.content)
+            if page.changed:
+                return
+            self.stats["pages_not_modified" if page.not_modified else "pages_unchanged"] += 1
+            self.stats["parse_cpu_saved_ms"] += page.record.get("parse_ms", 0.0)
+            if page.not_modified:
+                self.stats["bytes_saved"] += page.record.get("bytes", 0)
+            else:
+                # Same content under fresh validators; keep them so the next request can get a 304
+                page.record.update(etag=page.etag, last_modified=page.last_modified)
+            page.record["seen"] = datetime.utcnow().isoformat()
+
+    @contextmanager
+    def transaction(self):
+        """Undo the pages this thread records inside the block if the block raises"""
+        self._local.undo = {}
+        try:
+            yield
+        except BaseException:
+            with self._lock:
+                for key, previous in self._local.undo.items():
+                    if previous is None:
+                        self.pages.pop(key, None)
+                    else:
+                        self.pages[key] = previous
+            raise
+        finally:
+            self._local.undo = None
+
+    def record_page(self, page, parse_ms):
+        with self._lock:
+            undo = getattr(self._local, "undo", None)
+            if undo is not None and page.key not in undo:
+                undo[page.key] = self.pages.get(page.key)
+            self.stats["pages_parsed"] += 1
+            self.stats["parse_cpu_ms"] += parse_ms
+            self.pages[page.key] = {
+                "etag": page.etag,
+                "last_modified": page.last_modified,
+                "hash": page.hash,
+                "bytes": len(page.response.content),
+                "parse_ms": round(parse_ms, 3),
+                "count": page.count,
+                "next": page.next,
+                "seen": datetime.utcnow().isoformat(),
+            }
+
+    def changed_listings(self, listings):
+        """The new or changed listings, remembering their hashes for the next crawl"""
+        changed = []
+        with self._lock:
+            for listing in listings:
+                key, digest = listing_key(listing), listing_hash(listing)
+                previous = self.listings.get(key)
+                if previous == digest:
+                    self.stats["listings_unchanged"] += 1
+                    continue
+                self.stats["listings_changed" if previous else "listings_new"] += 1
+                self.listings[key] = digest
+                changed.append(listing)
+        return changed
+
+    def report(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["parse_cpu_ms"] = round(stats["parse_cpu_ms"], 2)
+        stats["parse_cpu_saved_ms"] = round(stats["parse_cpu_saved_ms"], 2)
+        return stats
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps({"pages": self.pages, "listings": self.listings})
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            f.write(data)
+        os.replace(temporary, self.path)
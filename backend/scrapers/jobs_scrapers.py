@@ -1,41 +1,253 @@
-import requests
+"""Internship sources and a concurrent runner for them.
+
+Each job board is a Source whose scrape() fetches pages through a shared
+Fetcher and returns listings as plain dicts (see make_listing). That way
+every source gets the same connection pool, timeouts, retries and
+per-host limits. run_sources() runs the sources in parallel threads. A
+source that fails is reported with its error and does not affect the
+others. crawl() is the incremental form: with a CrawlState, pages that
+have not changed are neither downloaded nor parsed, and only new or
+changed listings are returned (see scrapers.incremental).
+
+Base URLs come from the environment so the sources can be pointed at a
+stand-in server. The HTML selectors match the boards' listing pages;
+adjust them when a site changes its markup.
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import urljoin
+
 from bs4 import BeautifulSoup
-from fastapi import HTTPException
-import serpapi
 
-def get_indeed_internships(api_key):
+from scrapers.fetcher import Fetcher
+
+NUS_INTERNSHIPS_URL = os.environ.get('NUS_INTERNSHIPS_URL', 'https://nus.edu.sg/careers/internships')
+FASTJOBS_URL = os.environ.get('FASTJOBS_URL', 'https://www.fastjobs.sg/singapore-jobs/internship-jobs/')
+SERPAPI_URL = os.environ.get('SERPAPI_URL', 'https://serpapi.com/search.json')
+SERPAPI_API_KEY = os.environ.get('SERPAPI_API_KEY', '')
+SCRAPER_MAX_PAGES = int(os.environ.get('SCRAPER_MAX_PAGES', '5'))
+
+logger = logging.getLogger(__name__)
+
+def make_listing(source, title, company, url=None, location=None, description=None, external_id=None,
+                 posted=None):
+    """Listing dict with the same keys from every source"""
+    return {
+        "source": source,
+        "external_id": external_id,
+        "title": title,
+        "company": company,
+        "location": location,
+        "url": url,
+        "description": description,
+        "posted": posted,
+    }
+
+def _text(node, selector):
+    found = node.select_one(selector)
+    return found.get_text(" ", strip=True) if found else None
+
+class Source:
+    """A job board; scrape() returns its current listings"""
+    name = None
+
+    def scrape(self, fetcher):
+        raise NotImplementedError
+
+class NUSSource(Source):
+    """NUS Career Centre internship board, following rel="next" pagination"""
+    name = "nus"
+
+    def __init__(self, url=NUS_INTERNSHIPS_URL, max_pages=SCRAPER_MAX_PAGES):
+        self.url = url
+        self.max_pages = max_pages
+
+    def scrape(self, fetcher):
+        listings, url = [], self.url
+        for _ in range(self.max_pages):
+            page = fetcher.page(url)
+            if page.changed:
+                with page.parsing():
+                    soup = BeautifulSoup(page.text, "html.parser")
+                    found = self.parse(soup, page.url)
+                    next_link = soup.select_one('a[rel~="next"][href]')
+                    page.count = len(found)
+                    page.next = urljoin(page.url, next_link["href"]) if next_link else None
+                listings.extend(found)
+            if page.next is None:
+                break
+            url = page.next
+        return listings
+
+    def parse(self, soup, base_url):
+        listings = []
+        for job in soup.select(".job-listing"):
+            title = _text(job, "h3")
+            if not title:
+                continue
+            link = job.select_one("a[href]")
+            listings.append(make_listing(
+                self.name, title, _text(job, ".company") or "NUS",
+                url=urljoin(base_url, link["href"]) if link else None,
+                location=_text(job, ".location"),
+                description=_text(job, ".description"),
+                external_id=job.get("data-id"),
+            ))
+        return listings
+
+class FastJobsSource(Source):
+    """FastJobs internship category, read page by page until a page comes back empty"""
+    name = "fastjobs"
+
+    def __init__(self, url=FASTJOBS_URL, max_pages=SCRAPER_MAX_PAGES):
+        self.url = url
+        self.max_pages = max_pages
+
+    def scrape(self, fetcher):
+        listings = []
+        for number in range(1, self.max_pages + 1):
+            page = fetcher.page(self.url, params={"page": number} if number > 1 else None)
+            if page.changed:
+                with page.parsing():
+                    found = self.parse(BeautifulSoup(page.text, "html.parser"), page.url)
+                    page.count = len(found)
+                listings.extend(found)
+            if not page.count:
+                break
+        return listings
+
+    def parse(self, soup, base_url):
+        listings = []
+        for card in soup.select(".job-card"):
+            link = card.select_one("a.job-title[href]")
+            if link is None:
+                continue
+            listings.append(make_listing(
+                self.name, link.get_text(" ", strip=True), _text(card, ".company-name"),
+                url=urljoin(base_url, link["href"]),
+                location=_text(card, ".job-location"),
+                description=_text(card, ".job-summary"),
+                external_id=card.get("data-job-id"),
+                posted=_text(card, ".posted-date"),
+            ))
+        return listings
+
+class IndeedSource(Source):
+    """Indeed results through SerpAPI's JSON endpoint; skipped when no API key is set"""
+    name = "indeed"
+    page_size = 10
+
+    def __init__(self, api_key=SERPAPI_API_KEY, url=SERPAPI_URL, query="internship", location="Singapore",
+                 max_pages=SCRAPER_MAX_PAGES):
+        self.api_key = api_key
+        self.url = url
+        self.query = query
+        self.location = location
+        self.max_pages = max_pages
+
+    def scrape(self, fetcher):
+        if not self.api_key:
+            logger.info("SERPAPI_API_KEY is not set; skipping Indeed")
+            return []
+        listings = []
+        for number in range(self.max_pages):
+            page = fetcher.page(self.url, params={
+                "engine": "indeed", "q": self.query, "location": self.location,
+                "start": number * self.page_size, "api_key": self.api_key,
+            }, fingerprint=self.fingerprint)
+            if page.changed:
+                with page.parsing():
+                    jobs = page.response.json().get("jobs", [])
+                    page.count = len(jobs)
+                    listings.extend(make_listing(
+                        self.name, job.get("title"), job.get("company") or job.get("company_name"),
+                        url=job.get("link"),
+                        location=job.get("location"),
+                        description=job.get("snippet") or job.get("description"),
+                        external_id=job.get("job_id"),
+                        posted=job.get("date") or job.get("posted_at"),
+                    ) for job in jobs if job.get("title"))
+            if (page.count or 0) < self.page_size:
+                break
+        return listings
+
+    @staticmethod
+    def fingerprint(response):
+        # SerpAPI wraps results in per-search metadata, so only the jobs decide whether a page changed
+        return json.dumps(response.json().get("jobs", []), sort_keys=True).encode()
+
+def default_sources():
+    return [NUSSource(), IndeedSource(), FastJobsSource()]
+
+def run_sources(sources=None, fetcher=None, max_workers=None):
+    """Scrape every source concurrently; returns {name: {"listings", "error", "seconds"}}"""
+    sources = default_sources() if sources is None else sources
+    owns_fetcher = fetcher is None
+    fetcher = fetcher or Fetcher()
+
+    def run(source):
+        started = time.perf_counter()
+        # A failed source forgets the pages it parsed, so their listings come round again next crawl
+        transaction = fetcher.state.transaction() if fetcher.state is not None else nullcontext()
+        try:
+            with transaction:
+                listings, error = source.scrape(fetcher), None
+        except Exception as e:
+            logger.warning(f"Source {source.name} failed: {str(e)}")
+            listings, error = [], f"{type(e).__name__}: {e}"
+        return {"listings": listings, "error": error, "seconds": round(time.perf_counter() - started, 3)}
+
     try:
-        client = serpapi.Client(api_key=api_key)
-        results = client.search({
-            "engine": "indeed",
-            "q": "internship",
-            "location": "Singapore",
-        })
-        return results.get("jobs", [])
-    except Exception as e:
-        print(f"Indeed Error: {e}")
-        return []
+        if not sources:
+            return {}
+        with ThreadPoolExecutor(max_workers=max_workers or len(sources), thread_name_prefix="scraper") as pool:
+            return dict(zip([source.name for source in sources], pool.map(run, sources)))
+    finally:
+        if owns_fetcher:
+            fetcher.close()
 
-def scrape_nus_internships():
+def crawl(state, sources=None, fetcher=None, store=None, max_workers=None):
+    """One incremental crawl cycle; returns (results holding only new or changed listings, cycle stats)
+
+    store, if given, receives the changed listings before the state is saved,
+    so listings it fails to store are offered again by the next crawl.
+    """
+    owns_fetcher = fetcher is None
+    fetcher = fetcher or Fetcher()
+    fetcher.state = state
+    state.begin_cycle()
     try:
-        url = "https://nus.edu.sg/careers/internships"
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers)
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        internships = []
-        for job in soup.select(".job-listing"):  # Adjust selector based on NUS site
-            title = job.find("h3").text.strip()
-            company = "NUS"  # Default, adjust as needed
-            internships.append({"title": title, "company": company})
-        return internships
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"NUS Scraping failed: {str(e)}")
+        results = run_sources(sources, fetcher, max_workers)
+    finally:
+        if owns_fetcher:
+            fetcher.close()
+    for result in results.values():
+        result["listings"] = state.changed_listings(result["listings"])
+    if store is not None:
+        store([listing for result in results.values() for listing in result["listings"]])
+    state.save()
+    report = state.report()
+    logger.info("Crawl cycle finished", extra={"crawl": report})
+    return results, report
+
+def _scrape_one(source):
+    result = run_sources([source])[source.name]
+    if result["error"]:
+        logger.error(f"{source.name} scraping failed: {result['error']}")
+    return result["listings"]
+
+def get_indeed_internships(api_key):
+    return _scrape_one(IndeedSource(api_key=api_key))
+
+def scrape_nus_internships():
+    return _scrape_one(NUSSource())
 
 def scrape_fastjobs():
-    # Similar logic for FastJobs
-    pass
+    return _scrape_one(FastJobsSource())
 
 def scrape_indeed():
-    # Use SerpAPI or scraping with proxies
-    pass
\ No newline at end of file
+    return _scrape_one(IndeedSource())
@@ -0,0 +1,183 @@
+"""Full-text search over candidate resumes.
+
+SQLite keeps a standalone FTS5 table keyed by candidate id, refreshed by
+index_candidate() inside the same transaction as the candidate upsert.
+Postgres keeps a generated tsvector column with a GIN index, which the
+database maintains itself on every insert or update.
+
+Snippets are resume text, which the uploader controls. The database marks
+matches with private-use characters; the snippet is then HTML-escaped and
+only those characters become <mark> tags, so clients can render it as HTML.
+
+Every ORM insert, update or delete of a candidate bumps the "candidates"
+row of table_versions in the same transaction. candidates_version() reads
+that one row, so a search can answer 304 without counting the table.
+Writes that bypass the ORM must bump it themselves.
+"""
+import html
+import json
+import re
+
+from sqlalchemy import DDL, event, inspect, text, update
+
+from models import Candidate, TableVersion
+
+FTS_TABLE = "candidates_fts"
+
+# Match delimiters the database puts in snippets; replaced by <mark> tags after escaping
+MARK_START, MARK_END = "\ue000", "\ue001"
+
+SQLITE_CREATE_FTS = DDL(
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(name, skills, resume_text, tokenize='porter unicode61')"
+)
+SQLITE_DROP_FTS = DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+# Name and skills rank above body text
+POSTGRES_ADD_SEARCH_VECTOR = DDL(
+    "ALTER TABLE candidates ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(skills::text, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(resume_text, '')), 'C')"
+    ") STORED"
+)
+POSTGRES_CREATE_SEARCH_INDEX = DDL(
+    "CREATE INDEX IF NOT EXISTS ix_candidates_search_vector "
+    "ON candidates USING gin (search_vector)"
+)
+
+# Create and drop the search structures together with the candidates table
+event.listen(Candidate.__table__, "after_create", SQLITE_CREATE_FTS.execute_if(dialect="sqlite"))
+event.listen(Candidate.__table__, "after_drop", SQLITE_DROP_FTS.execute_if(dialect="sqlite"))
+event.listen(Candidate.__table__, "after_create", POSTGRES_ADD_SEARCH_VECTOR.execute_if(dialect="postgresql"))
+event.listen(Candidate.__table__, "after_create", POSTGRES_CREATE_SEARCH_INDEX.execute_if(dialect="postgresql"))
+
+def _seed_versions(target, connection, **kw):
+    connection.execute(target.insert().values(name=Candidate.__tablename__, version=0))
+
+event.listen(TableVersion.__table__, "after_create", _seed_versions)
+
+@event.listens_for(Candidate, "after_insert")
+@event.listens_for(Candidate, "after_update")
+@event.listens_for(Candidate, "after_delete")
+def _bump_candidates_version(mapper, connection, target):
+    connection.execute(
+        update(TableVersion)
+        .where(TableVersion.name == Candidate.__tablename__)
+        .values(version=TableVersion.version + 1)
+    )
+
+def ensure_search_index(bind):
+    """Create the search structures on a database whose candidates table predates them"""
+    with bind.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE},
+            ).first()
+            conn.execute(SQLITE_CREATE_FTS)
+            if not exists:
+                conn.execute(text(
+                    f"INSERT INTO {FTS_TABLE}(rowid, name, skills, resume_text) "
+                    "SELECT id, coalesce(name, ''), coalesce(skills, ''), coalesce(resume_text, '') "
+                    "FROM candidates"
+                ))
+        elif conn.dialect.name == "postgresql":
+            conn.execute(POSTGRES_ADD_SEARCH_VECTOR)
+            conn.execute(POSTGRES_CREATE_SEARCH_INDEX)
+
+def missing_search_index(bind):
+    """Search structures absent from the database, as missing_schema() reports tables and columns"""
+    inspector = inspect(bind)
+    if bind.dialect.name == "sqlite":
+        return [] if FTS_TABLE in inspector.get_table_names() else [FTS_TABLE]
+    if bind.dialect.name == "postgresql" and "candidates" in inspector.get_table_names():
+        columns = {column["name"] for column in inspector.get_columns("candidates")}
+        return [] if "search_vector" in columns else ["candidates.search_vector"]
+    return []
+
+def index_candidate(db, candidate):
+    """Refresh the search entry for one candidate; call after flush, before commit"""
+    if db.get_bind().dialect.name != "sqlite":
+        return  # the Postgres tsvector column is generated by the database
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": candidate.id})
+    db.execute(
+        text(f"INSERT INTO {FTS_TABLE}(rowid, name, skills, resume_text) VALUES (:id, :name, :skills, :resume_text)"),
+        {
+            "id": candidate.id,
+            "name": candidate.name or "",
+            "skills": " ".join(candidate.get_skills()),
+            "resume_text": candidate.resume_text or "",
+        },
+    )
+
+def _fts5_query(query):
+    """Turn free text into an FTS5 query that ANDs each quoted term"""
+    terms = re.findall(r"\w+", query.lower())
+    return " ".join(f'"{term}"' for term in terms)
+
+def search_candidates(db, query, limit=20, offset=0):
+    """Return candidates ranked by relevance to query, each with a highlighted snippet"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        match = _fts5_query(query)
+        if not match:
+            return []
+        rows = db.execute(
+            text(
+                f"SELECT c.id, c.name, c.email, c.designation, c.skills, "
+                f"snippet({FTS_TABLE}, 2, :mark_start, :mark_end, '…', 12) AS snippet, "
+                f"bm25({FTS_TABLE}, 10.0, 5.0, 1.0) AS rank "
+                f"FROM {FTS_TABLE} JOIN candidates c ON c.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH :match "
+                f"ORDER BY rank LIMIT :limit OFFSET :offset"
+            ),
+            {"match": match, "limit": limit, "offset": offset, "mark_start": MARK_START, "mark_end": MARK_END},
+        ).mappings().all()
+        # bm25() is lower-is-better; flip it so higher scores rank first
+        return [_search_result(row, -row["rank"]) for row in rows]
+
+    rows = db.execute(
+        text(
+            "SELECT c.id, c.name, c.email, c.designation, c.skills, "
+            "ts_headline('english', coalesce(c.resume_text, ''), hits.query, :headline_options) AS snippet, hits.rank "
+            "FROM ("
+            "  SELECT id, ts_rank_cd(search_vector, q) AS rank, q AS query "
+            "  FROM candidates, websearch_to_tsquery('english', :query) q "
+            "  WHERE search_vector @@ q "
+            "  ORDER BY rank DESC LIMIT :limit OFFSET :offset"
+            ") hits JOIN candidates c ON c.id = hits.id "
+            "ORDER BY hits.rank DESC"
+        ),
+        {
+            "query": query, "limit": limit, "offset": offset,
+            "headline_options": f'StartSel="{MARK_START}", StopSel="{MARK_END}", MaxWords=24, MinWords=8',
+        },
+    ).mappings().all()
+    return [_search_result(row, row["rank"]) for row in rows]
+
+def candidates_version(db):
+    """Change counter of the candidates table; changes whenever any search result could"""
+    return db.query(TableVersion.version).filter(TableVersion.name == Candidate.__tablename__).scalar()
+
+def highlight(snippet):
+    """HTML-safe snippet with matches wrapped in <mark>"""
+    if not snippet:
+        return snippet
+    return html.escape(snippet).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+def _search_result(row, score):
+    skills = row["skills"]
+    if isinstance(skills, str):
+        # Raw SQL bypasses the JSON column type on SQLite
+        skills = json.loads(skills)
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "email": row["email"],
+        "designation": row["designation"],
+        "skills": skills or [],
+        "snippet": highlight(row["snippet"]),
+        "score": round(float(score), 6),
+    }
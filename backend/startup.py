@@ -0,0 +1,129 @@
+"""Application startup in timed phases.
+
+main.py imports this module before anything else, so IMPORT_STARTED marks
+the start of loading the app. Importing main only defines the app. The
+heavy work runs in the lifespan, one timed phase at a time:
+
+    schema            create_all, column migrations and the search index,
+                      only when CREATE_SCHEMA=1
+    schema_check      otherwise, stop with SchemaMismatch if the database
+                      lacks a table or column the models use
+    password_backend  load passlib's bcrypt backend
+    parser            import spaCy and dateparser and load the model, in a
+                      background thread
+
+The app serves requests while the parser loads. /health reports "warming"
+until it is done, and uploads arriving meanwhile wait for the model. When
+the last phase ends, a startup report is logged. The time from the
+import to the first response sent is logged and exported on /metrics.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import startup_first_response, startup_phase_duration
+
+IMPORT_STARTED = time.perf_counter()
+
+CREATE_SCHEMA = os.environ.get('CREATE_SCHEMA', '').lower() in ('1', 'true', 'yes')
+
+logger = logging.getLogger("startup")
+
+class StartupReport:
+    """Durations of the startup phases, in seconds"""
+
+    def __init__(self, started=IMPORT_STARTED):
+        self.started = started
+        self.phases = {}
+        self.first_response = None
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name, seconds):
+        self.phases[name] = seconds
+        startup_phase_duration.labels(name).set(seconds)
+
+    def as_dict(self):
+        report = {f"{name}_ms": round(seconds * 1000, 1) for name, seconds in list(self.phases.items())}
+        if self.first_response is not None:
+            report["first_response_ms"] = round(self.first_response * 1000, 1)
+        return report
+
+    def log(self, message):
+        logger.info("%s: %s", message, ", ".join(f"{key}={value}" for key, value in self.as_dict().items()),
+                    extra={"startup": self.as_dict()})
+
+class BackgroundLoad:
+    """Runs a loader once in a daemon thread and records how long it took"""
+
+    def __init__(self, name, loader, report):
+        self.name = name
+        self.loader = loader
+        self.report = report
+        self.state = "idle"
+        self._done = threading.Event()
+
+    @property
+    def loading(self):
+        return self.state == "loading"
+
+    def start(self):
+        if self.state != "idle":
+            return
+        self.state = "loading"
+        threading.Thread(target=self._run, name=f"warm-{self.name}", daemon=True).start()
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            self.loader()
+            self.state = "ready"
+        except Exception:
+            logger.exception("Startup phase %s failed", self.name)
+            self.state = "failed"
+        finally:
+            self.report.record(self.name, time.perf_counter() - started)
+            self._done.set()
+            self.report.log("Startup complete")
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+class FirstResponseMiddleware:
+    """ASGI middleware noting when the first HTTP response starts"""
+
+    def __init__(self, app, report):
+        self.app = app
+        self.report = report
+
+    async def __call__(self, scope, receive, send):
+        if self.report.first_response is not None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and self.report.first_response is None:
+                self.report.first_response = time.perf_counter() - self.report.started
+                startup_first_response.labels().set(self.report.first_response)
+                logger.info("First response %.1f ms after import", self.report.first_response * 1000)
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
+
+startup_report = StartupReport()
+
+def _restart_clock_in_child():
+    # A worker forked from a preloaded master starts serving from the fork, not the import
+    startup_report.started = time.perf_counter()
+    startup_report.first_response = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_clock_in_child)
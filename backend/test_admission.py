@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+class TestAdmissionController:
+    """Tests for the concurrency limit and wait queue"""
+
+    def test_admits_up_to_limit(self):
+        """Test requests run immediately while slots are free"""
+        async def scenario():
+            controller = AdmissionController(max_in_flight=2, max_queue=0, queue_timeout=1)
+            await controller.acquire()
+            await controller.acquire()
+            assert controller.in_flight == 2
+            controller.release()
+            controller.release()
+            assert controller.in_flight == 0
+            return controller
+
+        assert asyncio.run(scenario()).admitted == 2
+
+    def test_queue_full_rejected_with_429(self):
+        """Test overflow beyond the queue is rejected immediately with Retry-After"""
+        async def scenario():
+            controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5)
+            await controller.acquire()
+            queued = asyncio.create_task(controller.acquire())
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as excinfo:
+                await controller.acquire()
+            controller.release()
+            await queued
+            return controller, excinfo.value
+
+        controller, error = asyncio.run(scenario())
+        assert error.status_code == 429
+        assert error.retry_after >= 1
+        assert controller.rejected_queue_full == 1
+
+    def test_queue_timeout_rejected_with_503(self):
+        """Test a request that waits too long is rejected and leaves the queue"""
+        async def scenario():
+            controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=0.05)
+            await controller.acquire()
+            with pytest.raises(AdmissionRejected) as excinfo:
+                await controller.acquire()
+            return controller, excinfo.value
+
+        controller, error = asyncio.run(scenario())
+        assert error.status_code == 503
+        assert controller.queue_depth == 0
+        assert controller.rejected_timeout == 1
+
+    def test_fifo_handoff(self):
+        """Test queued requests are admitted in arrival order as slots free up"""
+        async def scenario():
+            controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=5)
+            order = []
+
+            async def job(name):
+                async with controller.slot():
+                    order.append(name)
+                    await asyncio.sleep(0.01)
+
+            await asyncio.gather(*(job(i) for i in range(4)))
+            return controller, order
+
+        controller, order = asyncio.run(scenario())
+        assert order == [0, 1, 2, 3]
+        assert controller.in_flight == 0
+        assert controller.queue_depth == 0
+
+    def test_cancelled_waiter_leaves_queue(self):
+        """Test a waiter cancelled while queued does not keep a place or a slot"""
+        async def scenario():
+            controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=5)
+            await controller.acquire()
+            waiting = asyncio.create_task(controller.acquire())
+            await asyncio.sleep(0)
+            waiting.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiting
+            controller.release()
+            return controller
+
+        controller = asyncio.run(scenario())
+        assert controller.queue_depth == 0
+        assert controller.in_flight == 0
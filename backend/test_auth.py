@@ -8,6 +8,8 @@ from sqlalchemy.orm import Session
 from auth import (
     verify_password, 
     get_password_hash, 
+    password_needs_rehash,
+    load_bcrypt_rounds,
     create_access_token, 
     get_current_user,
     SECRET_KEY,
@@ -15,6 +17,15 @@ from auth import (
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from models import User
+from token_cache import token_cache, UserSnapshot
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    """Start every test with an empty token cache"""
+    token_cache.clear()
+    yield
+    token_cache.clear()
 
 
 class TestPasswordFunctions:
@@ -68,6 +79,39 @@ class TestPasswordFunctions:
             verify_password(None, hashed)
 
 
+class TestPasswordHashProfiles:
+    """Test bcrypt cost profiles and rehash detection"""
+    
+    def test_profile_rounds(self):
+        """Test each profile maps to its bcrypt cost"""
+        assert load_bcrypt_rounds("production") == 12
+        assert load_bcrypt_rounds("test") == 4
+    
+    def test_rounds_override(self):
+        """Test BCRYPT_ROUNDS-style overrides replace the profile cost"""
+        assert load_bcrypt_rounds("production", override="13") == 13
+    
+    def test_unknown_profile_rejected(self):
+        """Test an unknown profile name is rejected at startup"""
+        with pytest.raises(ValueError, match="PASSWORD_HASH_PROFILE"):
+            load_bcrypt_rounds("fast")
+    
+    def test_out_of_range_rounds_rejected(self):
+        """Test costs bcrypt cannot use are rejected"""
+        with pytest.raises(ValueError, match="between 4 and 31"):
+            load_bcrypt_rounds("test", override="3")
+    
+    def test_current_hash_does_not_need_rehash(self):
+        """Test a hash made at the current cost is left alone"""
+        assert password_needs_rehash(get_password_hash("test_password123")) is False
+    
+    def test_weaker_hash_needs_rehash(self):
+        """Test a hash below the current cost is flagged for upgrade"""
+        with patch('auth.pwd_context.needs_update', return_value=True) as needs_update:
+            assert password_needs_rehash("$2b$04$abc") is True
+            needs_update.assert_called_once_with("$2b$04$abc")
+
+
 class TestTokenFunctions:
     """Test JWT token creation and validation functions"""
     
@@ -185,7 +229,23 @@ class TestGetCurrentUser:
         
         result = await get_current_user(valid_token, mock_db)
         
-        assert result == mock_user
+        assert isinstance(result, UserSnapshot)
+        assert (result.id, result.email, result.username) == (1, "test@example.com", "testuser")
+        mock_db.query.assert_called_once_with(User)
+    
+    @pytest.mark.asyncio
+    async def test_get_current_user_cached(self, mock_db, mock_user, valid_token):
+        """Test a second call with the same token skips decoding and the DB"""
+        mock_db.query.return_value.filter.return_value.first.return_value = mock_user
+        
+        await get_current_user(valid_token, mock_db)
+        with patch('auth.jwt.decode') as mock_decode:
+            result = await get_current_user(valid_token, mock_db)
+        
+        assert isinstance(result, UserSnapshot)
+        assert result.email == mock_user.email
+        assert result.id == mock_user.id
+        mock_decode.assert_not_called()
         mock_db.query.assert_called_once_with(User)
     
     @pytest.mark.asyncio
@@ -301,7 +361,7 @@ class TestIntegration:
         # Step 5: Get current user from token
         current_user = await get_current_user(token, mock_db)
         
-        assert current_user == mock_user
+        assert isinstance(current_user, UserSnapshot)
         assert current_user.email == email
     
     def test_password_hash_and_verify_cycle(self):
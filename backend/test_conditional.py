@@ -0,0 +1,74 @@
+from unittest.mock import Mock
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from conditional import (body_etag, conditional_response, etag_matches, make_etag, parse_cache_control)
+
+
+def make_request(path="/me", if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    route = Mock(path=path)
+    return Request({"type": "http", "method": "GET", "path": path, "headers": headers, "query_string": b"",
+                    "route": route})
+
+
+class TestETags:
+    """Tests for building and comparing ETags"""
+
+    def test_make_etag(self):
+        """Test version ETags are quoted and change with any component"""
+        etag = make_etag("user", 1, "2025-01-01T00:00:00")
+        assert etag.startswith('"') and etag.endswith('"')
+        assert etag == make_etag("user", 1, "2025-01-01T00:00:00")
+        assert etag != make_etag("user", 1, "2025-01-01T00:00:01")
+
+    def test_if_none_match(self):
+        """Test weak comparison, lists and the wildcard"""
+        etag = body_etag(b"{}")
+        assert etag_matches(etag, etag)
+        assert etag_matches(f'"other", W/{etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches('"other"', etag)
+        assert not etag_matches(None, etag)
+
+    def test_parse_cache_control(self):
+        """Test the route=directives;... format keeps commas inside directives"""
+        rules = parse_cache_control("/me=private, max-age=5; /internships=public, max-age=60;")
+        assert rules == {"/me": "private, max-age=5", "/internships": "public, max-age=60"}
+
+
+class TestConditionalResponse:
+    """Tests for answering 304 instead of rendering"""
+
+    def test_not_modified_skips_render(self):
+        """Test a matching version ETag never calls render"""
+        etag = make_etag("user", 1, 5)
+        render = Mock()
+        response = conditional_response(make_request(if_none_match=etag), render, etag=etag)
+        assert response.status_code == 304
+        assert response.body == b""
+        assert response.headers["etag"] == etag
+        assert response.headers["cache-control"] == "private, no-cache"
+        render.assert_not_called()
+
+    def test_modified_renders(self):
+        """Test a stale ETag gets the full body with the current ETag"""
+        etag = make_etag("user", 1, 6)
+        response = conditional_response(make_request(if_none_match='"stale"'), lambda: JSONResponse({"id": 1}),
+                                        etag=etag)
+        assert response.status_code == 200
+        assert response.headers["etag"] == etag
+
+    def test_body_hash_fallback(self):
+        """Test responses without version data get an ETag hashed from the body"""
+        render = lambda: JSONResponse({"id": 1})
+        first = conditional_response(make_request(), render)
+        assert first.headers["etag"] == body_etag(first.body)
+        again = conditional_response(make_request(if_none_match=first.headers["etag"]), render)
+        assert again.status_code == 304
+
+    def test_route_cache_control(self):
+        """Test unknown routes fall back to the default directives"""
+        response = conditional_response(make_request("/elsewhere"), lambda: JSONResponse({}))
+        assert response.headers["cache-control"] == "private, no-cache"
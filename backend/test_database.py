@@ -0,0 +1,325 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from database import (
+    build_engine,
+    client_keys,
+    load_profile,
+    missing_schema,
+    subject_key,
+    validate_profile,
+    ReplicaRouter,
+    PERFORMANCE_PROFILES,
+)
+
+
+class TestLoadProfile:
+    """Tests for selecting performance profiles"""
+
+    def test_default_profile(self):
+        """Test the default profile is used when DB_PROFILE is unset"""
+        profile = load_profile(environ={})
+        assert profile["name"] == "default"
+        assert profile["sqlite"]["journal_mode"] == "WAL"
+        assert profile["sqlite"]["synchronous"] == "NORMAL"
+
+    def test_profile_from_environment(self):
+        """Test DB_PROFILE selects a named profile"""
+        profile = load_profile(environ={"DB_PROFILE": "high-concurrency"})
+        assert profile["name"] == "high-concurrency"
+        assert profile["postgres"]["pool_size"] == 20
+
+    def test_unknown_profile(self):
+        """Test an unknown profile name is rejected"""
+        with pytest.raises(ValueError, match="Unknown DB_PROFILE"):
+            load_profile(environ={"DB_PROFILE": "turbo"})
+
+    def test_pool_overrides(self):
+        """Test Postgres pool settings can be overridden from the environment"""
+        profile = load_profile(environ={
+            "DB_POOL_SIZE": "12",
+            "DB_MAX_OVERFLOW": "4",
+            "DB_POOL_PRE_PING": "false",
+            "DB_POOL_RECYCLE": "600",
+        })
+        assert profile["postgres"]["pool_size"] == 12
+        assert profile["postgres"]["max_overflow"] == 4
+        assert profile["postgres"]["pool_pre_ping"] is False
+        assert profile["postgres"]["pool_recycle"] == 600
+
+    def test_invalid_pool_override(self):
+        """Test a non-numeric pool override is rejected"""
+        with pytest.raises(ValueError, match="DB_POOL_SIZE"):
+            load_profile(environ={"DB_POOL_SIZE": "lots"})
+
+    def test_profiles_do_not_share_state(self):
+        """Test overrides do not leak into the built-in profile table"""
+        load_profile(environ={"DB_POOL_SIZE": "99"})
+        assert PERFORMANCE_PROFILES["default"]["postgres"]["pool_size"] == 5
+
+
+class TestValidateProfile:
+    """Tests for profile validation at startup"""
+
+    @pytest.mark.parametrize("name", sorted(PERFORMANCE_PROFILES))
+    def test_builtin_profiles_are_valid(self, name):
+        """Test every built-in profile passes validation"""
+        validate_profile(load_profile(name, environ={}))
+
+    def test_invalid_journal_mode(self):
+        """Test an unknown journal mode is rejected"""
+        profile = load_profile(environ={})
+        profile["sqlite"]["journal_mode"] = "FAST"
+        with pytest.raises(ValueError, match="journal_mode"):
+            validate_profile(profile)
+
+    def test_invalid_pool_size(self):
+        """Test a pool size below one is rejected"""
+        profile = load_profile(environ={})
+        profile["postgres"]["pool_size"] = 0
+        with pytest.raises(ValueError, match="pool_size"):
+            validate_profile(profile)
+
+
+class TestBuildEngine:
+    """Tests for engine creation with SQLite PRAGMAs"""
+
+    def test_sqlite_pragmas_applied(self, tmp_path):
+        """Test WAL and the other PRAGMAs are set on new connections"""
+        engine = build_engine(f"sqlite:///{tmp_path / 'wal.db'}", load_profile(environ={}))
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+            assert conn.execute(text("PRAGMA cache_size")).scalar() == -16000
+        engine.dispose()
+
+    def test_legacy_profile_keeps_rollback_journal(self, tmp_path):
+        """Test the legacy profile leaves SQLite defaults untouched"""
+        engine = build_engine(f"sqlite:///{tmp_path / 'legacy.db'}", load_profile("legacy", environ={}))
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "delete"
+        engine.dispose()
+
+    def test_invalid_profile_fails_at_build(self, tmp_path):
+        """Test an invalid profile stops engine creation"""
+        profile = load_profile(environ={})
+        profile["sqlite"]["busy_timeout"] = -1
+        with pytest.raises(ValueError, match="busy_timeout"):
+            build_engine(f"sqlite:///{tmp_path / 'bad.db'}", profile)
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _make_db(path, label):
+    """Create a SQLite file holding a single row naming which database it is"""
+    engine = build_engine(f"sqlite:///{path}", load_profile(environ={}))
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE whoami (label TEXT)"))
+        conn.execute(text("INSERT INTO whoami VALUES (:label)"), {"label": label})
+    return engine
+
+
+def _read_label(router, keys=()):
+    db = router.read_session(keys)
+    try:
+        return db.execute(text("SELECT label FROM whoami")).scalar()
+    finally:
+        db.close()
+
+
+class TestReplicaRouter:
+    """Tests for routing reads between a primary and replicas"""
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def primary(self, tmp_path):
+        engine = _make_db(tmp_path / "primary.db", "primary")
+        yield engine
+        engine.dispose()
+
+    @pytest.fixture
+    def replicas(self, tmp_path):
+        engines = [
+            _make_db(tmp_path / "replica1.db", "replica1"),
+            _make_db(tmp_path / "replica2.db", "replica2"),
+        ]
+        yield engines
+        for engine in engines:
+            engine.dispose()
+
+    def test_no_replicas_reads_primary(self, primary, clock):
+        """Test reads use the primary when no replicas are configured"""
+        router = ReplicaRouter(primary, [], clock=clock)
+        assert _read_label(router) == "primary"
+
+    def test_round_robin(self, primary, replicas, clock):
+        """Test reads alternate between replicas"""
+        router = ReplicaRouter(primary, replicas, clock=clock)
+        labels = [_read_label(router) for _ in range(4)]
+        assert labels == ["replica1", "replica2", "replica1", "replica2"]
+
+    def test_read_your_writes_window(self, primary, replicas, clock):
+        """Test a client that just wrote reads from the primary until the window ends"""
+        router = ReplicaRouter(primary, replicas[:1], read_your_writes=5, clock=clock)
+        router.mark_write(["ip:1.2.3.4"])
+
+        assert _read_label(router, ["ip:1.2.3.4"]) == "primary"
+        assert _read_label(router, ["ip:5.6.7.8"]) == "replica1"
+
+        clock.now += 6
+        assert _read_label(router, ["ip:1.2.3.4"]) == "replica1"
+
+    def test_tracked_clients_are_bounded(self, primary, clock):
+        """Test the read-your-writes table evicts its oldest entries"""
+        router = ReplicaRouter(primary, [], max_tracked_clients=2, clock=clock)
+        router.mark_write(["a"])
+        router.mark_write(["b"])
+        router.mark_write(["c"])
+        assert not router.recently_wrote(["a"])
+        assert router.recently_wrote(["c"])
+
+    def test_failover_to_healthy_replica(self, primary, replicas, clock):
+        """Test an unhealthy replica is skipped"""
+        router = ReplicaRouter(primary, replicas, clock=clock)
+        router.mark_unhealthy(replicas[0])
+        assert {_read_label(router) for _ in range(4)} == {"replica2"}
+
+    def test_failover_to_primary(self, primary, tmp_path, clock):
+        """Test reads fall back to the primary when no replica answers the health check"""
+        broken = build_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}", load_profile(environ={}))
+        router = ReplicaRouter(primary, [broken], health_interval=5, clock=clock)
+        assert _read_label(router) == "primary"
+        assert router.is_healthy(broken) is False
+
+    def test_health_is_rechecked(self, primary, replicas, clock):
+        """Test a replica marked down is used again once its health check passes"""
+        router = ReplicaRouter(primary, replicas[:1], health_interval=5, clock=clock)
+        router.mark_unhealthy(replicas[0])
+        assert _read_label(router) == "primary"
+
+        clock.now += 6
+        assert _read_label(router) == "replica1"
+
+    def test_replica_failing_to_connect_falls_back(self, primary, tmp_path, clock):
+        """Test a replica still cached as healthy that cannot connect is marked down and the primary read"""
+        broken = build_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}", load_profile(environ={}))
+        router = ReplicaRouter(primary, [broken], health_interval=5, clock=clock)
+        router._health[broken] = (True, clock())
+        assert _read_label(router) == "primary"
+        assert router.is_healthy(broken) is False
+
+    def test_read_error_marks_replica_down(self, primary, replicas, clock, monkeypatch):
+        """Test get_read_db marks the replica down when a query on it fails"""
+        import database
+        router = ReplicaRouter(primary, replicas[:1], health_interval=5, clock=clock)
+        monkeypatch.setattr(database, "read_router", router)
+        dependency = database.get_read_db()
+        next(dependency)
+        with pytest.raises(OperationalError):
+            dependency.throw(OperationalError("SELECT 1", {}, Exception("connection lost")))
+        assert _read_label(router) == "primary"
+
+
+class TestClientKeys:
+    """Tests for the keys that pin a client to the primary"""
+
+    def request(self, headers=()):
+        from starlette.requests import Request
+        return Request({"type": "http", "headers": list(headers), "client": ("10.0.0.1", 5000)})
+
+    def test_token_alone_when_authenticated(self):
+        """Test an authenticated client is pinned by its token, not its shared address"""
+        keys = client_keys(self.request([(b"authorization", b"Bearer abc")]))
+        assert len(keys) == 1 and keys[0].startswith("auth:")
+
+    def test_subject_when_token_names_one(self):
+        """Test a bearer token is pinned by its subject, which login pins too"""
+        from jose import jwt
+        token = jwt.encode({"sub": "ada@example.com"}, "any-key", algorithm="HS256")
+        keys = client_keys(self.request([(b"authorization", f"Bearer {token}".encode())]))
+        assert keys == [subject_key("ada@example.com")]
+
+    def test_address_when_anonymous(self):
+        """Test an anonymous client is pinned by its address"""
+        assert client_keys(self.request()) == ["ip:10.0.0.1"]
+
+
+class TestAddMissingColumns:
+    """Tests for adding new optional columns to existing tables"""
+
+    def test_adds_nullable_column(self, tmp_path):
+        """Test a column added to a model is created on an older table"""
+        from sqlalchemy import Column, Integer, MetaData, String, Table, inspect
+        from database import add_missing_columns
+
+        engine = build_engine(f"sqlite:///{tmp_path / 'old.db'}", load_profile(environ={}))
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE things (id INTEGER PRIMARY KEY)"))
+
+        metadata = MetaData()
+        Table("things", metadata, Column("id", Integer, primary_key=True), Column("label", String(50)))
+        Table("other", metadata, Column("id", Integer, primary_key=True))
+        add_missing_columns(engine, metadata)
+
+        columns = {c["name"] for c in inspect(engine).get_columns("things")}
+        assert columns == {"id", "label"}
+        assert "other" not in inspect(engine).get_table_names()
+        engine.dispose()
+
+
+class TestMissingSchema:
+    """Tests for detecting a database older than the models"""
+
+    def test_reports_tables_and_columns(self, tmp_path):
+        """Test missing tables and columns are listed, present ones are not"""
+        from sqlalchemy import Column, Integer, MetaData, String, Table
+
+        engine = build_engine(f"sqlite:///{tmp_path / 'old.db'}", load_profile(environ={}))
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE things (id INTEGER PRIMARY KEY)"))
+
+        metadata = MetaData()
+        Table("things", metadata, Column("id", Integer, primary_key=True), Column("label", String(50)))
+        Table("other", metadata, Column("id", Integer, primary_key=True))
+        assert sorted(missing_schema(engine, metadata)) == ["other", "things.label"]
+
+        metadata.create_all(engine, tables=[metadata.tables["other"]])
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE things ADD COLUMN label VARCHAR(50)"))
+        assert missing_schema(engine, metadata) == []
+        engine.dispose()
+
+
+class TestAddMissingIndexes:
+    """Tests for creating new indexes on existing tables"""
+
+    def test_creates_missing_index(self, tmp_path):
+        """Test an index added to a model is created on an older table"""
+        from sqlalchemy import Column, Index, Integer, MetaData, String, Table, inspect
+        from database import add_missing_indexes
+
+        engine = build_engine(f"sqlite:///{tmp_path / 'old.db'}", load_profile(environ={}))
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE things (id INTEGER PRIMARY KEY, label VARCHAR(50))"))
+
+        metadata = MetaData()
+        Table("things", metadata, Column("id", Integer, primary_key=True), Column("label", String(50)),
+              Index("ix_things_label", "label", "id"))
+        add_missing_indexes(engine, metadata)
+        add_missing_indexes(engine, metadata)
+
+        assert [index["name"] for index in inspect(engine).get_indexes("things")] == ["ix_things_label"]
+        engine.dispose()
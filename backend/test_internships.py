@@ -0,0 +1,165 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from internships import (InvalidCursor, canonical_key, get_internship, ingest_internships, list_internships,
+                         monthly_stipend, normalise, parse_date)
+from models import Internship
+
+TODAY = date(2025, 5, 10)
+
+
+@pytest.fixture
+def db_session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'internships.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def listing(i, **fields):
+    return {"source": "fastjobs", "external_id": f"f{i}", "title": f"Software Intern {i}", "company": "Shopee",
+            "location": "Tampines", "posted": "2 days ago", **fields}
+
+
+class TestNormalise:
+    """Tests for turning scraped and frontend records into Internship columns"""
+
+    def test_scraper_listing(self):
+        """Test whitespace, dates, stipend and category are normalised"""
+        row = normalise(listing(1, title="  Software   Intern 1 ", stipend="S$1,200 / month",
+                                skills="Python, SQL, python"), today=TODAY)
+        assert row["title"] == "Software Intern 1"
+        assert row["posted_date"] == date(2025, 5, 8)
+        assert row["stipend_monthly"] == 1200
+        assert row["skills"] == ["Python", "SQL"]
+        assert row["category"] == "technology"
+
+    def test_frontend_record(self):
+        """Test the camelCase fields from internshipData.js map onto columns"""
+        row = normalise({"id": 1, "title": "Data Analyst Intern", "company": "DataViz", "source": "linkedin",
+                         "category": "data", "deadline": "15/08/2025", "postedDate": "01/05/2025",
+                         "applicationCount": 45, "companySize": "201-500 employees"})
+        assert (row["deadline"], row["posted_date"]) == (date(2025, 8, 15), date(2025, 5, 1))
+        assert (row["application_count"], row["company_size"]) == (45, "201-500 employees")
+        assert "id" not in row
+
+    def test_invalid(self):
+        """Test listings without a title, company or source are rejected"""
+        assert normalise({"source": "nus", "title": "Intern"}) is None
+
+    def test_helpers(self):
+        """Test stipend periods, date formats and canonical keys"""
+        assert monthly_stipend("$10 per hour") == 1600
+        assert monthly_stipend("Unpaid") is None
+        assert parse_date("2025-08-15T00:00:00") == date(2025, 8, 15)
+        assert parse_date("31/02/2025") is None
+        assert parse_date("1 week ago", today=TODAY) == date(2025, 5, 3)
+        assert canonical_key("NUS", None, "Data  Intern", "GovTech") == canonical_key("nus", None, "data intern",
+                                                                                      "GOVTECH")
+        assert canonical_key("nus", "1", "A", "B") == canonical_key("nus", "1", "Renamed", "B")
+
+
+class TestIngest:
+    """Tests for deduplicated bulk upserts"""
+
+    def test_insert_update_unchanged(self, db_session):
+        """Test re-ingesting writes only listings whose content changed"""
+        report = ingest_internships(db_session, [listing(i) for i in range(5)], chunk_size=2, today=TODAY)
+        assert (report["inserted"], report["updated"], report["unchanged"]) == (5, 0, 0)
+        first = db_session.scalar(select(Internship).where(Internship.external_id == "f0"))
+        created, updated = first.created_at, first.updated_at
+
+        changed = [listing(i) for i in range(5)]
+        changed[0]["stipend"] = "S$900/month"
+        report = ingest_internships(db_session, changed + [listing(5)], chunk_size=2, today=TODAY)
+        assert (report["inserted"], report["updated"], report["unchanged"]) == (1, 1, 4)
+
+        db_session.expire_all()
+        first = db_session.scalar(select(Internship).where(Internship.external_id == "f0"))
+        assert first.stipend_monthly == 900
+        assert first.created_at == created and first.updated_at > updated
+        assert db_session.scalar(select(func.count()).select_from(Internship)) == 6
+
+    def test_dedupes_within_batch(self, db_session):
+        """Test the same listing twice in one batch is stored once, last sighting winning"""
+        report = ingest_internships(db_session, [listing(1, location="Jurong"), listing(1), {"title": "x"}],
+                                    today=TODAY)
+        assert (report["received"], report["duplicates"], report["invalid"], report["inserted"]) == (3, 1, 1, 1)
+        assert db_session.scalar(select(Internship.location)) == "Tampines"
+
+    def test_title_company_fallback(self, db_session):
+        """Test listings without an external id dedupe on source, title and company"""
+        nus = {"source": "nus", "title": "Research Intern", "company": "NUS"}
+        ingest_internships(db_session, [nus])
+        report = ingest_internships(db_session, [{**nus, "title": "research  intern", "location": "Kent Ridge"}])
+        assert report["updated"] == 1
+        assert db_session.scalar(select(func.count()).select_from(Internship)) == 1
+
+
+def walk(db, **filters):
+    """Every card, following cursors two at a time"""
+    cards, cursor = [], None
+    while True:
+        page, cursor = list_internships(db, limit=2, cursor=cursor, **filters)
+        cards += page
+        if cursor is None:
+            return cards
+
+
+class TestListInternships:
+    """Tests for filtered, keyset-paginated list cards"""
+
+    @pytest.fixture
+    def stored(self, db_session):
+        ingest_internships(db_session, [
+            listing(1, category="data", stipend="S$1,000/month", posted="01/05/2025", deadline="01/07/2025",
+                    skills=["Python", "SQL"]),
+            listing(2, category="data", stipend="S$1,500/month", posted="03/05/2025", deadline="15/06/2025",
+                    skills=["SQL"]),
+            listing(3, category="design", stipend="S$1,500/month", posted="03/05/2025", skills=["Figma"]),
+            listing(4, category="data", posted=None, deadline="01/06/2025", source="indeed", skills=["Python"]),
+            listing(5, category="data", stipend="S$800/month", posted="02/05/2025", location="Jurong"),
+        ], today=TODAY)
+        return {row.external_id: row.id for row in db_session.execute(select(Internship.external_id, Internship.id))}
+
+    def test_sorts_with_nulls_last(self, db_session, stored):
+        """Test each sort pages through every row once, rows without a sort value last"""
+        def order(**filters):
+            return [f"f{card['id']}" for card in walk(db_session, **filters)]
+
+        # Ties go by id in the sort's direction; ids follow the listing numbers
+        assert order() == ["f3", "f2", "f5", "f1", "f4"]
+        assert order(sort="deadline") == ["f4", "f2", "f1", "f3", "f5"]
+        assert order(sort="stipend") == ["f3", "f2", "f1", "f5", "f4"]
+
+    def test_filters(self, db_session, stored):
+        """Test category, location, skills, source and deadline range narrow the cards"""
+        assert {card["id"] for card in walk(db_session, category="data", skills=["Python"])} == {stored["f1"],
+                                                                                                 stored["f4"]}
+        assert [card["id"] for card in walk(db_session, location="Jurong")] == [stored["f5"]]
+        assert [card["id"] for card in walk(db_session, source="Indeed")] == [stored["f4"]]
+        cards = walk(db_session, sort="deadline", deadline_from=date(2025, 6, 10), deadline_to=date(2025, 7, 1))
+        assert [card["id"] for card in cards] == [stored["f2"], stored["f1"]]
+
+    def test_cards_and_detail(self, db_session, stored):
+        """Test cards carry only list fields and the detail carries the rest"""
+        card = list_internships(db_session, limit=1)[0][0]
+        assert "description" not in card and "canonical_key" not in card
+        assert card["posted_date"] == date(2025, 5, 3)
+        detail = get_internship(db_session, stored["f1"])
+        assert detail["skills"] == ["Python", "SQL"] and "record_hash" not in detail
+        assert get_internship(db_session, 999) is None
+
+    def test_invalid_cursor(self, db_session, stored):
+        """Test a garbled cursor, or one from another sort, is rejected"""
+        _, cursor = list_internships(db_session, limit=1)
+        with pytest.raises(InvalidCursor):
+            list_internships(db_session, sort="stipend", cursor=cursor)
+        with pytest.raises(InvalidCursor):
+            list_internships(db_session, cursor="not-a-cursor")
@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI, File, Form, Header, HTTPException, UploadFile
+
+from loadtest.harness import Recorder, percentile, run_scenario
+from loadtest.scenarios import LoginAndMe, SignupStorm, Uploads, sample_resume_pdf
+
+
+def fake_app():
+    """Tiny stand-in for the API endpoints the scenarios call"""
+    app = FastAPI()
+    app.state.users = set()
+    app.state.uploads = []
+
+    @app.post("/signup")
+    async def signup(payload: dict):
+        if payload["username"] in app.state.users:
+            raise HTTPException(status_code=400, detail="Username already exists")
+        app.state.users.add(payload["username"])
+        return {"message": "User created successfully"}
+
+    @app.post("/token")
+    async def token(username: str = Form(...), password: str = Form(...)):
+        if username not in app.state.users:
+            raise HTTPException(status_code=401)
+        return {"access_token": f"token-{username}", "token_type": "bearer"}
+
+    @app.get("/me")
+    async def me(authorization: str = Header(...)):
+        return {"username": authorization.removeprefix("Bearer token-")}
+
+    @app.post("/upload-resume")
+    async def upload(resume: UploadFile = File(...)):
+        app.state.uploads.append(await resume.read())
+        return {"status": "success"}
+
+    return app
+
+
+def run(scenario, app, **kwargs):
+    transport = httpx.ASGITransport(app=app)
+    return asyncio.run(run_scenario(scenario, "http://loadtest", transport=transport, **kwargs))
+
+
+class TestRecorder:
+    """Tests for latency summaries"""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile(values, 100) == 100
+        assert percentile([], 50) is None
+
+    def test_report(self):
+        """Test per-endpoint and total summaries with error counts"""
+        recorder = Recorder()
+        for ms in (10, 20, 30):
+            recorder.record("GET /me", 200, ms / 1000)
+        recorder.record("POST /token", 503, 0.5)
+        recorder.record("POST /token", "ConnectError", 1.0)
+        recorder.stop()
+
+        report = recorder.report()
+        me = report["endpoints"]["GET /me"]
+        assert me["requests"] == 3
+        assert me["errors"] == 0
+        assert me["latency_ms"]["p50"] == pytest.approx(20)
+        assert me["latency_ms"]["max"] == pytest.approx(30)
+        assert report["endpoints"]["POST /token"]["errors"] == 2
+        assert report["total"]["statuses"] == {"200": 3, "503": 1, "ConnectError": 1}
+        json.dumps(report)
+
+
+class TestScenarios:
+    """Tests for running scenarios against an app"""
+
+    def test_signup_storm(self):
+        """Test every iteration creates a distinct account"""
+        app = fake_app()
+        report = run(SignupStorm(), app, concurrency=4, requests=20)
+        assert report["endpoints"]["POST /signup"]["statuses"] == {"200": 20}
+        assert len(app.state.users) == 20
+        assert report["scenario"] == "signup-storm"
+
+    def test_login_me_excludes_setup(self):
+        """Test setup logins are not measured and /me dominates the mix"""
+        app = fake_app()
+        report = run(LoginAndMe(users=3, login_ratio=0.0, seed=1), app, concurrency=2, requests=12)
+        assert "setup" not in report["endpoints"]
+        assert "POST /token" not in report["endpoints"]
+        assert report["endpoints"]["GET /me"]["requests"] == 12
+
+    def test_duration_limit(self):
+        """Test a duration-only run stops on time"""
+        report = run(LoginAndMe(users=2), fake_app(), concurrency=2, duration=0.2)
+        assert report["total"]["requests"] > 0
+        assert report["duration_s"] < 5
+
+    def test_uploads_corpus(self, tmp_path):
+        """Test uploads cycle through the corpus directory"""
+        (tmp_path / "a.pdf").write_bytes(b"%PDF-a")
+        (tmp_path / "b.pdf").write_bytes(b"%PDF-b")
+        app = fake_app()
+        run(Uploads(corpus=str(tmp_path)), app, concurrency=1, requests=4)
+        assert app.state.uploads == [b"%PDF-a", b"%PDF-b", b"%PDF-a", b"%PDF-b"]
+
+    def test_requires_a_limit(self):
+        """Test a run needs a request count or a duration"""
+        with pytest.raises(ValueError):
+            run(SignupStorm(), fake_app())
+
+
+class TestSampleResume:
+    """Tests for the generated resume corpus"""
+
+    def test_pdf_text_extractable(self, tmp_path):
+        """Test generated PDFs are readable by the resume parser's PDF reader"""
+        from parser import extract_text_from_pdf
+
+        path = tmp_path / "resume.pdf"
+        path.write_bytes(sample_resume_pdf(7, "run"))
+        text = extract_text_from_pdf(str(path))
+        assert "candidate7.run@example.com" in text
+        assert "Python" in text
@@ -0,0 +1,121 @@
+import io
+import json
+import logging
+import sys
+
+import pytest
+
+from log_setup import (JSONFormatter, SamplingFilter, configure_logging, parse_sample_rates, stop_logging,
+                       LogQueueHandler)
+
+
+def make_record(name="parser", level=logging.INFO, msg="parsed %s", args=("resume",), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.fixture
+def queued_logging():
+    """Configure queue logging into a buffer, restoring the previous setup afterwards"""
+    stream = io.StringIO()
+    yield lambda **kwargs: (configure_logging(stream=stream, force=True, **kwargs), stream)[1]
+    stop_logging()
+    configure_logging()
+
+
+class TestJSONFormatter:
+    """Tests for structured log records"""
+
+    def test_fields_and_extras(self):
+        """Test the standard fields plus anything passed in extra"""
+        entry = json.loads(JSONFormatter().format(make_record(user_id=7)))
+        assert entry["level"] == "INFO"
+        assert entry["logger"] == "parser"
+        assert entry["message"] == "parsed resume"
+        assert entry["user_id"] == 7
+        assert entry["ts"].endswith("+00:00")
+
+    def test_exception(self):
+        """Test a traceback goes in its own field"""
+        try:
+            raise ValueError("bad pdf")
+        except ValueError:
+            record = make_record(level=logging.ERROR, msg="failed", args=None)
+            record.exc_info = sys.exc_info()
+        entry = json.loads(JSONFormatter().format(record))
+        assert entry["message"] == "failed"
+        assert "ValueError: bad pdf" in entry["exc"]
+
+
+class TestSampling:
+    """Tests for per-logger sampling"""
+
+    def test_parse_sample_rates(self):
+        """Test the LOG_SAMPLE_RATES format"""
+        assert parse_sample_rates("parser=0.1, uvicorn.access=0.5,") == {"parser": 0.1, "uvicorn.access": 0.5}
+        assert parse_sample_rates("") == {}
+        with pytest.raises(ValueError):
+            parse_sample_rates("parser=2")
+
+    def test_keeps_share_of_info(self):
+        """Test one in ten records is kept and marked with its rate"""
+        sampler = SamplingFilter({"parser": 0.1})
+        records = [make_record() for _ in range(100)]
+        kept = [record for record in records if sampler.filter(record)]
+        assert len(kept) == 10
+        assert all(record.sample_rate == 0.1 for record in kept)
+
+    def test_warnings_and_other_loggers_kept(self):
+        """Test warnings and unsampled loggers always pass"""
+        sampler = SamplingFilter({"parser": 0})
+        assert sampler.filter(make_record(level=logging.WARNING))
+        assert not sampler.filter(make_record())
+        assert sampler.filter(make_record(name="api"))
+
+    def test_child_loggers_inherit(self):
+        """Test the most specific configured ancestor decides the rate"""
+        sampler = SamplingFilter({"uvicorn": 0.5, "uvicorn.access": 0})
+        assert sampler.rate_for("uvicorn.access") == 0
+        assert sampler.rate_for("uvicorn.error") == 0.5
+        assert sampler.rate_for("uvicornish") == 1.0
+
+
+class TestQueueLogging:
+    """Tests for routing records through the queue listener"""
+
+    def test_records_written_by_listener(self, queued_logging, tmp_path):
+        """Test records reach the stream and file once the queue is flushed"""
+        log_file = tmp_path / "app.log"
+        stream = queued_logging(log_file=str(log_file), sample_rates="")
+        logging.getLogger("api").info("Created new candidate: %s", "a@example.com", extra={"candidate_id": 3})
+        stop_logging()
+
+        entry = json.loads(stream.getvalue().strip())
+        assert entry["message"] == "Created new candidate: a@example.com"
+        assert entry["candidate_id"] == 3
+        assert json.loads(log_file.read_text().strip()) == entry
+
+    def test_single_queue_handler(self, queued_logging):
+        """Test reconfiguring replaces the root queue handler instead of adding one"""
+        queued_logging()
+        queued_logging()
+        assert sum(isinstance(h, LogQueueHandler) for h in logging.getLogger().handlers) == 1
+
+    def test_uvicorn_loggers_rerouted(self, queued_logging):
+        """Test uvicorn's own stderr handlers are replaced by propagation to the queue"""
+        access = logging.getLogger("uvicorn.access")
+        access.addHandler(logging.StreamHandler())
+        access.propagate = False
+        stream = queued_logging(fmt="text")
+        assert access.handlers == [] and access.propagate
+        access.info('%s - "%s %s HTTP/%s" %d', "127.0.0.1", "GET", "/health", "1.1", 200)
+        stop_logging()
+        assert 'uvicorn.access - INFO - 127.0.0.1 - "GET /health HTTP/1.1" 200' in stream.getvalue()
+
+    def test_parser_leaves_root_alone(self):
+        """Test importing the parser no longer configures the root logger"""
+        import parser
+
+        assert parser.logger.name == "parser"
+        assert "basicConfig" not in open(parser.__file__).read()
@@ -13,10 +13,10 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
     import main
-    from main import app, get_db, UserCreate
+    from main import app, get_db, get_read_db, UserCreate
     from database import Base
-    from models import User, Candidate
-    from auth import create_access_token, get_password_hash
+    from models import User, Candidate, Internship
+    from auth import create_access_token, get_password_hash, verify_password
 except ImportError as e:
     print(f"Import error: {e}")
     raise
@@ -36,8 +36,23 @@ def override_get_db():
 
 # Override the dependency
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
 client = TestClient(app)
 
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    """Tables are recreated per test, so cached users must not carry over"""
+    from token_cache import token_cache
+    token_cache.clear()
+    yield
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Every test starts with full login and signup buckets"""
+    from rate_limit import rate_limiter
+    rate_limiter.reset()
+    yield
+
 @pytest.fixture(scope="function")
 def db_session():
     """Create a fresh database session for each test"""
@@ -97,6 +112,71 @@ class TestBasicEndpoints:
         response = client.get("/health")
         assert response.status_code == 200
         assert response.json() == {"status": "healthy"}
+    
+    def test_metrics_endpoint(self):
+        """Test /metrics reports per-route request counts in Prometheus format"""
+        client.get("/health")
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'http_requests_total{method="GET",route="/health",status="2xx"}' in response.text
+        assert 'http_request_duration_seconds_bucket{method="GET",route="/health",le="+Inf"}' in response.text
+        assert "password_hash_pending " in response.text
+
+class TestStartup:
+    """Test the lifespan startup phases"""
+
+    def run_lifespan(self, create_schema=False):
+        import threading
+        from startup import BackgroundLoad, StartupReport
+
+        report = StartupReport()
+        release = threading.Event()
+        warmup = BackgroundLoad("parser", release.wait, report)
+        with patch('main.startup_report', report), patch('main.parser_warmup', warmup), \
+             patch('main.CREATE_SCHEMA', create_schema), patch('main.check_schema'), \
+             patch('main.create_schema') as schema:
+            with TestClient(app) as lifespan_client:
+                warming = lifespan_client.get("/health").json()
+                release.set()
+                warmup.wait(5)
+                healthy = lifespan_client.get("/health").json()
+        return report, schema, warming, healthy
+
+    def test_health_warming_until_parser_loaded(self):
+        """Test /health reports warming while the parser loads in the background"""
+        report, schema, warming, healthy = self.run_lifespan()
+        assert warming == {"status": "warming"}
+        assert healthy == {"status": "healthy"}
+        assert set(report.phases) == {"schema_check", "password_backend", "parser"}
+        schema.assert_not_called()
+
+    def test_schema_created_only_when_asked(self):
+        """Test CREATE_SCHEMA adds a timed schema phase"""
+        report, schema, _, _ = self.run_lifespan(create_schema=True)
+        schema.assert_called_once()
+        assert "schema" in report.phases
+
+    def test_missing_schema_stops_startup(self, tmp_path):
+        """Test an old database without CREATE_SCHEMA fails at startup naming what is missing"""
+        from database import SchemaMismatch
+        old = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+        with old.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR)")
+
+        with patch('main.engine', old), patch('main.CREATE_SCHEMA', False):
+            with pytest.raises(SchemaMismatch) as error:
+                with TestClient(app):
+                    pass
+        assert "users.updated_at" in str(error.value)
+        assert "refresh_tokens" in str(error.value)
+        assert "candidates_fts" in str(error.value)
+        old.dispose()
+
+    def test_current_schema_passes_check(self, db_session):
+        """Test a database built from the models passes the startup check"""
+        with patch('main.engine', engine):
+            main.check_schema()
 
 class TestUserValidationEndpoints:
     """Test user validation endpoints"""
@@ -117,6 +197,12 @@ class TestUserValidationEndpoints:
         assert data["available"] is False
         assert data["message"] == "Username taken"
     
+    def test_check_username_reports_query_timing(self, db_session):
+        """Test the username check reports its DB time in Server-Timing"""
+        response = client.get("/check-username?username=newuser")
+        assert response.status_code == 200
+        assert 'desc="1 queries"' in response.headers["server-timing"]
+    
     def test_check_username_too_short(self, db_session):
         """Test username validation - too short"""
         response = client.get("/check-username?username=ab")
@@ -125,6 +211,16 @@ class TestUserValidationEndpoints:
         assert data["available"] is False
         assert data["message"] == "Username too short"
     
+    def test_check_username_registered_elsewhere(self, db_session):
+        """Test a name registered by another worker reports taken"""
+        # A Core insert skips this process's ORM events, like a signup handled by another worker
+        db_session.execute(User.__table__.insert().values(
+            full_name="Other Worker", username="elsewhere", email="elsewhere@example.com",
+            dob=date(2000, 1, 1), hashed_password="x"))
+        db_session.commit()
+        response = client.get("/check-username?username=elsewhere")
+        assert response.json()["available"] is False
+    
     def test_check_email_available(self, db_session):
         """Test email availability - available email"""
         response = client.get("/check-email?email=new@example.com")
@@ -203,6 +299,24 @@ class TestAuthentication:
         assert data["token_type"] == "bearer"
         assert "access_token" in data
     
+    def test_me_after_signup_reads_own_writes(self, db_session, sample_user_data, tmp_path, monkeypatch):
+        """Test signup, login and /me succeed while the read replica has not caught up"""
+        import database
+        lagging = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+        Base.metadata.create_all(bind=lagging)
+        monkeypatch.setattr(database, "read_router", database.ReplicaRouter(engine, [lagging]))
+        monkeypatch.setitem(database.SessionLocal.kw, "bind", engine)
+        monkeypatch.delitem(app.dependency_overrides, get_db)
+        monkeypatch.delitem(app.dependency_overrides, get_read_db)
+
+        assert client.post("/signup", json=sample_user_data).status_code == 200
+        login = client.post("/token", data={"username": sample_user_data["email"], "password": sample_user_data["password"]})
+        token = login.json()["access_token"]
+        response = client.get("/me", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        assert response.json()["email"] == sample_user_data["email"]
+        lagging.dispose()
+
     def test_login_wrong_password(self, existing_user):
         """Test login with incorrect password"""
         response = client.post(
@@ -221,6 +335,105 @@ class TestAuthentication:
         assert response.status_code == 401
         assert "Incorrect username/email or password" in response.json()["detail"]
     
+    def test_login_busy_returns_503(self, existing_user):
+        """Test login fails fast when the password hashing queue is full"""
+        from password_service import PasswordServiceBusy
+
+        with patch('main.password_hasher.verify', side_effect=PasswordServiceBusy()):
+            response = client.post(
+                "/token",
+                data={"username": existing_user.email, "password": "password123"}
+            )
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+    
+    def test_login_upgrades_weak_password_hash(self, existing_user, db_session):
+        """Test a successful login re-hashes a password stored below the current cost"""
+        old_hash = existing_user.hashed_password
+        with patch('main.password_needs_rehash', return_value=True), \
+             patch('main.SessionLocal', TestingSessionLocal):
+            response = client.post(
+                "/token",
+                data={"username": existing_user.email, "password": "password123"}
+            )
+        assert response.status_code == 200
+        
+        db_session.expire_all()
+        user = db_session.query(User).filter(User.id == existing_user.id).first()
+        assert user.hashed_password != old_hash
+        assert verify_password("password123", user.hashed_password)
+    
+    def test_login_rate_limited_per_account(self, existing_user):
+        """Test repeated logins for one account get 429 before any password check"""
+        from rate_limit import RATE_LIMITS
+
+        capacity = int(RATE_LIMITS[("POST", "/token")]["account"][0])
+        for _ in range(capacity):
+            client.post("/token", data={"username": existing_user.email, "password": "wrongpassword"})
+
+        with patch('main.password_hasher.verify') as verify:
+            response = client.post(
+                "/token",
+                data={"username": existing_user.email.upper(), "password": "password123"}
+            )
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+        verify.assert_not_called()
+    
+    def test_successful_logins_do_not_use_account_limit(self, existing_user):
+        """Test only failed logins count toward the per-account limit"""
+        from rate_limit import RATE_LIMITS
+
+        capacity = int(RATE_LIMITS[("POST", "/token")]["account"][0])
+        for _ in range(capacity + 1):
+            response = client.post("/token", data={"username": existing_user.email, "password": "password123"})
+            assert response.status_code == 200
+
+    def test_login_returns_refresh_token(self, existing_user):
+        """Test login issues a refresh token and uses the configured access token lifetime"""
+        from auth import ACCESS_TOKEN_EXPIRE_MINUTES
+
+        response = client.post(
+            "/token",
+            data={"username": existing_user.email, "password": "password123"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["refresh_token"]
+        assert data["expires_in"] == ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    
+    def test_refresh_token_flow(self, existing_user):
+        """Test refreshing skips the password check, rotates the token and supports revoke"""
+        login = client.post(
+            "/token",
+            data={"username": existing_user.email, "password": "password123"}
+        ).json()
+
+        with patch('main.password_hasher.verify') as verify:
+            response = client.post("/token/refresh", json={"refresh_token": login["refresh_token"]})
+        assert response.status_code == 200
+        verify.assert_not_called()
+        refreshed = response.json()
+        assert refreshed["refresh_token"] != login["refresh_token"]
+
+        me = client.get("/me", headers={"Authorization": f"Bearer {refreshed['access_token']}"})
+        assert me.status_code == 200
+        assert me.json()["email"] == existing_user.email
+
+        # The rotated-out token is dead, and replaying it revokes the new one too
+        assert client.post("/token/refresh", json={"refresh_token": login["refresh_token"]}).status_code == 401
+        assert client.post("/token/refresh", json={"refresh_token": refreshed["refresh_token"]}).status_code == 401
+    
+    def test_revoke_refresh_token(self, existing_user):
+        """Test a revoked refresh token cannot be exchanged"""
+        login = client.post(
+            "/token",
+            data={"username": existing_user.email, "password": "password123"}
+        ).json()
+        response = client.post("/token/revoke", json={"refresh_token": login["refresh_token"]})
+        assert response.status_code == 204
+        assert client.post("/token/refresh", json={"refresh_token": login["refresh_token"]}).status_code == 401
+    
     def test_get_current_user_info(self, existing_user, auth_headers):
         """Test getting current user information"""
         response = client.get("/me", headers=auth_headers)
@@ -236,6 +449,34 @@ class TestAuthentication:
         response = client.get("/me")
         assert response.status_code == 401
 
+    def test_get_current_user_info_not_modified(self, db_session, existing_user, auth_headers):
+        """Test /me answers 304 for a current ETag and a new ETag once the user changes"""
+        first = client.get("/me", headers=auth_headers)
+        etag = first.headers["etag"]
+        assert first.headers["cache-control"] == "private, no-cache"
+
+        cached = client.get("/me", headers={**auth_headers, "If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["etag"] == etag
+
+        user = db_session.query(User).filter(User.id == existing_user.id).first()
+        user.full_name = "Renamed User"
+        db_session.commit()
+        changed = client.get("/me", headers={**auth_headers, "If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.json()["full_name"] == "Renamed User"
+        assert changed.headers["etag"] != etag
+
+    def test_deactivated_user_locked_out(self, db_session, existing_user, auth_headers):
+        """Test deactivating a user rejects their still-valid token, cached or not"""
+        assert client.get("/me", headers=auth_headers).status_code == 200
+
+        user = db_session.query(User).filter(User.id == existing_user.id).first()
+        user.is_active = False
+        db_session.commit()
+        assert client.get("/me", headers=auth_headers).status_code == 401
+
 class TestResumeUploadBasic:
     """Test basic resume upload functionality"""
     
@@ -259,6 +500,19 @@ class TestResumeUploadBasic:
         
         assert response.status_code == 400
         assert "File too large" in response.json()["detail"]
+    
+    def test_resume_upload_rejected_when_saturated(self, db_session):
+        """Test uploads beyond the parse queue get 429 with Retry-After and skip parsing"""
+        from admission import AdmissionController
+
+        saturated = AdmissionController(max_in_flight=0, max_queue=0)
+        files = {"resume": ("resume.txt", io.BytesIO(b"Jane Doe jane@example.com"), "text/plain")}
+        with patch('main.resume_parse_admission', saturated), patch('main.parse_resume') as parse:
+            response = client.post("/upload-resume", files=files)
+        
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+        parse.assert_not_called()
 
 class TestPydanticModels:
     """Test Pydantic model validations"""
@@ -394,6 +648,104 @@ class TestAdvancedResumeUpload:
         assert response.status_code == 400
         assert "Failed to parse resume" in response.json()["detail"]
 
+class TestCandidateSearch:
+    """Test the resume full-text search endpoint"""
+
+    def test_search_returns_ranked_matches(self, db_session, auth_headers):
+        """Test search finds a candidate by resume text"""
+        from search import index_candidate
+
+        candidate = Candidate(
+            name="Jane Lee",
+            email="jane@example.com",
+            resume_text="React Native engineer at a fintech payments startup"
+        )
+        candidate.set_skills(["react"])
+        db_session.add(candidate)
+        db_session.flush()
+        index_candidate(db_session, candidate)
+        db_session.commit()
+
+        response = client.get("/candidates/search?q=react native fintech", headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 1
+        assert data["results"][0]["email"] == "jane@example.com"
+        assert "<mark>" in data["results"][0]["snippet"]
+
+    def test_search_not_modified_skips_query(self, db_session, auth_headers):
+        """Test a matching If-None-Match gets 304 from the version lookup without searching"""
+        db_session.add(Candidate(name="Jane Lee", email="jane@example.com", resume_text="python"))
+        db_session.commit()
+        etag = client.get("/candidates/search?q=python", headers=auth_headers).headers["etag"]
+
+        with patch('main.search_candidates') as search:
+            cached = client.get("/candidates/search?q=python", headers={**auth_headers, "If-None-Match": etag})
+        assert cached.status_code == 304
+        search.assert_not_called()
+
+        other_query = client.get("/candidates/search?q=java", headers={**auth_headers, "If-None-Match": etag})
+        assert other_query.status_code == 200
+
+        db_session.add(Candidate(name="Wei Lim", email="wei@example.com", resume_text="python"))
+        db_session.commit()
+        changed = client.get("/candidates/search?q=python", headers={**auth_headers, "If-None-Match": etag})
+        assert changed.status_code == 200
+
+    def test_search_requires_authentication(self, db_session):
+        """Test search is not available anonymously"""
+        response = client.get("/candidates/search?q=python")
+        assert response.status_code == 401
+
+class TestInternships:
+    """Test the internship list and detail endpoints"""
+
+    @pytest.fixture
+    def internships(self, db_session):
+        from internships import ingest_internships
+        db_session.query(Internship).delete()
+        ingest_internships(db_session, [
+            {"source": "fastjobs", "external_id": str(i), "title": f"Data Intern {i}", "company": "Grab",
+             "category": "data", "posted": f"0{i}/05/2025", "skills": ["Python"], "description": "Long text"}
+            for i in range(1, 4)
+        ])
+        return [row.id for row in db_session.query(Internship.id).order_by(Internship.id)]
+
+    def test_list_pages_with_cursor(self, internships):
+        """Test cards come newest first and next_cursor continues where the page ended"""
+        first = client.get("/internships?category=data&skills=Python&limit=2")
+        assert first.status_code == 200
+        data = first.json()
+        assert [card["id"] for card in data["items"]] == [internships[2], internships[1]]
+        assert "description" not in data["items"][0]
+        assert first.headers["cache-control"] == "public, max-age=60"
+
+        rest = client.get(f"/internships?category=data&limit=2&cursor={data['next_cursor']}").json()
+        assert [card["id"] for card in rest["items"]] == internships[:1]
+        assert rest["next_cursor"] is None
+
+    def test_list_rejects_bad_parameters(self, internships):
+        """Test an unknown sort or a garbled cursor is a client error"""
+        assert client.get("/internships?sort=match").status_code == 422
+        assert client.get("/internships?cursor=garbage").status_code == 400
+
+    def test_list_not_modified_skips_query(self, internships):
+        """Test a matching If-None-Match gets 304 without listing"""
+        etag = client.get("/internships").headers["etag"]
+        with patch('main.list_internships') as listing:
+            cached = client.get("/internships", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        listing.assert_not_called()
+
+    def test_detail(self, internships):
+        """Test the detail endpoint returns the full record, or 404"""
+        response = client.get(f"/internships/{internships[0]}")
+        assert response.status_code == 200
+        assert response.json()["description"] == "Long text"
+        assert client.get(f"/internships/{internships[0]}", headers={"If-None-Match": response.headers["etag"]}
+                          ).status_code == 304
+        assert client.get("/internships/999999").status_code == 404
+
 def teardown_module():
     """Clean up after all tests are done"""
     if os.path.exists("test_simple.db"):
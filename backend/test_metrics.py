@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from metrics import Histogram, MetricsMiddleware, MetricsRegistry, http_request_duration, http_requests
+
+
+def run_app(app, path="/things/1", method="GET"):
+    scope = {"type": "http", "method": method, "path": path}
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        pass
+
+    try:
+        asyncio.run(MetricsMiddleware(app)(scope, receive, send))
+    except RuntimeError:
+        pass
+
+
+def routed_app(template, status):
+    class Route:
+        path = template
+
+    async def app(scope, receive, send):
+        scope["route"] = Route()
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+    return app
+
+
+class TestHistogram:
+    """Tests for histogram buckets"""
+
+    def test_cumulative_buckets(self):
+        """Test bucket counts are cumulative with sum and count samples"""
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        samples = {(name, labels[-1][1] if labels else None): value
+                   for name, labels, value in histogram.samples("t", ())}
+        assert samples[("t_bucket", "0.1")] == 2
+        assert samples[("t_bucket", "1")] == 3
+        assert samples[("t_bucket", "+Inf")] == 4
+        assert samples[("t_count", None)] == 4
+        assert samples[("t_sum", None)] == pytest.approx(3.65)
+
+    def test_timer(self):
+        """Test time() observes the duration of the block"""
+        histogram = Histogram()
+        with histogram.time():
+            pass
+        assert histogram.count == 1
+
+
+class TestRegistry:
+    """Tests for the Prometheus text output"""
+
+    def test_render(self):
+        """Test families render HELP, TYPE and labelled samples"""
+        registry = MetricsRegistry()
+        registry.counter("jobs_total", "Jobs run", ("kind",)).labels("import").inc(3)
+        registry.gauge("queue_depth", "Jobs waiting").labels().set(2)
+        text = registry.render()
+        assert "# HELP jobs_total Jobs run\n# TYPE jobs_total counter\n" in text
+        assert 'jobs_total{kind="import"} 3\n' in text
+        assert "queue_depth 2\n" in text
+
+    def test_label_escaping(self):
+        """Test quotes, backslashes and newlines in label values are escaped"""
+        registry = MetricsRegistry()
+        registry.counter("c_total", "c", ("v",)).labels('a"b\\c\nd').inc()
+        assert 'c_total{v="a\\"b\\\\c\\nd"} 1' in registry.render()
+
+    def test_same_family_returned(self):
+        """Test registering a name twice returns the existing family"""
+        registry = MetricsRegistry()
+        assert registry.counter("x_total", "x") is registry.counter("x_total", "x")
+
+    def test_collectors(self):
+        """Test collector values are read at scrape time"""
+        registry = MetricsRegistry()
+        state = {"pending": 1}
+        registry.add_collector(lambda: [("pending", "gauge", "Pending work", state["pending"])])
+        state["pending"] = 7
+        assert "# TYPE pending gauge\npending 7\n" in registry.render()
+
+
+class TestMetricsMiddleware:
+    """Tests for request recording"""
+
+    def test_route_template_and_status_class(self):
+        """Test requests are labelled by route template and status class"""
+        before = http_requests.labels("GET", "/things/{thing_id}", "2xx").value
+        run_app(routed_app("/things/{thing_id}", 200))
+        assert http_requests.labels("GET", "/things/{thing_id}", "2xx").value == before + 1
+        assert http_request_duration.labels("GET", "/things/{thing_id}").count >= 1
+
+    def test_unmatched_route(self):
+        """Test requests without a route share the unmatched label"""
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 404, "headers": []})
+
+        before = http_requests.labels("GET", "unmatched", "4xx").value
+        run_app(app, path="/random/path")
+        assert http_requests.labels("GET", "unmatched", "4xx").value == before + 1
+
+    def test_exception_counted_as_5xx(self):
+        """Test a handler that raises is recorded as a server error"""
+        async def app(scope, receive, send):
+            raise RuntimeError("boom")
+
+        before = http_requests.labels("POST", "unmatched", "5xx").value
+        run_app(app, method="POST")
+        assert http_requests.labels("POST", "unmatched", "5xx").value == before + 1
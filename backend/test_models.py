@@ -1,5 +1,4 @@
 import pytest
-import json
 from datetime import date
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -173,4 +172,68 @@ class TestCandidate:
         
         db_session.add(candidate2)
         with pytest.raises(IntegrityError):
-            db_session.commit()
\ No newline at end of file
+            db_session.commit()
+
+class TestCandidateJSONQueries:
+    """Tests for native JSON columns and containment queries"""
+
+    def _add(self, db_session, email, skills, degree=None):
+        candidate = Candidate(name=email.split("@")[0], email=email)
+        candidate.set_skills(skills)
+        candidate.set_degree(degree or [])
+        db_session.add(candidate)
+        db_session.commit()
+        return candidate
+
+    def test_skills_round_trip_as_list(self, db_session):
+        """Test skills come back as a native list without decoding"""
+        self._add(db_session, "a@email.com", ["python", "sql"])
+        saved = db_session.query(Candidate).first()
+        assert isinstance(saved._skills, list)
+        assert saved.get_skills() == ["python", "sql"]
+
+    def test_has_skills_matches_all_values(self, db_session):
+        """Test skills containment requires every requested skill"""
+        self._add(db_session, "a@email.com", ["python", "sql", "react"])
+        self._add(db_session, "b@email.com", ["python", "java"])
+        self._add(db_session, "c@email.com", [])
+
+        emails = {c.email for c in db_session.query(Candidate).filter(
+            Candidate.has_skills(["python", "sql"])
+        )}
+        assert emails == {"a@email.com"}
+
+        emails = {c.email for c in db_session.query(Candidate).filter(
+            Candidate.has_skills(["python"])
+        )}
+        assert emails == {"a@email.com", "b@email.com"}
+
+    def test_has_skills_empty_matches_everything(self, db_session):
+        """Test an empty containment list matches every candidate"""
+        self._add(db_session, "a@email.com", ["python"])
+        self._add(db_session, "b@email.com", [])
+        assert db_session.query(Candidate).filter(Candidate.has_skills([])).count() == 2
+
+    def test_has_degree(self, db_session):
+        """Test degree containment"""
+        self._add(db_session, "a@email.com", [], ["bachelor"])
+        self._add(db_session, "b@email.com", [], ["master", "bachelor"])
+        emails = {c.email for c in db_session.query(Candidate).filter(
+            Candidate.has_degree(["master"])
+        )}
+        assert emails == {"b@email.com"}
+
+    def test_postgres_uses_jsonb_containment(self):
+        """Test the Postgres dialect compiles to JSONB @> and GIN indexes"""
+        from sqlalchemy.dialects import postgresql
+        from sqlalchemy.schema import CreateIndex, CreateTable
+
+        dialect = postgresql.dialect()
+        sql = str(Candidate.has_skills(["python", "sql"]).compile(dialect=dialect))
+        assert "@>" in sql
+
+        ddl = str(CreateTable(Candidate.__table__).compile(dialect=dialect))
+        assert "skills JSONB" in ddl
+
+        gin = next(i for i in Candidate.__table__.indexes if i.name == "ix_candidates_skills_gin")
+        assert "USING gin" in str(CreateIndex(gin).compile(dialect=dialect))
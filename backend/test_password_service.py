@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from password_service import PasswordHasher, PasswordServiceBusy, calibrate_rounds
+
+
+class TestPasswordHasher:
+    """Tests for the bounded password hashing pool"""
+
+    def test_hash_and_verify_round_trip(self):
+        """Test hashing and verification go through the pool"""
+        hasher = PasswordHasher(workers=2, max_pending=4)
+
+        async def run():
+            hashed = await hasher.hash("Password123")
+            return hashed, await hasher.verify("Password123", hashed), await hasher.verify("wrong", hashed)
+
+        hashed, ok, bad = asyncio.run(run())
+        hasher.shutdown()
+        assert hashed != "Password123"
+        assert ok is True
+        assert bad is False
+        assert hasher.stats()["completed"] == 3
+
+    def test_runs_off_the_event_loop(self):
+        """Test the hash function runs on a pool thread, not the loop thread"""
+        threads = []
+        hasher = PasswordHasher(workers=1, max_pending=1, hash_func=lambda p: threads.append(threading.current_thread().name))
+
+        asyncio.run(hasher.hash("x"))
+        hasher.shutdown()
+        assert threads[0].startswith("password-hash")
+
+    def test_rejects_when_queue_full(self):
+        """Test admission fails fast once max_pending operations are in flight"""
+        release = threading.Event()
+        hasher = PasswordHasher(workers=1, max_pending=2, hash_func=lambda p: release.wait(5))
+
+        async def run():
+            first = asyncio.ensure_future(hasher.hash("a"))
+            second = asyncio.ensure_future(hasher.hash("b"))
+            await asyncio.sleep(0)
+            assert hasher.pending == 2
+            with pytest.raises(PasswordServiceBusy):
+                await hasher.hash("c")
+            release.set()
+            await asyncio.gather(first, second)
+
+        asyncio.run(run())
+        hasher.shutdown()
+        stats = hasher.stats()
+        assert stats["rejected"] == 1
+        assert stats["completed"] == 2
+        assert stats["pending"] == 0
+
+    def test_queue_wait_and_hash_time_recorded(self):
+        """Test queue wait and hash time are measured separately"""
+        hasher = PasswordHasher(workers=1, max_pending=4, hash_func=lambda p: time.sleep(0.05))
+
+        async def run():
+            await asyncio.gather(hasher.hash("a"), hasher.hash("b"))
+
+        asyncio.run(run())
+        hasher.shutdown()
+        stats = hasher.stats()
+        assert stats["hash_time_max_ms"] >= 45
+        # The second call waited for the first one to finish
+        assert stats["queue_wait_max_ms"] >= 40
+
+
+class TestCalibrateRounds:
+    """Tests for picking a bcrypt cost from a target hash time"""
+
+    def test_generous_target_reaches_max(self):
+        """Test the highest allowed cost is chosen when every cost is fast enough"""
+        rounds, timings = calibrate_rounds(target_ms=10_000, max_rounds=5, samples=1)
+        assert rounds == 5
+        assert set(timings) == {4, 5}
+
+    def test_tiny_target_falls_back_to_minimum(self):
+        """Test the minimum cost is returned when nothing meets the target"""
+        rounds, timings = calibrate_rounds(target_ms=0, max_rounds=8, samples=1)
+        assert rounds == 4
+        assert list(timings) == [4]
@@ -0,0 +1,119 @@
+import os
+import time
+import urllib.request
+from unittest.mock import patch
+
+import pytest
+
+from prefork import Arbiter, bind_socket
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork needs os.fork")
+
+
+async def hello_app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            await send({"type": message["type"] + ".complete"})
+            if message["type"] == "lifespan.shutdown":
+                return
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": str(os.getpid()).encode()})
+
+
+def get(port):
+    for _ in range(100):
+        try:
+            return urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read().decode()
+        except OSError:
+            time.sleep(0.1)
+    raise AssertionError("worker never answered")
+
+
+@pytest.fixture
+def arbiter():
+    sock = bind_socket("127.0.0.1", 0)
+    arbiter = Arbiter(sock, hello_app, workers=2, graceful_timeout=5, log_level="warning")
+    yield arbiter
+    arbiter.stop()
+    sock.close()
+
+
+class TestArbiter:
+    """Tests for forking and supervising workers"""
+
+    def test_workers_share_socket(self, arbiter):
+        """Test forked workers answer on the master's socket"""
+        arbiter.manage_workers()
+        assert len(arbiter.workers) == 2
+        assert int(get(arbiter.sock.getsockname()[1])) in arbiter.workers
+
+    def test_dead_worker_replaced(self, arbiter):
+        """Test a worker that exits is reaped and replaced"""
+        arbiter.manage_workers()
+        victim = next(iter(arbiter.workers))
+        arbiter.stop_worker(victim)
+        arbiter.reap()
+        arbiter.manage_workers()
+        assert victim not in arbiter.workers
+        assert len(arbiter.workers) == 2
+
+    def test_reload_replaces_every_worker(self, arbiter):
+        """Test a rolling restart leaves the same number of new workers"""
+        arbiter.manage_workers()
+        old = set(arbiter.workers)
+        arbiter.reload()
+        assert len(arbiter.workers) == 2
+        assert not old & set(arbiter.workers)
+        assert int(get(arbiter.sock.getsockname()[1])) in arbiter.workers
+
+    def test_stop(self, arbiter):
+        """Test stop() shuts every worker down"""
+        arbiter.manage_workers()
+        pids = list(arbiter.workers)
+        arbiter.stop()
+        assert arbiter.workers == {}
+        for pid in pids:
+            with pytest.raises(ProcessLookupError):
+                os.kill(pid, 0)
+
+
+class TestSchemaCreation:
+    """Tests for building the schema once in the master"""
+
+    def test_preload_builds_schema_once(self):
+        """Test preloading creates the schema and turns the workers' schema phase off"""
+        import main
+        from prefork import preload_app
+
+        with patch.object(main, "create_schema") as create_schema, patch.object(main, "CREATE_SCHEMA", True), \
+                patch("parser.load_model"), patch("prefork.gc"):
+            preload_app(create_schema=True)
+            assert main.CREATE_SCHEMA is False
+        create_schema.assert_called_once()
+
+    def test_preload_checks_schema_when_not_creating(self):
+        """Test preloading without CREATE_SCHEMA refuses an out-of-date database before forking"""
+        import main
+        from database import SchemaMismatch
+        from prefork import preload_app
+
+        with patch.object(main, "check_schema", side_effect=SchemaMismatch("missing: users.updated_at")), \
+                patch.object(main, "create_schema") as create_schema, patch("parser.load_model"), patch("prefork.gc"):
+            with pytest.raises(SchemaMismatch):
+                preload_app(create_schema=False)
+        create_schema.assert_not_called()
+
+    def test_child_failure_stops_startup(self):
+        """Test a schema build or check that fails in the child keeps the master from forking workers"""
+        import main
+        from prefork import prepare_schema_in_child
+
+        with patch.object(main, "create_schema", side_effect=RuntimeError("boom")):
+            with pytest.raises(SystemExit):
+                prepare_schema_in_child(create_schema=True)
+        with patch.object(main, "check_schema", side_effect=RuntimeError("boom")):
+            with pytest.raises(SystemExit):
+                prepare_schema_in_child(create_schema=False)
+        with patch.object(main, "create_schema"):
+            prepare_schema_in_child(create_schema=True)
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+
+from profiling import ProfilingMiddleware, RequestProfile, SamplingProfiler
+
+
+def busy_work(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(i * i for i in range(100))
+
+
+def make_app(work_seconds=0.05):
+    class Route:
+        path = "/upload-resume"
+
+    async def app(scope, receive, send):
+        scope["route"] = Route()
+        await asyncio.to_thread(busy_work, work_seconds)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+    return app
+
+
+def call(middleware, headers=()):
+    scope = {"type": "http", "method": "POST", "path": "/upload-resume", "headers": list(headers)}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return dict(sent[0]["headers"])
+
+
+class TestSamplingProfiler:
+    """Tests for the stack sampler"""
+
+    def test_busy_thread_sampled(self):
+        """Test a busy thread's stack is captured under its thread name"""
+        worker = threading.Thread(target=busy_work, args=(0.2,), name="busy-worker")
+        profiler = SamplingProfiler(interval=0.002)
+        profiler.start()
+        worker.start()
+        worker.join()
+        profiler.stop()
+
+        collapsed = profiler.collapsed()
+        assert profiler.samples > 0
+        assert any(line.startswith("busy-worker;") and "busy_work (test_profiling.py" in line
+                   for line in collapsed.splitlines())
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.splitlines())
+
+    def test_idle_threads_skipped(self):
+        """Test threads blocked waiting are left out"""
+        event = threading.Event()
+        waiter = threading.Thread(target=event.wait, name="idle-waiter")
+        waiter.start()
+        profiler = SamplingProfiler()
+        profiler.sample()
+        event.set()
+        waiter.join()
+        assert "idle-waiter" not in profiler.collapsed()
+
+
+class TestRequestProfile:
+    """Tests for allocation tracking"""
+
+    def test_tracemalloc_restored(self, tmp_path):
+        """Test tracing is stopped again when the profile started it"""
+        assert not tracemalloc.is_tracing()
+        profile = RequestProfile(interval=0.002)
+        profile.start()
+        held = [bytearray(1024) for _ in range(100)]
+        profile.stop()
+        assert not tracemalloc.is_tracing()
+        assert profile.peak >= 100 * 1024
+
+        collapsed, alloc = profile.write(str(tmp_path), "POST /upload-resume")
+        report = open(alloc).read()
+        assert "peak traced memory" in report
+        assert "test_profiling.py" in report
+        assert held
+
+
+class TestProfilingMiddleware:
+    """Tests for selecting and profiling requests"""
+
+    def test_disabled_passes_through(self, tmp_path):
+        """Test nothing is profiled without a token or sample rate"""
+        middleware = ProfilingMiddleware(make_app(0), token=None, sample_rate=0, directory=str(tmp_path))
+        assert not middleware.enabled
+        headers = call(middleware, [(b"x-profile-token", b"anything")])
+        assert b"x-profile-id" not in headers
+        assert list(tmp_path.iterdir()) == []
+
+    def test_token_triggers_profile(self, tmp_path):
+        """Test the admin token header profiles the request and writes both files"""
+        middleware = ProfilingMiddleware(make_app(), token="secret", directory=str(tmp_path), interval_ms=2)
+        headers = call(middleware, [(b"x-profile-token", b"secret")])
+        profile_id = headers[b"x-profile-id"].decode()
+
+        files = sorted(path.name for path in tmp_path.iterdir())
+        assert len(files) == 2
+        assert all(profile_id in name and "POST-upload-resume" in name for name in files)
+        collapsed = next(tmp_path.glob("*.collapsed")).read_text()
+        assert "busy_work" in collapsed
+
+    def test_wrong_token_not_profiled(self, tmp_path):
+        """Test a wrong token is ignored"""
+        middleware = ProfilingMiddleware(make_app(0), token="secret", directory=str(tmp_path))
+        headers = call(middleware, [(b"x-profile-token", b"guess")])
+        assert b"x-profile-id" not in headers
+
+    def test_sample_rate(self, tmp_path):
+        """Test a sample rate of 1 profiles every request"""
+        middleware = ProfilingMiddleware(make_app(0.01), sample_rate=1.0, directory=str(tmp_path), interval_ms=2)
+        assert b"x-profile-id" in call(middleware)
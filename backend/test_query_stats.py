@@ -0,0 +1,106 @@
+import asyncio
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import query_stats
+from query_stats import QueryStats, QueryStatsMiddleware, current_stats, _current_stats
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite:///:memory:")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def stats():
+    """Make a QueryStats current as if inside a request"""
+    stats = QueryStats({"path": "/things/1"})
+    token = _current_stats.set(stats)
+    yield stats
+    _current_stats.reset(token)
+
+
+class TestQueryStats:
+    """Tests for attributing statements to the current request"""
+
+    def test_statements_are_counted(self, engine, stats):
+        """Test each statement is counted and timed"""
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        assert stats.count == 2
+        assert stats.total_ms >= stats.slowest_ms > 0
+        assert stats.slowest_statement in ("SELECT 1", "SELECT 2")
+
+    def test_no_request_no_stats(self, engine):
+        """Test statements outside a request are not attributed anywhere"""
+        assert current_stats() is None
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        assert current_stats() is None
+
+    def test_failed_statement_does_not_leak_timer(self, engine, stats):
+        """Test a failing statement leaves the timer stack balanced"""
+        with engine.connect() as conn:
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM missing_table"))
+            conn.execute(text("SELECT 1"))
+            assert conn.info["query_started"] == []
+        assert stats.count == 1
+
+    def test_route_template_preferred(self):
+        """Test the route template is reported once routing has set it"""
+        class Route:
+            path = "/things/{thing_id}"
+
+        stats = QueryStats({"path": "/things/1"})
+        assert stats.route == "/things/1"
+        stats.scope["route"] = Route()
+        assert stats.route == "/things/{thing_id}"
+
+    def test_slow_query_logged(self, engine, stats, monkeypatch, caplog):
+        """Test statements over the threshold are logged with parameters and route"""
+        monkeypatch.setattr(query_stats, "SLOW_QUERY_MS", 0)
+        with caplog.at_level(logging.WARNING, logger="sql.slow"):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT :value"), {"value": 42})
+        assert "Slow query" in caplog.text
+        assert "/things/1" in caplog.text
+        assert "42" in caplog.text
+
+    def test_server_timing_format(self):
+        """Test the Server-Timing header value"""
+        stats = QueryStats()
+        stats.record("SELECT 1", 1.5)
+        stats.record("SELECT 2", 2.25)
+        assert stats.server_timing() == 'db;dur=3.75;desc="2 queries", db-slowest;dur=2.25'
+
+
+class TestQueryStatsMiddleware:
+    """Tests for the Server-Timing middleware"""
+
+    def test_header_added(self, engine):
+        """Test statements run by the app are reported in Server-Timing"""
+        async def app(scope, receive, send):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def receive():
+            return {"type": "http.request"}
+
+        asyncio.run(QueryStatsMiddleware(app)({"type": "http", "path": "/"}, receive, send))
+        headers = dict(sent[0]["headers"])
+        assert headers[b"server-timing"].startswith(b'db;dur=')
+        assert b'desc="1 queries"' in headers[b"server-timing"]
+        assert current_stats() is None
@@ -0,0 +1,218 @@
+import asyncio
+import json
+
+import pytest
+
+from rate_limit import BucketStore, RateLimitMiddleware, parse_limit, _account_from_body
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def run_request(middleware, path="/token", body=b"", content_type=b"application/x-www-form-urlencoded",
+                client=("1.2.3.4", 5000), chunks=None, status=200):
+    """Send one POST through the middleware; returns (sent messages, body the app saw)"""
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "client": client,
+        "headers": [(b"content-type", content_type)],
+    }
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)] if chunks else [{"type": "http.request", "body": body}]
+    sent = []
+    seen = {}
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    async def app(scope, receive, send):
+        received = b""
+        while True:
+            message = await receive()
+            received += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        seen["body"] = received
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    asyncio.run(middleware.__class__(app, middleware.limits, middleware.store)(scope, receive, send))
+    return sent, seen.get("body")
+
+
+class TestParseLimit:
+    """Tests for "capacity/seconds" limit strings"""
+
+    def test_parse(self):
+        """Test capacity and refill rate are derived from the string"""
+        assert parse_limit("5/300") == (5.0, 5.0 / 300)
+
+    @pytest.mark.parametrize("value", ["5", "a/60", "0/60", "5/0"])
+    def test_invalid(self, value):
+        """Test malformed or non-positive limits are rejected"""
+        with pytest.raises(ValueError):
+            parse_limit(value)
+
+
+class TestBucketStore:
+    """Tests for the LRU token-bucket store"""
+
+    def test_burst_then_reject(self, clock):
+        """Test a full bucket allows its capacity and then reports a retry delay"""
+        store = BucketStore(clock=clock)
+        assert [store.take("k", 3, 1 / 60) for _ in range(3)] == [0, 0, 0]
+        assert store.take("k", 3, 1 / 60) == pytest.approx(60)
+        assert store.rejected == 1
+
+    def test_refill(self, clock):
+        """Test tokens come back at the refill rate"""
+        store = BucketStore(clock=clock)
+        store.take("k", 1, 0.5)
+        assert store.take("k", 1, 0.5) == pytest.approx(2)
+        clock.now += 2
+        assert store.take("k", 1, 0.5) == 0
+
+    def test_refill_capped_at_capacity(self, clock):
+        """Test an idle bucket never holds more than its capacity"""
+        store = BucketStore(clock=clock)
+        store.take("k", 2, 1)
+        clock.now += 3600
+        assert [store.take("k", 2, 1) for _ in range(3)][-1] > 0
+
+    def test_refund(self, clock):
+        """Test a refunded token can be spent again, up to the capacity"""
+        store = BucketStore(clock=clock)
+        store.take("k", 1, 1 / 60)
+        store.refund("k", 1)
+        store.refund("k", 1)
+        assert store.take("k", 1, 1 / 60) == 0
+        assert store.take("k", 1, 1 / 60) > 0
+
+    def test_lru_bound(self, clock):
+        """Test the least recently used bucket is dropped past max_buckets"""
+        store = BucketStore(max_buckets=2, clock=clock)
+        store.take("a", 1, 1)
+        store.take("b", 1, 1)
+        store.take("a", 1, 1)
+        store.take("c", 1, 1)
+        assert len(store) == 2
+        # "b" was evicted, so it starts again with a full bucket
+        assert store.take("b", 1, 1) == 0
+
+
+class TestAccountFromBody:
+    """Tests for extracting the account a request names"""
+
+    def test_form(self):
+        """Test the OAuth2 form username is used and normalised"""
+        assert _account_from_body(b"username=Alice%40Example.com&password=x",
+                                  "application/x-www-form-urlencoded") == "alice@example.com"
+
+    def test_json(self):
+        """Test signup JSON uses the username, falling back to the email"""
+        assert _account_from_body(b'{"username": "Bob"}', "application/json") == "bob"
+        assert _account_from_body(b'{"email": "bob@example.com"}', "application/json") == "bob@example.com"
+
+    @pytest.mark.parametrize("body,content_type", [
+        (b"not json", "application/json"),
+        (b"[1, 2]", "application/json"),
+        (b'{"username": 5}', "application/json"),
+        (b"username=a", "text/plain"),
+    ])
+    def test_unusable(self, body, content_type):
+        """Test bodies without a usable account name yield None"""
+        assert _account_from_body(body, content_type) is None
+
+
+class TestRateLimitMiddleware:
+    """Tests for the ASGI middleware"""
+
+    limits = {("POST", "/token"): {"ip": (3.0, 3 / 60), "account": (2.0, 2 / 60)}}
+
+    def test_unlimited_route_passes_through(self, clock):
+        """Test routes without limits are untouched"""
+        middleware = RateLimitMiddleware(None, self.limits, BucketStore(clock=clock))
+        sent, body = run_request(middleware, path="/health", body=b"x")
+        assert sent[0]["status"] == 200
+        assert body == b"x"
+
+    def test_account_limit(self, clock):
+        """Test the per-account bucket rejects with 429 and Retry-After"""
+        middleware = RateLimitMiddleware(None, self.limits, BucketStore(clock=clock))
+        for _ in range(2):
+            sent, _ = run_request(middleware, body=b"username=alice&password=x")
+            assert sent[0]["status"] == 200
+        sent, _ = run_request(middleware, body=b"username=ALICE&password=x", client=("5.6.7.8", 1))
+        assert sent[0]["status"] == 429
+        headers = dict(sent[0]["headers"])
+        assert headers[b"retry-after"] == b"30"
+        assert json.loads(sent[1]["body"])["detail"]
+
+    def test_ip_limit(self, clock):
+        """Test the per-IP bucket applies across different accounts"""
+        middleware = RateLimitMiddleware(None, self.limits, BucketStore(clock=clock))
+        statuses = [run_request(middleware, body=f"username=user{i}".encode())[0][0]["status"]
+                    for i in range(4)]
+        assert statuses == [200, 200, 200, 429]
+
+    def test_account_charged_only_on_listed_statuses(self, clock):
+        """Test a charge_account_on route spends account tokens only on matching responses"""
+        limits = {("POST", "/token"): {"account": (2.0, 2 / 60), "charge_account_on": {401}}}
+        middleware = RateLimitMiddleware(None, limits, BucketStore(clock=clock))
+        for _ in range(5):
+            assert run_request(middleware, body=b"username=alice")[0][0]["status"] == 200
+        statuses = [run_request(middleware, body=b"username=alice", status=401)[0][0]["status"] for _ in range(3)]
+        assert statuses == [401, 401, 429]
+        assert middleware.store.rejected == 1
+
+    def test_concurrent_failures_charged_up_front(self, clock):
+        """Test concurrent requests for one account cannot all pass before the first is charged"""
+        limits = {("POST", "/token"): {"account": (5.0, 5 / 300), "charge_account_on": {401}}}
+        store = BucketStore(clock=clock)
+
+        async def slow_failure(scope, receive, send):
+            await asyncio.sleep(0.05)
+            await send({"type": "http.response.start", "status": 401, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def attempt():
+            scope = {"type": "http", "method": "POST", "path": "/token", "client": ("1.2.3.4", 1),
+                     "headers": [(b"content-type", b"application/x-www-form-urlencoded")]}
+            sent = []
+
+            async def receive():
+                return {"type": "http.request", "body": b"username=alice&password=x"}
+
+            async def send(message):
+                sent.append(message)
+
+            await RateLimitMiddleware(slow_failure, limits, store)(scope, receive, send)
+            return sent[0]["status"]
+
+        async def storm():
+            return await asyncio.gather(*(attempt() for _ in range(20)))
+
+        statuses = asyncio.run(storm())
+        assert statuses.count(401) == 5 and statuses.count(429) == 15
+
+    def test_body_replayed_to_app(self, clock):
+        """Test a body read in chunks reaches the app unchanged"""
+        middleware = RateLimitMiddleware(None, self.limits, BucketStore(clock=clock))
+        sent, body = run_request(middleware, chunks=[b"username=al", b"ice&password=x"])
+        assert sent[0]["status"] == 200
+        assert body == b"username=alice&password=x"
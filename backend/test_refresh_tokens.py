@@ -0,0 +1,139 @@
+import pytest
+from datetime import date, datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import RefreshToken, User
+from refresh_tokens import (
+    InvalidRefreshToken, hash_refresh_token, issue_refresh_token, refresh_stats,
+    prune_refresh_tokens, revoke_refresh_token, rotate_refresh_token,
+)
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    refresh_stats.reset()
+    yield
+
+
+@pytest.fixture
+def user(db_session):
+    user = User(full_name="Test User", username="tester", email="tester@example.com",
+                dob=date(2000, 1, 1), hashed_password="x")
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+def live_tokens(db, user_id):
+    return db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None)
+    ).count()
+
+
+class TestRefreshTokens:
+    """Tests for issuing, rotating and revoking refresh tokens"""
+
+    def test_only_hash_is_stored(self, db_session, user):
+        """Test the raw token never reaches the database"""
+        token = issue_refresh_token(db_session, user.id)
+        db_session.commit()
+        record = db_session.query(RefreshToken).one()
+        assert record.token_hash == hash_refresh_token(token)
+        assert token not in record.token_hash
+
+    def test_rotate(self, db_session, user):
+        """Test a refresh revokes the old token and issues a working new one"""
+        token = issue_refresh_token(db_session, user.id)
+        db_session.commit()
+
+        refreshed_user, new_token = rotate_refresh_token(db_session, token)
+        assert refreshed_user.id == user.id
+        assert new_token != token
+        assert live_tokens(db_session, user.id) == 1
+        assert rotate_refresh_token(db_session, new_token)[0].id == user.id
+        assert refresh_stats.stats()["bcrypt_verifies_saved"] == 2
+
+    def test_reuse_revokes_all_tokens(self, db_session, user):
+        """Test replaying a rotated token revokes the user's whole token family"""
+        token = issue_refresh_token(db_session, user.id)
+        db_session.commit()
+        _, new_token = rotate_refresh_token(db_session, token)
+
+        with pytest.raises(InvalidRefreshToken):
+            rotate_refresh_token(db_session, token)
+        assert refresh_stats.reuse_detected == 1
+        assert live_tokens(db_session, user.id) == 0
+        with pytest.raises(InvalidRefreshToken):
+            rotate_refresh_token(db_session, new_token)
+
+    def test_expired(self, db_session, user):
+        """Test expired tokens are rejected"""
+        token = issue_refresh_token(db_session, user.id, now=datetime.utcnow() - timedelta(days=365))
+        db_session.commit()
+        with pytest.raises(InvalidRefreshToken):
+            rotate_refresh_token(db_session, token)
+
+    def test_unknown(self, db_session, user):
+        """Test unknown tokens are rejected"""
+        with pytest.raises(InvalidRefreshToken):
+            rotate_refresh_token(db_session, "not-a-token")
+        assert refresh_stats.rejected == 1
+
+    def test_revoke(self, db_session, user):
+        """Test a revoked token can no longer be used"""
+        token = issue_refresh_token(db_session, user.id)
+        db_session.commit()
+        assert revoke_refresh_token(db_session, token) is True
+        assert revoke_refresh_token(db_session, token) is False
+        with pytest.raises(InvalidRefreshToken):
+            rotate_refresh_token(db_session, token)
+
+
+class TestPruning:
+    """Tests for keeping the refresh_tokens table bounded"""
+
+    def test_rotations_stay_bounded(self, db_session, user):
+        """Test repeated refreshes keep only the newest revoked rows and the live one"""
+        token = issue_refresh_token(db_session, user.id)
+        db_session.commit()
+        for _ in range(30):
+            _, token = rotate_refresh_token(db_session, token)
+        assert db_session.query(RefreshToken).count() == 21
+        assert live_tokens(db_session, user.id) == 1
+
+    def test_expired_rows_deleted(self, db_session, user):
+        """Test a login deletes the user's expired rows and keeps recent revoked ones"""
+        issue_refresh_token(db_session, user.id, now=datetime.utcnow() - timedelta(days=365))
+        old = issue_refresh_token(db_session, user.id, now=datetime.utcnow() - timedelta(days=365))
+        db_session.commit()
+        recent = issue_refresh_token(db_session, user.id)
+        db_session.commit()
+        revoke_refresh_token(db_session, recent)
+
+        issue_refresh_token(db_session, user.id)
+        db_session.commit()
+        hashes = {row.token_hash for row in db_session.query(RefreshToken)}
+        assert hash_refresh_token(old) not in hashes
+        assert hash_refresh_token(recent) in hashes
+        assert len(hashes) == 2
+
+    def test_recent_replay_still_detected(self, db_session, user):
+        """Test a kept revoked token still triggers reuse detection"""
+        token = issue_refresh_token(db_session, user.id)
+        db_session.commit()
+        _, current = rotate_refresh_token(db_session, token)
+        assert prune_refresh_tokens(db_session, user.id) == 0
+        with pytest.raises(InvalidRefreshToken):
+            rotate_refresh_token(db_session, token)
+        assert refresh_stats.reuse_detected == 1
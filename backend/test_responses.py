@@ -0,0 +1,64 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from pydantic import BaseModel
+
+import responses
+from responses import FastJSONResponse, model_response
+
+
+class Profile(BaseModel):
+    id: int
+    name: str
+    dob: date
+    skills: list
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request, monkeypatch):
+    """Run each test with orjson and with the stdlib fallback"""
+    if request.param == "orjson":
+        if responses.orjson is None:
+            pytest.skip("orjson is not installed")
+    else:
+        monkeypatch.setattr(responses, "orjson", None)
+    return request.param
+
+
+class TestFastJSONResponse:
+    """Tests for the default response class"""
+
+    def test_plain_content(self, encoder):
+        """Test ordinary JSON content round-trips"""
+        content = {"name": "Ada", "skills": ["python", "sql"], "score": 1.5, "active": True, "note": None}
+        assert json.loads(FastJSONResponse(content).body) == content
+
+    def test_non_json_types(self, encoder):
+        """Test dates, datetimes and decimals are encoded like jsonable_encoder would"""
+        body = FastJSONResponse({
+            "dob": date(2000, 1, 2),
+            "at": datetime(2024, 5, 6, 7, 8, 9),
+            "amount": Decimal("1.5"),
+        }).body
+        data = json.loads(body)
+        assert data["dob"] == "2000-01-02"
+        assert data["at"].startswith("2024-05-06T07:08:09")
+        assert float(data["amount"]) == 1.5
+
+    def test_unicode(self, encoder):
+        """Test non-ASCII text is emitted as UTF-8"""
+        body = FastJSONResponse({"name": "Zoë"}).body
+        assert "Zoë".encode() in body
+
+    def test_model_response(self, encoder):
+        """Test a Pydantic model is serialized from model_dump with status and headers"""
+        response = model_response(
+            Profile(id=1, name="Ada", dob=date(2000, 1, 2), skills=["python"]),
+            status_code=201, headers={"X-Test": "1"},
+        )
+        assert response.status_code == 201
+        assert response.headers["x-test"] == "1"
+        assert response.headers["content-type"] == "application/json"
+        assert json.loads(response.body) == {"id": 1, "name": "Ada", "dob": "2000-01-02", "skills": ["python"]}
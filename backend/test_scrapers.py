@@ -0,0 +1,345 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from scrapers.fetcher import FetchError, Fetcher, backoff_delay, parse_host_limits, parse_retry_after
+from scrapers.incremental import CrawlState
+from scrapers.jobs_scrapers import FastJobsSource, IndeedSource, NUSSource, Source, crawl, run_sources
+
+NUS_PAGE_1 = """<html><body>
+<div class="job-listing" data-id="n1"><h3>Software Engineering Intern</h3>
+  <span class="company">GovTech</span><span class="location">Singapore</span>
+  <a href="/careers/jobs/n1">View</a></div>
+<div class="job-listing" data-id="n2"><h3>Research Assistant</h3></div>
+<a rel="next" href="/nus?page=2">Next</a>
+</body></html>"""
+
+NUS_PAGE_2 = """<html><body>
+<div class="job-listing" data-id="n3"><h3>Data Analyst Intern</h3><p class="description">SQL and Tableau</p></div>
+</body></html>"""
+
+FASTJOBS_PAGE = """<html><body>
+<div class="job-card" data-job-id="f1"><a class="job-title" href="/job/f1">Marketing Intern</a>
+  <span class="company-name">Shopee</span><span class="job-location">Tampines</span>
+  <span class="posted-date">2 days ago</span></div>
+</body></html>"""
+
+INDEED_JOBS = {"jobs": [{"title": "Finance Intern", "company_name": "DBS", "location": "Singapore",
+                         "link": "https://sg.indeed.com/job/i1", "job_id": "i1", "snippet": "Excel"}]}
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Serves the fixture routes; HTTP/1.1 so connections are kept alive"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits.append(self.path)
+            server.ports.add(self.client_address[1])
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            status, headers, body = server.route(self.path, self.headers)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    """Local HTTP server; tests set server.routes to {path: handler(path, headers) returning (status, headers, body)}"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.hits, server.ports = [], set()
+    server.in_flight = server.max_in_flight = 0
+    server.routes = {}
+
+    def route(path, headers):
+        handler = server.routes.get(path) or server.routes.get(urlsplit(path).path)
+        return handler(path, headers) if handler else (404, {}, b"not found")
+
+    server.route = route
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def page(body, status=200, headers=None, delay=0):
+    def handler(path, request_headers):
+        if delay:
+            time.sleep(delay)
+        return status, {"Content-Type": "text/html", **(headers or {})}, body.encode()
+    return handler
+
+
+def by_page(bodies, default, **options):
+    """Serve bodies[n] for ?page=n and default otherwise"""
+    def handler(path, headers):
+        query = parse_qs(urlsplit(path).query)
+        number = int(query["page"][0]) if "page" in query else 1
+        return page(bodies.get(number, default), **options)(path, headers)
+    return handler
+
+
+def versioned(bodies):
+    """by_page-style pages with an ETag, answering 304 when If-None-Match matches; bodies may be edited"""
+    def handler(path, headers):
+        query = parse_qs(urlsplit(path).query)
+        body = bodies[int(query["page"][0]) if "page" in query else 1]
+        etag = f'"{hash(body) & 0xffffffff:x}"'
+        if headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"Content-Type": "text/html", "ETag": etag}, body.encode()
+    return handler
+
+
+def sequence(*handlers):
+    """Each call answers with the next handler, repeating the last"""
+    remaining = list(handlers)
+    return lambda path, headers: (remaining.pop(0) if len(remaining) > 1 else remaining[0])(path, headers)
+
+
+def fast_fetcher(**kwargs):
+    sleeps = []
+    options = {"rate": 0, "retries": 2, "timeout": (1, 1), "sleep": sleeps.append, **kwargs}
+    fetcher = Fetcher(**options)
+    fetcher.sleeps = sleeps
+    return fetcher
+
+
+class TestFetcher:
+    """Tests for pooling, limits and retries"""
+
+    def test_keep_alive_reuses_connection(self, stand_in):
+        """Test sequential requests to one host share a single pooled connection"""
+        stand_in.routes["/nus"] = page(NUS_PAGE_1)
+        with fast_fetcher() as fetcher:
+            for _ in range(5):
+                assert fetcher.get(stand_in.url + "/nus").status_code == 200
+            assert fetcher.stats()["connections_opened"] == 1
+        assert len(stand_in.ports) == 1
+
+    def test_retries_transient_status(self, stand_in):
+        """Test 503s are retried and Retry-After sets the minimum wait"""
+        stand_in.routes["/flaky"] = sequence(page("busy", 503, {"Retry-After": "3"}), page("ok"))
+        with fast_fetcher() as fetcher:
+            assert fetcher.get(stand_in.url + "/flaky").text == "ok"
+            assert fetcher.retried == 1
+            assert fetcher.sleeps == [3.0]
+
+    def test_gives_up(self, stand_in):
+        """Test a persistent 500 raises FetchError after the configured retries"""
+        stand_in.routes["/down"] = page("error", 500)
+        with fast_fetcher(retries=2) as fetcher:
+            with pytest.raises(FetchError) as raised:
+                fetcher.get(stand_in.url + "/down")
+        assert raised.value.status == 500
+        assert len(stand_in.hits) == 3
+
+    def test_client_error_not_retried(self, stand_in):
+        """Test a 404 fails at once"""
+        with fast_fetcher() as fetcher:
+            with pytest.raises(FetchError):
+                fetcher.get(stand_in.url + "/missing")
+        assert len(stand_in.hits) == 1
+
+    def test_read_timeout_retried(self, stand_in):
+        """Test a slow response times out and the retry succeeds"""
+        stand_in.routes["/slow"] = sequence(page("late", delay=0.5), page("ok"))
+        with fast_fetcher(timeout=(1, 0.2)) as fetcher:
+            assert fetcher.get(stand_in.url + "/slow").text == "ok"
+            assert fetcher.retried == 1
+
+    def test_host_concurrency_limit(self, stand_in):
+        """Test no more than the host's limit are in flight at once"""
+        stand_in.routes["/nus"] = page(NUS_PAGE_1, delay=0.1)
+        with fast_fetcher(concurrency=2) as fetcher, ThreadPoolExecutor(6) as pool:
+            list(pool.map(lambda _: fetcher.get(stand_in.url + "/nus"), range(6)))
+        assert stand_in.max_in_flight == 2
+
+    def test_host_rate_limit(self, stand_in):
+        """Test request starts to one host are spaced by 1/rate"""
+        stand_in.routes["/nus"] = page("ok")
+        with Fetcher(rate=20, timeout=(1, 1)) as fetcher:
+            started = time.perf_counter()
+            for _ in range(5):
+                fetcher.get(stand_in.url + "/nus")
+            assert time.perf_counter() - started >= 0.2
+
+    def test_backoff_and_headers(self):
+        """Test jittered backoff bounds and header parsing"""
+        assert all(0 <= backoff_delay(3, base=0.5, cap=2) <= 2 for _ in range(50))
+        assert backoff_delay(0, base=0, retry_after=4) == 4
+        assert parse_retry_after("7") == 7
+        assert parse_retry_after("soon") is None
+        assert parse_host_limits("a.com=4/5; b.com=1/0.5") == {"a.com": (4, 5.0), "b.com": (1, 0.5)}
+
+
+class TestSources:
+    """Tests for the sources against fixture pages"""
+
+    def test_nus_follows_pagination(self, stand_in):
+        """Test NUS listings are parsed across rel=next pages with absolute links"""
+        stand_in.routes["/nus"] = by_page({2: NUS_PAGE_2}, NUS_PAGE_1)
+        with fast_fetcher() as fetcher:
+            listings = NUSSource(url=stand_in.url + "/nus").scrape(fetcher)
+        assert [l["title"] for l in listings] == ["Software Engineering Intern", "Research Assistant",
+                                                  "Data Analyst Intern"]
+        assert listings[0]["company"] == "GovTech"
+        assert listings[0]["url"] == stand_in.url + "/careers/jobs/n1"
+        assert listings[1]["company"] == "NUS"
+
+    def test_fastjobs_stops_at_empty_page(self, stand_in):
+        """Test FastJobs reads pages until one has no cards"""
+        stand_in.routes["/fastjobs"] = by_page({3: "<html></html>"}, FASTJOBS_PAGE)
+        with fast_fetcher() as fetcher:
+            listings = FastJobsSource(url=stand_in.url + "/fastjobs").scrape(fetcher)
+        assert len(listings) == 2
+        assert listings[0]["company"] == "Shopee"
+        assert listings[0]["posted"] == "2 days ago"
+        assert stand_in.hits[-1].endswith("page=3")
+
+    def test_indeed(self, stand_in):
+        """Test SerpAPI results are normalised and a missing key skips the source"""
+        stand_in.routes["/search.json"] = lambda path, headers: (200, {"Content-Type": "application/json"},
+                                                        json.dumps(INDEED_JOBS).encode())
+        with fast_fetcher() as fetcher:
+            listings = IndeedSource(api_key="k", url=stand_in.url + "/search.json").scrape(fetcher)
+            assert IndeedSource(api_key="", url=stand_in.url + "/search.json").scrape(fetcher) == []
+        assert listings[0]["company"] == "DBS"
+        assert listings[0]["external_id"] == "i1"
+        assert len(stand_in.hits) == 1
+
+    def test_run_sources_concurrently(self, stand_in):
+        """Test sources run in parallel and one failing source does not sink the rest"""
+        class Broken(Source):
+            name = "broken"
+
+            def scrape(self, fetcher):
+                raise RuntimeError("selector changed")
+
+        stand_in.routes["/nus"] = page(NUS_PAGE_2, delay=0.3)
+        stand_in.routes["/fastjobs"] = by_page({2: ""}, FASTJOBS_PAGE, delay=0.3)
+        # Distinct hosts so the per-host limits do not serialise the two sources
+        other_host = stand_in.url.replace("127.0.0.1", "localhost")
+        sources = [NUSSource(url=stand_in.url + "/nus"), FastJobsSource(url=other_host + "/fastjobs"), Broken()]
+        with fast_fetcher() as fetcher:
+            started = time.perf_counter()
+            results = run_sources(sources, fetcher)
+            elapsed = time.perf_counter() - started
+        assert len(results["nus"]["listings"]) == 1
+        assert len(results["fastjobs"]["listings"]) == 1
+        assert results["broken"] == {"listings": [], "error": "RuntimeError: selector changed",
+                                     "seconds": results["broken"]["seconds"]}
+        assert elapsed < 0.9  # three 0.3s fetches, run one after another, would take at least 0.9s
+
+
+class TestIncremental:
+    """Tests for conditional requests and change detection across crawls"""
+
+    def crawl_nus(self, stand_in, state):
+        with fast_fetcher() as fetcher:
+            results, report = crawl(state, [NUSSource(url=stand_in.url + "/nus")], fetcher)
+        return results["nus"]["listings"], report
+
+    def test_not_modified_pages_skipped(self, stand_in, tmp_path):
+        """Test a repeat crawl gets 304s, follows the stored next link and returns nothing"""
+        stand_in.routes["/nus"] = versioned({1: NUS_PAGE_1, 2: NUS_PAGE_2})
+        state = CrawlState(str(tmp_path / "state.json"))
+        listings, first = self.crawl_nus(stand_in, state)
+        assert len(listings) == 3
+        assert (first["pages_parsed"], first["listings_new"]) == (2, 3)
+
+        listings, second = self.crawl_nus(stand_in, CrawlState(str(tmp_path / "state.json")))
+        assert listings == []
+        assert (second["pages_parsed"], second["pages_not_modified"]) == (0, 2)
+        assert second["bytes_saved"] == first["bytes_received"]
+        assert second["bytes_received"] == 0
+        assert stand_in.hits[-1] == "/nus?page=2"
+
+    def test_unchanged_body_without_validators(self, stand_in, tmp_path):
+        """Test a page with the same body skips parsing even when the server sends no ETag"""
+        stand_in.routes["/nus"] = page(NUS_PAGE_2)
+        state = CrawlState(str(tmp_path / "state.json"))
+        self.crawl_nus(stand_in, state)
+        listings, report = self.crawl_nus(stand_in, state)
+        assert listings == []
+        assert (report["pages_unchanged"], report["pages_parsed"], report["bytes_saved"]) == (1, 0, 0)
+
+    def test_only_changed_listings(self, stand_in, tmp_path):
+        """Test an edited page yields just its new and edited listings"""
+        bodies = {1: NUS_PAGE_1, 2: NUS_PAGE_2}
+        stand_in.routes["/nus"] = versioned(bodies)
+        state = CrawlState(str(tmp_path / "state.json"))
+        self.crawl_nus(stand_in, state)
+
+        bodies[1] = NUS_PAGE_1.replace("GovTech", "GovTech Singapore").replace(
+            '<a rel="next"', '<div class="job-listing" data-id="n4"><h3>UX Intern</h3></div><a rel="next"')
+        listings, report = self.crawl_nus(stand_in, state)
+        assert [l["external_id"] for l in listings] == ["n1", "n4"]
+        assert (report["listings_new"], report["listings_changed"], report["listings_unchanged"]) == (1, 1, 1)
+        assert (report["pages_parsed"], report["pages_not_modified"]) == (1, 1)
+
+    def test_failed_source_parses_again(self, stand_in, tmp_path):
+        """Test pages parsed by a source that then fails are not remembered"""
+        class HalfBroken(NUSSource):
+            def parse(self, soup, base_url):
+                if "page=2" in base_url:
+                    raise RuntimeError("selector changed")
+                return super().parse(soup, base_url)
+
+        stand_in.routes["/nus"] = versioned({1: NUS_PAGE_1, 2: NUS_PAGE_2})
+        state = CrawlState(str(tmp_path / "state.json"))
+        with fast_fetcher() as fetcher:
+            results, _ = crawl(state, [HalfBroken(url=stand_in.url + "/nus")], fetcher)
+        assert results["nus"]["error"] == "RuntimeError: selector changed"
+        assert state.pages == {}
+
+        listings, report = self.crawl_nus(stand_in, state)
+        assert len(listings) == 3
+
+    def test_store_failure_keeps_state(self, stand_in, tmp_path):
+        """Test the state file is not written when storing the listings fails"""
+        stand_in.routes["/nus"] = versioned({1: NUS_PAGE_2})
+        path = tmp_path / "state.json"
+
+        def store(listings):
+            raise OSError("disk full")
+
+        with fast_fetcher() as fetcher, pytest.raises(OSError):
+            crawl(CrawlState(str(path)), [NUSSource(url=stand_in.url + "/nus")], fetcher, store=store)
+        assert not path.exists()
+
+    def test_indeed_ignores_metadata(self, stand_in, tmp_path):
+        """Test SerpAPI pages differing only in search metadata count as unchanged, and keys omit the api key"""
+        responses = iter(range(100))
+        stand_in.routes["/search.json"] = lambda path, headers: (
+            200, {"Content-Type": "application/json"},
+            json.dumps({"search_metadata": {"id": next(responses)}, **INDEED_JOBS}).encode())
+        state = CrawlState(str(tmp_path / "state.json"))
+        source = IndeedSource(api_key="secret", url=stand_in.url + "/search.json")
+        with fast_fetcher() as fetcher:
+            crawl(state, [source], fetcher)
+            results, report = crawl(state, [source], fetcher)
+        assert results["indeed"]["listings"] == []
+        assert report["pages_unchanged"] == 1
+        assert "secret" not in (tmp_path / "state.json").read_text()
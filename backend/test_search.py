@@ -0,0 +1,132 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Candidate
+from search import FTS_TABLE, candidates_version, ensure_search_index, index_candidate, search_candidates
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(engine):
+    """Create a test database session with the FTS5 index in place"""
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def add_candidate(db, email, name, skills, resume_text):
+    candidate = Candidate(name=name, email=email, resume_text=resume_text)
+    candidate.set_skills(skills)
+    db.add(candidate)
+    db.flush()
+    index_candidate(db, candidate)
+    db.commit()
+    return candidate
+
+
+class TestSearchCandidates:
+    """Tests for full-text resume search"""
+
+    def test_fts_table_created_with_candidates(self, engine):
+        """Test create_all also creates the FTS5 table"""
+        with engine.connect() as conn:
+            names = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master"))}
+        assert FTS_TABLE in names
+
+    def test_all_terms_must_match(self, db_session):
+        """Test every query term has to appear"""
+        add_candidate(db_session, "a@x.com", "Alice Tan", ["react"],
+                      "Built React Native apps for a fintech startup in Singapore")
+        add_candidate(db_session, "b@x.com", "Bob Lim", ["react"],
+                      "Built React dashboards for a logistics company")
+
+        results = search_candidates(db_session, "react native fintech")
+        assert [r["email"] for r in results] == ["a@x.com"]
+        assert "<mark>" in results[0]["snippet"]
+        assert results[0]["skills"] == ["react"]
+
+    def test_ranking_prefers_stronger_matches(self, db_session):
+        """Test candidates mentioning the term more often rank higher"""
+        add_candidate(db_session, "a@x.com", "Alice", [], "python once, then lots of other unrelated words here")
+        add_candidate(db_session, "b@x.com", "Bob", ["python"], "python python python data pipelines in python")
+        add_candidate(db_session, "c@x.com", "Carol", [], "java and kotlin")
+
+        results = search_candidates(db_session, "python")
+        assert [r["email"] for r in results] == ["b@x.com", "a@x.com"]
+        assert results[0]["score"] > results[1]["score"]
+
+    def test_reindex_on_update(self, db_session):
+        """Test re-indexing a candidate replaces its old text"""
+        candidate = add_candidate(db_session, "a@x.com", "Alice", [], "java developer")
+        candidate.resume_text = "golang developer"
+        db_session.flush()
+        index_candidate(db_session, candidate)
+        db_session.commit()
+
+        assert search_candidates(db_session, "java") == []
+        assert [r["id"] for r in search_candidates(db_session, "golang")] == [candidate.id]
+
+    def test_query_syntax_is_escaped(self, db_session):
+        """Test FTS5 operators in user input are treated as plain words"""
+        add_candidate(db_session, "a@x.com", "Alice", [], "node developer")
+        assert search_candidates(db_session, 'node" (*') != []
+        assert search_candidates(db_session, '"()*') == []
+
+    def test_snippet_is_escaped(self, db_session):
+        """Test markup in resume text is escaped and only matches become <mark> tags"""
+        add_candidate(db_session, "a@x.com", "Alice", [], 'python <img src=x onerror="alert(1)"> & more')
+        snippet = search_candidates(db_session, "python")[0]["snippet"]
+        assert snippet.startswith("<mark>python</mark> &lt;img")
+        assert "<img" not in snippet and "&quot;alert(1)&quot;" in snippet
+
+    def test_limit_and_offset(self, db_session):
+        """Test results can be paged"""
+        for i in range(5):
+            add_candidate(db_session, f"{i}@x.com", f"Person {i}", [], "sql analyst")
+        first = search_candidates(db_session, "sql", limit=2)
+        second = search_candidates(db_session, "sql", limit=2, offset=2)
+        assert len(first) == 2 and len(second) == 2
+        assert not {r["id"] for r in first} & {r["id"] for r in second}
+
+    def test_ensure_search_index_backfills(self, engine, db_session):
+        """Test an existing database gets its FTS table built from stored candidates"""
+        db_session.add(Candidate(name="Old", email="old@x.com", resume_text="kubernetes operator"))
+        db_session.commit()
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE {FTS_TABLE}"))
+
+        ensure_search_index(engine)
+        assert [r["email"] for r in search_candidates(db_session, "kubernetes")] == ["old@x.com"]
+
+
+class TestCandidatesVersion:
+    """Tests for the candidates change counter"""
+
+    def test_bumped_on_every_write(self, db_session):
+        """Test inserts, updates and deletes each change the version"""
+        versions = [candidates_version(db_session)]
+        candidate = add_candidate(db_session, "a@x.com", "Alice Tan", ["python"], "Python developer")
+        versions.append(candidates_version(db_session))
+        candidate.designation = "Engineer"
+        db_session.commit()
+        versions.append(candidates_version(db_session))
+        db_session.delete(candidate)
+        db_session.commit()
+        versions.append(candidates_version(db_session))
+        assert versions == [0, 1, 2, 3]
+
+    def test_rolled_back_write_not_counted(self, db_session):
+        """Test the bump is part of the write's transaction"""
+        db_session.add(Candidate(name="Bob Lim", email="b@x.com"))
+        db_session.flush()
+        db_session.rollback()
+        assert candidates_version(db_session) == 0
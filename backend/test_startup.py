@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from startup import BackgroundLoad, FirstResponseMiddleware, StartupReport
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def call(middleware):
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        pass
+
+    asyncio.run(middleware({"type": "http", "method": "GET", "path": "/health"}, receive, send))
+
+
+class TestStartupReport:
+    """Tests for timing startup phases"""
+
+    def test_phase_timed(self):
+        """Test a phase records its duration even when it fails"""
+        report = StartupReport()
+        with report.phase("schema"):
+            time.sleep(0.01)
+        with pytest.raises(RuntimeError):
+            with report.phase("password_backend"):
+                raise RuntimeError("database down")
+        assert report.phases["schema"] >= 0.01
+        assert "password_backend" in report.phases
+        assert set(report.as_dict()) == {"schema_ms", "password_backend_ms"}
+
+
+class TestBackgroundLoad:
+    """Tests for loading the parser off the startup path"""
+
+    def test_loading_then_ready(self):
+        """Test the state moves from loading to ready and the duration is recorded"""
+        report = StartupReport()
+        release = threading.Event()
+        load = BackgroundLoad("parser", release.wait, report)
+        assert load.state == "idle"
+        load.start()
+        assert load.loading
+        release.set()
+        assert load.wait(5)
+        assert load.state == "ready"
+        assert "parser" in report.phases
+
+    def test_started_once(self):
+        """Test a second start does not run the loader again"""
+        calls = []
+        load = BackgroundLoad("parser", lambda: calls.append(1), StartupReport())
+        load.start()
+        load.wait(5)
+        load.start()
+        assert calls == [1]
+
+    def test_failure(self):
+        """Test a failing loader ends in the failed state instead of warming forever"""
+        def broken():
+            raise OSError("model missing")
+
+        load = BackgroundLoad("parser", broken, StartupReport())
+        load.start()
+        load.wait(5)
+        assert load.state == "failed"
+        assert not load.loading
+
+
+class TestFirstResponseMiddleware:
+    """Tests for import-to-first-response timing"""
+
+    def test_first_response_recorded_once(self):
+        """Test only the first response sets the time"""
+        report = StartupReport(started=time.perf_counter() - 1)
+        middleware = FirstResponseMiddleware(ok_app, report)
+        call(middleware)
+        first = report.first_response
+        assert first >= 1
+        call(middleware)
+        assert report.first_response == first
+        assert "first_response_ms" in report.as_dict()
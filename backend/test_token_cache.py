@@ -0,0 +1,158 @@
+import json
+import pytest
+from datetime import date, datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import User
+from token_cache import LocalBackend, TokenCache, UserSnapshot, token_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def user():
+    return UserSnapshot(1, "Test User", "testuser", "test@example.com", date(2000, 1, 1), True)
+
+
+class TestTokenCache:
+    """Tests for the verified-token cache"""
+
+    def test_miss_then_hit(self, clock, user):
+        """Test a cached token is returned with its claims and snapshot"""
+        cache = TokenCache(LocalBackend(), ttl=60, clock=clock)
+        claims = {"sub": user.email, "exp": clock.now + 900}
+
+        assert cache.get("tok") is None
+        cache.set("tok", claims, user)
+        assert cache.get("tok") == (claims, user)
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hit_ratio"] == 0.5
+
+    def test_ttl_expiry(self, clock, user):
+        """Test entries expire after the cache TTL"""
+        cache = TokenCache(LocalBackend(), ttl=60, clock=clock)
+        cache.set("tok", {"sub": user.email, "exp": clock.now + 900}, user)
+        clock.now += 61
+        assert cache.get("tok") is None
+
+    def test_ttl_capped_by_token_exp(self, clock, user):
+        """Test an entry never outlives the token's exp claim"""
+        cache = TokenCache(LocalBackend(), ttl=60, clock=clock)
+        cache.set("tok", {"sub": user.email, "exp": clock.now + 10}, user)
+        clock.now += 11
+        assert cache.get("tok") is None
+
+    def test_expired_token_not_cached(self, clock, user):
+        """Test a token already past exp is not stored"""
+        cache = TokenCache(LocalBackend(), ttl=60, clock=clock)
+        cache.set("tok", {"sub": user.email, "exp": clock.now - 1}, user)
+        assert cache.stats()["size"] == 0
+
+    def test_lru_bound(self, clock, user):
+        """Test the least recently used token is evicted at capacity"""
+        cache = TokenCache(LocalBackend(maxsize=2), ttl=60, clock=clock)
+        claims = {"sub": user.email, "exp": clock.now + 900}
+        cache.set("a", claims, user)
+        cache.set("b", claims, user)
+        cache.get("a")
+        cache.set("c", claims, user)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_invalidate_subject(self, clock, user):
+        """Test every token for a user is dropped together"""
+        cache = TokenCache(LocalBackend(), ttl=60, clock=clock)
+        cache.set("a", {"sub": user.email, "exp": clock.now + 900}, user)
+        cache.set("b", {"sub": user.email, "exp": clock.now + 900}, user)
+        cache.set("c", {"sub": "other@example.com", "exp": clock.now + 900}, user)
+
+        cache.invalidate_subject(user.email)
+        assert cache.get("a") is None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+
+    def test_tokens_stored_by_hash(self, clock, user):
+        """Test raw tokens are never used as keys"""
+        backend = LocalBackend()
+        cache = TokenCache(backend, ttl=60, clock=clock)
+        cache.set("secret-token", {"sub": user.email, "exp": clock.now + 900}, user)
+        assert "secret-token" not in backend._entries
+
+    def test_snapshot_round_trip(self, user):
+        """Test snapshots survive serialisation for a shared backend"""
+        restored = UserSnapshot.from_dict(user.to_dict())
+        assert restored.dob == date(2000, 1, 1)
+        assert restored.email == user.email
+
+        user.updated_at = datetime(2025, 3, 1, 12, 30, 0, 123456)
+        assert UserSnapshot.from_dict(json.loads(json.dumps(user.to_dict()))).updated_at == user.updated_at
+
+
+class TestUserInvalidation:
+    """Tests for dropping cached tokens when a user row changes"""
+
+    @pytest.fixture
+    def db_session(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        yield session
+        session.close()
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        token_cache.clear()
+        yield
+        token_cache.clear()
+
+    def _cache_user(self, user):
+        token_cache.set("tok", {"sub": user.email, "exp": 32503680000}, user)
+
+    def test_deactivation_invalidates(self, db_session):
+        """Test deactivating a user drops their cached tokens"""
+        user = User(full_name="A", username="a", email="a@example.com", dob=date(2000, 1, 1), hashed_password="x")
+        db_session.add(user)
+        db_session.commit()
+        self._cache_user(user)
+
+        user.is_active = False
+        db_session.commit()
+        assert token_cache.get("tok") is None
+
+    def test_email_change_invalidates_old_subject(self, db_session):
+        """Test changing the email drops tokens issued for the old address"""
+        user = User(full_name="A", username="a", email="a@example.com", dob=date(2000, 1, 1), hashed_password="x")
+        db_session.add(user)
+        db_session.commit()
+        self._cache_user(user)
+
+        user.email = "new@example.com"
+        db_session.commit()
+        assert token_cache.get("tok") is None
+
+    def test_delete_invalidates(self, db_session):
+        """Test deleting a user drops their cached tokens"""
+        user = User(full_name="A", username="a", email="a@example.com", dob=date(2000, 1, 1), hashed_password="x")
+        db_session.add(user)
+        db_session.commit()
+        self._cache_user(user)
+
+        db_session.delete(user)
+        db_session.commit()
+        assert token_cache.get("tok") is None
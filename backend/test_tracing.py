@@ -0,0 +1,211 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+import tracing
+from tracing import (NOOP_SPAN, BatchExporter, RotatingWriter, Span, TracingMiddleware, current_span,
+                     parse_traceparent, span)
+
+
+class MemoryWriter:
+    def __init__(self):
+        self.lines = []
+
+    def write(self, data):
+        self.lines.append(data)
+
+    def spans(self):
+        return [s for line in self.lines
+                for s in json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+
+
+@pytest.fixture
+def exported():
+    """Swap in an exporter writing to memory; yields a function returning the exported spans by name"""
+    writer = MemoryWriter()
+    exporter = BatchExporter(writer=writer, batch_size=1000, interval=60)
+    with patch("tracing.exporter", exporter):
+        def spans():
+            exporter.flush()
+            return {s["name"]: s for s in writer.spans()}
+        yield spans
+
+
+def traced_app(sample_rate=1.0):
+    app = FastAPI()
+
+    def parse():
+        with span("parser.extract_skills", skills=3):
+            return getattr(current_span(), "trace_id", None)
+
+    @app.get("/work/{item}")
+    async def work(item: int):
+        with span("upload.read"):
+            trace_id = await run_in_threadpool(parse)
+        return {"trace_id": trace_id}
+
+    app.add_middleware(TracingMiddleware, sample_rate=sample_rate)
+    return app
+
+
+class TestSpans:
+    """Tests for nesting spans through the contextvar"""
+
+    def test_noop_outside_trace(self):
+        """Test span() costs nothing outside a traced request"""
+        assert current_span() is None
+        with span("parser.extract_text") as s:
+            s.set("ignored", 1)
+        assert s is NOOP_SPAN
+
+    def test_nesting(self, exported):
+        """Test children share the trace and point at their parent"""
+        with Span("GET /me", "a" * 32, kind="SERVER") as root:
+            with span("db SELECT") as child:
+                assert current_span() is child
+                with span("inner", rows=2):
+                    pass
+            assert current_span() is root
+        assert current_span() is None
+
+        spans = exported()
+        assert spans["db SELECT"]["parentSpanId"] == spans["GET /me"]["spanId"]
+        assert spans["inner"]["parentSpanId"] == spans["db SELECT"]["spanId"]
+        assert {s["traceId"] for s in spans.values()} == {"a" * 32}
+        assert "parentSpanId" not in spans["GET /me"]
+        assert spans["inner"]["attributes"] == [{"key": "rows", "value": {"intValue": "2"}}]
+
+    def test_error_status(self, exported):
+        """Test an exception marks the span as failed"""
+        with pytest.raises(ValueError):
+            with Span("root", "b" * 32):
+                with span("parser.extract_text"):
+                    raise ValueError("bad pdf")
+        status = exported()["parser.extract_text"]["status"]
+        assert status == {"code": "STATUS_CODE_ERROR", "message": "ValueError: bad pdf"}
+
+
+class TestTraceparent:
+    """Tests for W3C trace context parsing"""
+
+    def test_parse(self):
+        """Test valid, unsampled and malformed headers"""
+        trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+        assert parse_traceparent(f"00-{trace_id}-{parent_id}-01") == (trace_id, parent_id, True)
+        assert parse_traceparent(f"00-{trace_id}-{parent_id}-00")[2] is False
+        assert parse_traceparent("00-" + "0" * 32 + f"-{parent_id}-01") is None
+        assert parse_traceparent("garbage") is None
+
+
+class TestTracingMiddleware:
+    """Tests for request spans"""
+
+    def test_route_span_and_threadpool_children(self, exported):
+        """Test the server span is named by route and threadpool work nests under it"""
+        response = TestClient(traced_app()).get("/work/7")
+        trace_id = response.json()["trace_id"]
+        assert response.headers["x-trace-id"] == trace_id
+
+        spans = exported()
+        root = spans["GET /work/{item}"]
+        assert root["kind"] == "SPAN_KIND_SERVER"
+        assert {"key": "http.response.status_code", "value": {"intValue": "200"}} in root["attributes"]
+        assert spans["upload.read"]["parentSpanId"] == root["spanId"]
+        assert spans["parser.extract_skills"]["parentSpanId"] == spans["upload.read"]["spanId"]
+        assert spans["parser.extract_skills"]["traceId"] == trace_id
+
+    def test_disabled(self, exported):
+        """Test a zero sample rate traces nothing, even with a sampled traceparent"""
+        client = TestClient(traced_app(sample_rate=0))
+        response = client.get("/work/1", headers={"traceparent": f"00-{'c' * 32}-{'d' * 16}-01"})
+        assert response.json()["trace_id"] is None
+        assert "x-trace-id" not in response.headers
+        assert exported() == {}
+
+    def test_parent_decides(self, exported):
+        """Test an incoming traceparent's sampled flag overrides the local rate"""
+        client = TestClient(traced_app(sample_rate=1.0))
+        skipped = client.get("/work/1", headers={"traceparent": f"00-{'c' * 32}-{'d' * 16}-00"})
+        assert "x-trace-id" not in skipped.headers
+
+        joined = client.get("/work/2", headers={"traceparent": f"00-{'e' * 32}-{'f' * 16}-01"})
+        assert joined.headers["x-trace-id"] == "e" * 32
+        assert exported()["GET /work/{item}"]["parentSpanId"] == "f" * 16
+
+
+class TestStatementSpans:
+    """Tests for SQLAlchemy statement spans"""
+
+    def test_statement_span(self, exported):
+        """Test each statement run inside a trace gets a client span"""
+        engine = create_engine("sqlite://")
+        with Span("root", "d" * 32), engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 2"))
+
+        statement = exported()["db SELECT"]
+        assert statement["kind"] == "SPAN_KIND_CLIENT"
+        assert {"key": "db.statement", "value": {"stringValue": "SELECT 1"}} in statement["attributes"]
+        assert {"key": "db.system", "value": {"stringValue": "sqlite"}} in statement["attributes"]
+
+
+class TestParserSpans:
+    """Tests for the parser stage spans"""
+
+    def test_stages(self, exported):
+        """Test parse_resume opens a span per stage"""
+        import parser
+
+        resume = "Jane Tan\njane@example.com\n+65 9123 4567\nPython and SQL developer, Bachelor of Computing"
+        with patch("parser.extract_text_from_pdf", return_value=resume), Span("root", "f" * 32):
+            parser.parse_resume("resume.pdf")
+        names = set(exported())
+        assert {"parser.extract_text", "parser.extract_contact", "parser.extract_skills",
+                "parser.extract_degrees", "parser.extract_experience", "parser.experience_years"} <= names
+
+
+class TestExport:
+    """Tests for batching and writing spans"""
+
+    def test_otlp_batch_file(self, tmp_path):
+        """Test a flush writes one OTLP/JSON request per batch"""
+        path = tmp_path / "traces" / "spans.jsonl"
+        exporter = BatchExporter(writer=RotatingWriter(str(path)), batch_size=2, interval=60)
+        with patch("tracing.exporter", exporter), Span("root", "1" * 32):
+            for i in range(2):
+                with span(f"child-{i}"):
+                    pass
+        exporter.flush()
+
+        lines = path.read_text().splitlines()
+        assert len(lines) == 2
+        request = json.loads(lines[0])
+        resource = request["resourceSpans"][0]
+        assert {"key": "service.name", "value": {"stringValue": tracing.SERVICE_NAME}} in resource["resource"]["attributes"]
+        assert len(resource["scopeSpans"][0]["spans"]) == 2
+        assert exporter.exported == 3
+
+    def test_rotation(self, tmp_path):
+        """Test the file rotates past max_bytes and keeps backup_count old files"""
+        path = str(tmp_path / "spans.jsonl")
+        writer = RotatingWriter(path, max_bytes=100, backup_count=2)
+        for i in range(5):
+            writer.write(f"{i}".encode() * 60 + b"\n")
+        assert sorted(os.listdir(tmp_path)) == ["spans.jsonl", "spans.jsonl.1", "spans.jsonl.2"]
+        assert open(path).read().startswith("4")
+        assert open(path + ".2").read().startswith("2")
+
+    def test_full_queue_drops(self):
+        """Test spans beyond the queue bound are dropped and counted, not blocking"""
+        exporter = BatchExporter(writer=MemoryWriter(), max_queue=2, interval=60)
+        exporter._thread = object()  # keep the background thread out of the way
+        for _ in range(5):
+            exporter.submit(Span("s", "2" * 32))
+        assert exporter.dropped == 3
@@ -0,0 +1,237 @@
+"""Cache of verified access tokens for get_current_user.
+
+Maps a token's SHA-256 to its verified claims plus a lightweight snapshot
+of the user, so authenticated requests skip the JWT check and the users
+lookup. Entries never outlive the token's own exp, are bounded by LRU
+eviction, and are dropped whenever the user row is updated or deleted.
+
+The default backend is per-process. Setting TOKEN_CACHE_REDIS_URL (with
+the optional redis package installed) shares the cache between workers.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+
+from sqlalchemy import event, inspect
+
+from models import User
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '10000'))
+TOKEN_CACHE_TTL = float(os.environ.get('TOKEN_CACHE_TTL', '60'))
+TOKEN_CACHE_REDIS_URL = os.environ.get('TOKEN_CACHE_REDIS_URL')
+
+logger = logging.getLogger(__name__)
+
+class UserSnapshot:
+    """Read-only copy of the User fields endpoints need"""
+    __slots__ = ("id", "full_name", "username", "email", "dob", "is_active", "updated_at")
+
+    def __init__(self, id, full_name, username, email, dob, is_active, updated_at=None):
+        self.id = id
+        self.full_name = full_name
+        self.username = username
+        self.email = email
+        self.dob = dob
+        self.is_active = is_active
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.full_name, user.username, user.email, user.dob, user.is_active, user.updated_at)
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.__slots__}
+        if isinstance(self.dob, date):
+            data["dob"] = self.dob.isoformat()
+        if isinstance(self.updated_at, datetime):
+            data["updated_at"] = self.updated_at.isoformat()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        if data.get("dob"):
+            data["dob"] = date.fromisoformat(data["dob"])
+        if data.get("updated_at"):
+            data["updated_at"] = datetime.fromisoformat(data["updated_at"])
+        return cls(**data)
+
+class LocalBackend:
+    """Per-process LRU store of (claims, snapshot, expires_at)"""
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._by_subject = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, subject, entry, ttl):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._by_subject.setdefault(subject, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                old_key, (old_claims, _, _) = self._entries.popitem(last=False)
+                self._forget(old_claims.get("sub"), old_key)
+                self.evictions += 1
+
+    def delete(self, key, subject):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._forget(subject, key)
+
+    def delete_subject(self, subject):
+        with self._lock:
+            for key in self._by_subject.pop(subject, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_subject.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _forget(self, subject, key):
+        keys = self._by_subject.get(subject)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_subject[subject]
+
+class RedisBackend:
+    """Shared store; Redis expires entries itself"""
+
+    prefix = "token-cache:"
+
+    def __init__(self, client):
+        self.client = client
+        self.evictions = 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return data["claims"], UserSnapshot.from_dict(data["user"]), data["expires_at"]
+
+    def set(self, key, subject, entry, ttl):
+        claims, snapshot, expires_at = entry
+        payload = json.dumps({"claims": claims, "user": snapshot.to_dict(), "expires_at": expires_at})
+        pipe = self.client.pipeline()
+        pipe.setex(self.prefix + key, max(1, int(ttl)), payload)
+        pipe.sadd(self.prefix + "subject:" + subject, key)
+        pipe.expire(self.prefix + "subject:" + subject, max(1, int(ttl)))
+        pipe.execute()
+
+    def delete(self, key, subject):
+        self.client.delete(self.prefix + key)
+        self.client.srem(self.prefix + "subject:" + subject, key)
+
+    def delete_subject(self, subject):
+        subject_key = self.prefix + "subject:" + subject
+        keys = [self.prefix + k.decode() if isinstance(k, bytes) else self.prefix + k
+                for k in self.client.smembers(subject_key)]
+        self.client.delete(subject_key, *keys)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(self.prefix + "*"))
+
+class TokenCache:
+    """TTL cache of verified token claims and user snapshots"""
+
+    def __init__(self, backend=None, ttl=TOKEN_CACHE_TTL, clock=time.time):
+        self.backend = backend if backend is not None else LocalBackend()
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        """Return (claims, UserSnapshot) for a cached, unexpired token, else None"""
+        key = self.key(token)
+        entry = self.backend.get(key)
+        if entry is not None:
+            claims, snapshot, expires_at = entry
+            if expires_at > self.clock():
+                self.hits += 1
+                return claims, snapshot
+            self.backend.delete(key, claims.get("sub"))
+        self.misses += 1
+        return None
+
+    def set(self, token, claims, user):
+        """Cache a verified token; the entry expires at the earlier of the TTL and exp"""
+        now = self.clock()
+        expires_at = now + self.ttl
+        if claims.get("exp") is not None:
+            expires_at = min(expires_at, float(claims["exp"]))
+        if expires_at <= now:
+            return
+        snapshot = user if isinstance(user, UserSnapshot) else UserSnapshot.from_user(user)
+        self.backend.set(self.key(token), claims["sub"], (claims, snapshot, expires_at), expires_at - now)
+
+    def invalidate_subject(self, subject):
+        """Drop every cached token for a user (their email is the token subject)"""
+        if subject:
+            self.backend.delete_subject(subject)
+
+    def clear(self):
+        self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+def _build_backend():
+    if TOKEN_CACHE_REDIS_URL:
+        if redis is None:
+            logger.warning("TOKEN_CACHE_REDIS_URL is set but redis is not installed; using a per-process token cache")
+        else:
+            return RedisBackend(redis.Redis.from_url(TOKEN_CACHE_REDIS_URL))
+    return LocalBackend()
+
+token_cache = TokenCache(_build_backend())
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    # Cover both the current email and the one it may have just replaced
+    history = inspect(target).attrs.email.history
+    for email in set(history.deleted or ()) | {target.email}:
+        token_cache.invalidate_subject(email)
@@ -0,0 +1,344 @@
+"""Minimal request tracing, exported as OpenTelemetry JSON lines.
+
+TracingMiddleware starts a root span for a sampled request. Code running
+for that request, including in threadpool workers, opens child spans with
+
+    with span("parser.extract_skills", skills=12):
+        ...
+
+The current span lives in a contextvar. Outside a sampled request, span()
+returns a shared no-op, so instrumented code costs one contextvar lookup.
+SQLAlchemy statements get spans through engine-wide hooks.
+
+Sampling is decided once per request at the head. With TRACE_SAMPLE_RATE
+at 0 (the default) tracing is off. Otherwise an incoming W3C traceparent
+header decides, and requests without one are sampled at the given rate.
+
+Finished spans go onto a bounded queue. When the queue is full, spans are
+dropped and counted. An exporter thread writes them in batches to
+TRACE_FILE, one OTLP/JSON ExportTraceServiceRequest per line. This is the
+format the OpenTelemetry Collector's file exporter writes and its
+otlpjsonfile receiver reads. The file rotates at TRACE_MAX_BYTES.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0'))
+TRACE_FILE = os.environ.get('TRACE_FILE', 'traces/spans.jsonl')
+TRACE_MAX_BYTES = int(os.environ.get('TRACE_MAX_BYTES', str(20 * 1024 * 1024)))
+TRACE_BACKUP_COUNT = int(os.environ.get('TRACE_BACKUP_COUNT', '5'))
+TRACE_BATCH_SIZE = int(os.environ.get('TRACE_BATCH_SIZE', '256'))
+TRACE_EXPORT_INTERVAL = float(os.environ.get('TRACE_EXPORT_INTERVAL', '2'))
+TRACE_MAX_QUEUE = int(os.environ.get('TRACE_MAX_QUEUE', '8192'))
+SERVICE_NAME = os.environ.get('SERVICE_NAME', 'internuship-backend')
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+class Span:
+    """One timed operation in a trace"""
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "attributes",
+                 "start_ns", "end_ns", "error", "_token")
+
+    def __init__(self, name, trace_id, parent_id=None, kind="INTERNAL", attributes=None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._token = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def child(self, name, **attributes):
+        return Span(name, self.trace_id, self.span_id, attributes=attributes)
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            exporter.submit(self)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None and self.error is None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+    def otlp(self):
+        record = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": f"SPAN_KIND_{self.kind}",
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": "STATUS_CODE_ERROR", "message": self.error} if self.error else {},
+        }
+        if self.parent_id:
+            record["parentSpanId"] = self.parent_id
+        return record
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+class _NoopSpan:
+    """Stands in for a span when the request is not traced"""
+    __slots__ = ()
+
+    def set(self, key, value):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span = ContextVar("current_span", default=None)
+
+def current_span():
+    """The innermost open span, or None outside a traced request"""
+    return _current_span.get()
+
+def span(name, **attributes):
+    """Child of the current span, for use as a context manager; a no-op when not tracing"""
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return parent.child(name, **attributes)
+
+class RotatingWriter:
+    """Appends lines to a file, rotating it to .1, .2, ... once it passes max_bytes"""
+
+    def __init__(self, path, max_bytes=TRACE_MAX_BYTES, backup_count=TRACE_BACKUP_COUNT):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+    def write(self, data):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size and size + len(data) > self.max_bytes:
+            self.rotate()
+        with open(self.path, "ab") as f:
+            f.write(data)
+
+    def rotate(self):
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+class BatchExporter:
+    """Queues finished spans and writes them in batches from a background thread"""
+
+    def __init__(self, writer=None, batch_size=TRACE_BATCH_SIZE, interval=TRACE_EXPORT_INTERVAL,
+                 max_queue=TRACE_MAX_QUEUE, service_name=SERVICE_NAME):
+        self.writer = writer or RotatingWriter(TRACE_FILE)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_queue = max_queue
+        self.service_name = service_name
+        self.exported = 0
+        self.dropped = 0
+        self._queue = queue.Queue(max_queue)
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._thread is None:
+            self._start()
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write out every queued span"""
+        with self._lock:
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return
+                try:
+                    self.writer.write(self.encode(batch))
+                    self.exported += len(batch)
+                except OSError as e:
+                    self.dropped += len(batch)
+                    logger.warning(f"Failed to export {len(batch)} spans: {str(e)}")
+
+    def encode(self, batch):
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", self.service_name),
+                                        _otlp_attribute("process.pid", os.getpid())]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": [span.otlp() for span in batch]}],
+        }]}
+        if orjson is not None:
+            return orjson.dumps(request) + b"\n"
+        return (json.dumps(request, separators=(",", ":")) + "\n").encode()
+
+    def _after_fork(self):
+        # The exporter thread does not survive a fork; the child starts its own on its first span
+        self._queue = queue.Queue(self.max_queue)
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+exporter = BatchExporter()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=exporter._after_fork)
+atexit.register(exporter.flush)
+
+def parse_traceparent(value):
+    """(trace_id, parent_span_id, sampled) from a W3C traceparent header, or None"""
+    match = TRACEPARENT.match(value.strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), int(match.group(3), 16) & 1 == 1
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span for each sampled HTTP request"""
+
+    def __init__(self, app, sample_rate=TRACE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    def start_root(self, scope):
+        """Root span for the request, or None when it is not sampled"""
+        for name, value in scope.get("headers", ()):
+            if name == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                if parent is not None:
+                    trace_id, parent_id, sampled = parent
+                    return Span("", trace_id, parent_id, kind="SERVER") if sampled else None
+                break
+        if random.random() < self.sample_rate:
+            return Span("", f"{random.getrandbits(128):032x}", kind="SERVER")
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if self.sample_rate <= 0 or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        root = self.start_root(scope)
+        if root is None:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope.get("method", "")
+        root.set("http.request.method", method)
+        root.set("url.path", scope.get("path", ""))
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                root.set("http.response.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.error = f"HTTP {message['status']}"
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", root.trace_id.encode()))
+                message["headers"] = headers
+            await send(message)
+
+        with root:
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    root.set("http.route", route)
+                root.name = f"{method} {route or 'unmatched'}"
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement_span(conn, cursor, statement, parameters, context, executemany):
+    parent = _current_span.get()
+    if parent is not None:
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+        child = parent.child(f"db {operation}", **{
+            "db.system": conn.dialect.name,
+            "db.statement": statement[:2000],
+        })
+        child.kind = "CLIENT"
+        conn.info.setdefault("trace_spans", []).append(child)
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_statement_span(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans and _current_span.get() is not None:
+        spans.pop().end()
+
+@event.listens_for(Engine, "handle_error")
+def _fail_statement_span(context):
+    spans = context.connection.info.get("trace_spans") if context.connection else None
+    if spans and _current_span.get() is not None:
+        failed = spans.pop()
+        failed.error = f"{type(context.original_exception).__name__}: {context.original_exception}"
+        failed.end()